@@ -0,0 +1,237 @@
+# 부하 테스트용 OpenAI API 대역 서버 (네트워크/비용 없이 실행)
+# chat completions (일반/스트리밍), audio transcriptions, models 엔드포인트만 흉내냄
+#
+# 실행 : python -m bench.fake_openai --port 8911 --latency 0.4 --token-rate 80 --error-rate 0.01
+# 앱 설정 : OPENAI_BASE_URL=http://127.0.0.1:8911/v1 OPENAI_API_KEY=fake
+#
+# 응답 지연 = latency (첫 토큰까지) + jitter (0 ~ jitter 균등 분포) + 응답 토큰 수 / token_rate
+# 장애 주입 (요청마다 확률) : error_rate (fail_status, 기본 500), rate_limit_rate (429), hang_rate (응답 없이 hang_seconds 대기)
+#           (다음 N개 요청) : fail_next (fail_status, 기본 500), hang_next (hang_seconds 대기) - 테스트에서 순서가 정해진 장애 재현용
+# 실행 중 설정 변경 : POST /_control {"latency": 2, "error_rate": 0.5} , 현재 설정/통계 : GET /_control
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from dataclasses import asdict, dataclass
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+@dataclass
+class FakeConfig:
+    latency: float = 0.4
+    jitter: float = 0.1
+    token_rate: float = 80.0
+    transcription_latency: float = 0.5
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    hang_rate: float = 0.0
+    hang_seconds: float = 120.0
+    fail_next: int = 0
+    # error_rate / fail_next 응답 상태 코드 (4xx 면 재시도하지 않는 오류)
+    fail_status: int = 500
+    hang_next: int = 0
+    # 대화 턴 메시지 수가 이 값을 넘으면 대화 종료 응답 ("error": true)
+    end_after: int = 12
+    # 응답 길이 (글자 수)
+    response_chars: int = 60
+
+config = FakeConfig()
+stats = {"chat": 0, "stream": 0, "transcriptions": 0, "errors": 0, "rate_limited": 0, "hung": 0}
+
+app = FastAPI()
+
+SENTENCES = [
+    "안녕하세요, 만나서 반가워요.",
+    "오늘 날씨가 정말 좋네요.",
+    "공항에 가려면 어떻게 가야 해요?",
+    "이 옷은 얼마예요?",
+    "주말에 친구랑 영화를 봤어요.",
+    "한국어 공부는 재미있어요.",
+]
+
+# 응답 키 별 글자 수
+FIELD_LENGTHS = {"response": 60, "summary": 40, "grammar_points": 80, "study_tips": 80}
+
+# 한국어 기준 대략 2글자 = 1토큰
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 2)
+
+def random_text(chars: int) -> str:
+    text = ""
+    while len(text) < chars:
+        text += random.choice(SENTENCES) + " "
+    return text[:chars].strip()
+
+# 시스템 프롬프트(또는 json_schema)에 나오는 응답 키만 채워서 반환
+# 대화 턴 : response/error, 요약 : summary, 피드백 : grammar_points/study_tips, 요약+피드백 : 셋 다
+def completion_content(body: dict) -> str:
+    messages = body.get("messages", [])
+    response_format = body.get("response_format") or {}
+    schema = (response_format.get("json_schema") or {}).get("schema") or {}
+    keys = set(schema.get("properties", {}))
+    if not keys and messages:
+        system_prompt = str(messages[0].get("content", ""))
+        keys = {key for key in FIELD_LENGTHS if f'"{key}"' in system_prompt}
+
+    data = {key: random_text(FIELD_LENGTHS[key]) for key in FIELD_LENGTHS if key in keys}
+    if "response" in data:
+        data["response"] = random_text(config.response_chars)
+        data["error"] = len(messages) > config.end_after
+    elif not data:
+        data["response"] = random_text(config.response_chars)
+    return json.dumps(data, ensure_ascii=False)
+
+def usage(body: dict, content: str) -> dict:
+    prompt_tokens = sum(estimate_tokens(str(message.get("content", ""))) for message in body.get("messages", []))
+    completion_tokens = estimate_tokens(content)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        # OpenAI 는 1024 토큰 이상 프롬프트의 앞부분을 128 토큰 단위로 캐시
+        "prompt_tokens_details": {
+            "cached_tokens": (prompt_tokens // 128) * 128 if prompt_tokens >= 1024 else 0
+        }
+    }
+
+def server_error() -> JSONResponse:
+    stats["errors"] += 1
+    return JSONResponse(
+        {"error": {"message": "The server had an error", "type": "server_error"}},
+        status_code=config.fail_status
+    )
+
+# 장애 주입 (해당하면 응답 반환, 아니면 None)
+async def inject_failure():
+    if config.hang_next > 0:
+        config.hang_next -= 1
+        stats["hung"] += 1
+        await asyncio.sleep(config.hang_seconds)
+    if config.fail_next > 0:
+        config.fail_next -= 1
+        return server_error()
+
+    roll = random.random()
+    if roll < config.hang_rate:
+        stats["hung"] += 1
+        await asyncio.sleep(config.hang_seconds)
+    roll -= config.hang_rate
+    if roll < config.rate_limit_rate:
+        stats["rate_limited"] += 1
+        return JSONResponse(
+            {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+            status_code=429,
+            headers={"retry-after": "1"}
+        )
+    roll -= config.rate_limit_rate
+    if roll < config.error_rate:
+        return server_error()
+    return None
+
+def first_token_delay() -> float:
+    return config.latency + random.uniform(0, config.jitter)
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    failure = await inject_failure()
+    if failure is not None:
+        return failure
+
+    content = completion_content(body)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    model = body.get("model", "gpt-4o-mini")
+
+    if not body.get("stream"):
+        stats["chat"] += 1
+        await asyncio.sleep(first_token_delay() + estimate_tokens(content) / config.token_rate)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": usage(body, content)
+        }
+
+    stats["stream"] += 1
+    include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+    def chunk(delta: dict, finish_reason=None, **extra) -> str:
+        data = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if delta is not None else [],
+            **extra
+        }
+        return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    async def stream():
+        await asyncio.sleep(first_token_delay())
+        yield chunk({"role": "assistant", "content": ""})
+        # 2글자(1토큰) 단위로 token_rate 속도에 맞춰 전송
+        for start in range(0, len(content), 2):
+            yield chunk({"content": content[start:start + 2]})
+            await asyncio.sleep(1 / config.token_rate)
+        yield chunk({}, "stop")
+        if include_usage:
+            yield chunk(None, usage=usage(body, content))
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+@app.post("/v1/audio/transcriptions")
+async def transcriptions(request: Request):
+    form = await request.form()
+    failure = await inject_failure()
+    if failure is not None:
+        return failure
+
+    stats["transcriptions"] += 1
+    audio = form.get("file")
+    size = len(await audio.read()) if audio is not None else 0
+    # 업로드 크기에 비례하는 처리 시간 (1MB 당 1초)
+    await asyncio.sleep(config.transcription_latency + random.uniform(0, config.jitter) + size / 1_000_000)
+    return {"text": random.choice(SENTENCES)}
+
+@app.get("/v1/models")
+async def models():
+    return {"object": "list", "data": [{"id": "gpt-4o-mini", "object": "model", "owned_by": "system"}]}
+
+@app.get("/_control")
+async def get_control():
+    return {"config": asdict(config), "stats": stats}
+
+@app.post("/_control")
+async def set_control(request: Request):
+    for key, value in (await request.json()).items():
+        if hasattr(config, key):
+            setattr(config, key, type(getattr(config, key))(value))
+    return {"config": asdict(config), "stats": stats}
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fake OpenAI API server for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8911)
+    for key, value in asdict(FakeConfig()).items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), default=value)
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    import uvicorn
+
+    args = parse_args()
+    for key in asdict(config):
+        setattr(config, key, getattr(args, key))
+    # 클라이언트의 keep-alive 커넥션을 닫지 않도록 길게 유지
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", timeout_keep_alive=300)
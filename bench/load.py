@@ -0,0 +1,461 @@
+# 부하 테스트 (실제 사용 흐름 : 여러 턴 대화 + 음성 턴 + 채팅 목록/내역 조회)
+# 기본 : OpenAI 대역 서버(bench.fake_openai) + 앱(uvicorn)을 SQLite DB 로 직접 띄운 뒤 측정 (네트워크/비용 없음)
+# --target 지정 시 실행 중인 서버 대상으로 측정 (--database-url 은 테스트 사용자 추가용, --secret-key 는 서버와 같은 값)
+#
+# python -m bench.load --users 50 --duration 60 --stc-ratio 0.3 --output bench/results/load-base.json
+# python -m bench.load --users 50 --duration 60 --compare bench/results/load-base.json
+# python -m bench.load --app-env LLM_MAX_CONCURRENCY=8 --fake-latency 1.5 --fake-error-rate 0.05
+# python -m bench.load --fake-hang-rate 0.05 --fake-hang-seconds 60 --app-env OPENAI_HEDGE_DELAY=2   # 재시도/헤지/서킷 확인
+#
+# 결과 : 엔드포인트 별 요청 수, 상태 코드, 처리량, p50/p95/p99 지연 시간 (+ 앱 /metrics 의 단계별 평균 소요 시간)
+
+from datetime import datetime, timedelta
+from jose import jwt
+from sqlalchemy import create_engine, text
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import random
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SITUATIONS = ["go-shopping", "talk-with-friends", "travel", "learn-alphabet", "airport", "random-course"]
+MESSAGES = [
+    "안녕하세요!",
+    "저는 한국어를 공부하고 있어요.",
+    "이거 얼마예요? 조금 깎아 주세요.",
+    "공항까지 가는 버스가 어디에 있어요?",
+    "어제 친구랑 맛있는 떡볶이를 먹었어요.",
+    "천천히 다시 말해 주세요.",
+]
+
+# 엔드포인트 별 지연 시간 / 상태 코드 기록
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+        self.sessions = 0
+        self.turns = 0
+
+    def add(self, name: str, seconds: Optional[float], status: str):
+        counts = self.statuses.setdefault(name, {})
+        counts[status] = counts.get(status, 0) + 1
+        if seconds is not None and status.startswith("2"):
+            self.latencies.setdefault(name, []).append(seconds)
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+# 1초 분량 16kHz 모노 WAV (요청마다 내용이 달라 STT 캐시에 걸리지 않음)
+def make_audio(seconds: float = 1.0, rate: int = 16000) -> bytes:
+    frames = struct.pack(
+        f"<{int(seconds * rate)}h",
+        *(random.randint(-2000, 2000) for _ in range(int(seconds * rate)))
+    )
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as audio:
+        audio.setnchannels(1)
+        audio.setsampwidth(2)
+        audio.setframerate(rate)
+        audio.writeframes(frames)
+    return buffer.getvalue()
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+# 테스트 사용자 추가 (온보딩 완료 상태, 이미 있으면 건너뜀)
+def seed_users(database_url: str, user_ids: List[str]):
+    engine = create_engine(database_url)
+    with engine.begin() as connection:
+        existing = {
+            row[0] for row in connection.execute(
+                text("SELECT user_id FROM users WHERE user_id LIKE 'bench-%'")
+            )
+        }
+        rows = [
+            {
+                "user_id": user_id,
+                "email": f"{user_id}@bench.local",
+                "name": user_id,
+                "created_at": datetime.now(),
+                "onboarding_info": json.dumps(["Beginner", "travel", "20s"])
+            }
+            for user_id in user_ids if user_id not in existing
+        ]
+        if rows:
+            connection.execute(
+                text(
+                    "INSERT INTO users (user_id, email, name, created_at, onboarding, onboarding_info) "
+                    "VALUES (:user_id, :email, :name, :created_at, 1, :onboarding_info)"
+                ),
+                rows
+            )
+    engine.dispose()
+
+def access_token(user_id: str, secret_key: str) -> str:
+    return jwt.encode(
+        {"sub": user_id, "exp": datetime.now() + timedelta(days=1)},
+        secret_key,
+        algorithm="HS256"
+    )
+
+async def timed_request(client: httpx.AsyncClient, recorder: Recorder, name: str, method: str, url: str, **kwargs):
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except httpx.HTTPError as e:
+        recorder.add(name, None, type(e).__name__)
+        return None
+    recorder.add(name, time.perf_counter() - started, str(response.status_code))
+    return response
+
+# SSE 스트리밍 턴 (첫 delta 까지 시간은 chat_stream_ttft 로 따로 기록), 반환 : (chat_id, 대화 종료 여부, 상태)
+async def stream_turn(client: httpx.AsyncClient, recorder: Recorder, payload: dict, headers: dict):
+    started = time.perf_counter()
+    chat_id, end, status = payload.get("chat_id"), False, None
+    first_delta = True
+    try:
+        async with client.stream("POST", "/api/ai/chat/stream", json=payload, headers=headers) as response:
+            status = str(response.status_code)
+            if response.status_code != 200:
+                await response.aread()
+            else:
+                event = None
+                async for line in response.aiter_lines():
+                    if line.startswith("event:"):
+                        event = line[6:].strip()
+                    elif line.startswith("data:"):
+                        data = json.loads(line[5:])
+                        if event == "meta":
+                            chat_id = data["chat_id"]
+                        elif event == "delta" and first_delta:
+                            first_delta = False
+                            recorder.add("chat_stream_ttft", time.perf_counter() - started, status)
+                        elif event == "done":
+                            end = data["end"]
+                        elif event == "error":
+                            status = str(data.get("status", 500))
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    status = status or "error"
+    recorder.add("chat_stream", time.perf_counter() - started, status)
+    return chat_id, end, status
+
+# 가상 사용자 1명 : 대화 시작 -> 최대 max_turns 턴 (음성/스트리밍 섞어서) -> 목록/내역 조회 반복
+async def virtual_user(client: httpx.AsyncClient, recorder: Recorder, args, token: str, deadline: float):
+    headers = {"Authorization": f"Bearer {token}"}
+    while time.monotonic() < deadline:
+        situation = random.choice(SITUATIONS)
+        chat_id = None
+        for turn in range(args.max_turns):
+            if time.monotonic() >= deadline:
+                return
+            payload = {"situation": situation, "message": random.choice(MESSAGES)}
+            if chat_id:
+                payload["chat_id"] = chat_id
+
+            roll = random.random()
+            ended = False
+            if chat_id and roll < args.stc_ratio:
+                response = await timed_request(
+                    client, recorder, "stc", "POST", "/api/ai/stc",
+                    headers=headers,
+                    data={"situation": situation, "chat_id": chat_id},
+                    files={"file": ("turn.wav", make_audio(), "audio/wav")}
+                )
+                ok = response is not None and response.status_code == 200
+                # 이전 턴에서 대화가 종료된 경우
+                ended = response is not None and response.status_code == 404
+            elif roll < args.stc_ratio + args.stream_ratio:
+                previous_chat_id = chat_id
+                chat_id, ended, status = await stream_turn(client, recorder, payload, headers)
+                ok = status == "200"
+                ended = ended or (status == "404" and previous_chat_id is not None)
+            else:
+                response = await timed_request(client, recorder, "chat", "POST", "/api/ai/chat", headers=headers, json=payload)
+                ok = response is not None and response.status_code == 200
+                ended = response is not None and response.status_code == 404 and chat_id is not None
+                if ok:
+                    chat_id = response.json()["chat_id"]
+
+            if ok:
+                recorder.turns += 1
+            if ended or (not ok and chat_id is None):
+                break
+            if args.think_time:
+                await asyncio.sleep(random.uniform(0, args.think_time))
+
+        recorder.sessions += 1
+        await timed_request(client, recorder, "chatlist", "GET", "/api/chatlist", headers=headers)
+        if chat_id:
+            await timed_request(client, recorder, "chatlist_detail", "GET", f"/api/chatlist/detail/{chat_id}", headers=headers)
+
+# 앱 /metrics 의 단계별 평균 소요 시간 (ms, 워커 1개일 때만 전체 값)
+async def server_stages(client: httpx.AsyncClient) -> Dict[str, dict]:
+    try:
+        from prometheus_client.parser import text_string_to_metric_families
+        response = await client.get("/metrics")
+        response.raise_for_status()
+    except Exception:
+        return {}
+    totals: Dict[str, dict] = {}
+    for family in text_string_to_metric_families(response.text):
+        if family.name != "kolang_stage_seconds":
+            continue
+        for sample in family.samples:
+            stage = totals.setdefault(sample.labels.get("stage"), {"count": 0, "sum": 0.0})
+            if sample.name.endswith("_count"):
+                stage["count"] = int(sample.value)
+            elif sample.name.endswith("_sum"):
+                stage["sum"] = sample.value
+    return {
+        name: {"count": stage["count"], "avg_ms": stage["sum"] / stage["count"] * 1000}
+        for name, stage in sorted(totals.items()) if stage["count"]
+    }
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    endpoints = {}
+    for name in sorted(recorder.statuses):
+        values = recorder.latencies.get(name, [])
+        counts = recorder.statuses[name]
+        endpoints[name] = {
+            "requests": sum(counts.values()),
+            "statuses": counts,
+            "rps": sum(counts.values()) / elapsed,
+            **({
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+                "max_ms": max(values) * 1000
+            } if values else {})
+        }
+    requests = sum(
+        endpoint["requests"] for name, endpoint in endpoints.items() if name != "chat_stream_ttft"
+    )
+    return {
+        "elapsed_s": elapsed,
+        "requests": requests,
+        "rps": requests / elapsed,
+        "sessions": recorder.sessions,
+        "turns": recorder.turns,
+        "turns_per_s": recorder.turns / elapsed,
+        "endpoints": endpoints
+    }
+
+def print_report(result: dict, baseline: Optional[dict] = None):
+    print(f"\n{result['requests']} requests in {result['elapsed_s']:.1f}s "
+          f"({result['rps']:.1f} req/s, {result['turns_per_s']:.2f} turns/s, {result['sessions']} sessions)")
+    print(f"{'endpoint':<18}{'reqs':>7}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  statuses")
+    for name, endpoint in result["endpoints"].items():
+        latency = "".join(
+            f"{endpoint[key]:>9.0f}" if key in endpoint else f"{'-':>9}"
+            for key in ("p50_ms", "p95_ms", "p99_ms", "max_ms")
+        )
+        print(f"{name:<18}{endpoint['requests']:>7}{endpoint['rps']:>8.1f}{latency}  {endpoint['statuses']}")
+
+    if result.get("server_stages"):
+        print("\nserver stages (avg ms): " + ", ".join(
+            f"{name}={stage['avg_ms']:.1f}" for name, stage in result["server_stages"].items()
+        ))
+
+    if baseline:
+        print(f"\nvs baseline ({baseline.get('label') or baseline.get('commit', '')[:10]}):")
+        print(f"  throughput {change(result['rps'], baseline['summary']['rps'])}")
+        for name, endpoint in result["endpoints"].items():
+            before = baseline["summary"]["endpoints"].get(name)
+            if not before:
+                continue
+            diffs = ", ".join(
+                f"{key[:-3]} {change(endpoint[key], before[key])}"
+                for key in ("p50_ms", "p95_ms", "p99_ms") if key in endpoint and key in before
+            )
+            print(f"  {name:<18}{diffs}")
+
+def change(current: float, before: float) -> str:
+    if not before:
+        return f"{current:.1f}"
+    return f"{current:.1f} ({(current - before) / before * 100:+.1f}%)"
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+async def wait_ready(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                response = await client.get(url)
+                if response.status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready in {timeout}s")
+
+# 대역 서버 + 앱 실행 (SQLite 는 매번 새 DB 로 마이그레이션)
+async def start_local(args) -> List[subprocess.Popen]:
+    processes = []
+    fake_port, app_port = free_port(), free_port()
+    fake_args = [
+        "--port", str(fake_port),
+        "--latency", str(args.fake_latency),
+        "--token-rate", str(args.fake_token_rate),
+        "--error-rate", str(args.fake_error_rate),
+        "--rate-limit-rate", str(args.fake_rate_limit_rate),
+        "--hang-rate", str(args.fake_hang_rate),
+        "--hang-seconds", str(args.fake_hang_seconds),
+        "--end-after", str(args.fake_end_after)
+    ]
+    processes.append(subprocess.Popen([sys.executable, "-m", "bench.fake_openai", *fake_args], cwd=ROOT))
+
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": args.database_url,
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{fake_port}/v1",
+        "OPENAI_API_KEY": "fake",
+        "SECRET_KEY": args.secret_key,
+        # 가상 사용자는 사람보다 훨씬 빠르게 턴을 보내므로 사용자별 빈도 제한은 끔 (--app-env 로 덮어쓰기 가능)
+        "LLM_USER_RATE": "0",
+    })
+    env.setdefault("PROMPT_PATH", os.path.join(ROOT, "prompts"))
+    env.setdefault("SUMMARY_PATH", os.path.join(ROOT, "prompts", "summary.txt"))
+    env.setdefault("FEEDBACK_PATH", os.path.join(ROOT, "prompts", "feedback.txt"))
+    for item in args.app_env:
+        key, _, value = item.partition("=")
+        env[key] = value
+
+    if args.database_url.startswith("sqlite") and os.path.exists(args.database_path):
+        os.remove(args.database_path)
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+
+    processes.append(subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(app_port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=ROOT, env=env
+    ))
+    args.target = f"http://127.0.0.1:{app_port}"
+    await wait_ready(f"http://127.0.0.1:{fake_port}/v1/models")
+    await wait_ready(f"{args.target}/")
+    return processes
+
+async def run(args) -> dict:
+    processes = []
+    if not args.target:
+        processes = await start_local(args)
+    try:
+        user_ids = [f"bench-{index}" for index in range(args.users)]
+        seed_users(args.database_url, user_ids)
+
+        recorder = Recorder()
+        limits = httpx.Limits(max_connections=args.users * 2, max_keepalive_connections=args.users * 2)
+        async with httpx.AsyncClient(base_url=args.target, timeout=args.timeout, limits=limits) as client:
+            started = time.monotonic()
+            deadline = started + args.duration
+
+            async def start_user(index: int, user_id: str):
+                # ramp_up 초 동안 가상 사용자를 나눠서 시작
+                await asyncio.sleep(args.ramp_up * index / args.users)
+                await virtual_user(client, recorder, args, access_token(user_id, args.secret_key), deadline)
+
+            await asyncio.gather(*[start_user(index, user_id) for index, user_id in enumerate(user_ids)])
+            elapsed = time.monotonic() - started
+            stages = await server_stages(client)
+
+        summary = summarize(recorder, elapsed)
+        return {
+            "label": args.label,
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "config": {
+                key: value for key, value in vars(args).items()
+                if key not in ("secret_key", "compare", "output")
+            },
+            "summary": summary,
+            "server_stages": stages
+        }
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            # 응답 없이 대기 중인 요청(hang 주입)이 있으면 정상 종료가 끝나지 않으므로 강제 종료
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Kolang end-to-end load test")
+    parser.add_argument("--users", type=int, default=20, help="동시 가상 사용자 수")
+    parser.add_argument("--duration", type=float, default=60, help="측정 시간 (초)")
+    parser.add_argument("--ramp-up", type=float, default=5, help="가상 사용자 시작 분산 시간 (초)")
+    parser.add_argument("--max-turns", type=int, default=8, help="대화 1개 최대 턴 수")
+    parser.add_argument("--stc-ratio", type=float, default=0.2, help="음성 턴 비율 (/api/ai/stc)")
+    parser.add_argument("--stream-ratio", type=float, default=0.3, help="스트리밍 턴 비율 (/api/ai/chat/stream)")
+    parser.add_argument("--think-time", type=float, default=0, help="턴 사이 최대 대기 시간 (초)")
+    parser.add_argument("--timeout", type=float, default=120, help="요청 타임아웃 (초)")
+    parser.add_argument("--target", help="실행 중인 서버 URL (없으면 대역 서버 + 앱을 직접 실행)")
+    parser.add_argument("--database-url", help="테스트 DB (기본 : 임시 디렉터리의 SQLite)")
+    parser.add_argument("--secret-key", default=os.environ.get("SECRET_KEY", "bench-secret"))
+    parser.add_argument("--workers", type=int, default=1, help="앱 uvicorn 워커 수")
+    parser.add_argument("--app-env", action="append", default=[], metavar="KEY=VALUE", help="앱 환경 변수")
+    parser.add_argument("--fake-latency", type=float, default=0.4)
+    parser.add_argument("--fake-token-rate", type=float, default=80)
+    parser.add_argument("--fake-error-rate", type=float, default=0)
+    parser.add_argument("--fake-rate-limit-rate", type=float, default=0)
+    parser.add_argument("--fake-hang-rate", type=float, default=0)
+    parser.add_argument("--fake-hang-seconds", type=float, default=120)
+    parser.add_argument("--fake-end-after", type=int, default=12)
+    parser.add_argument("--label", default="", help="결과 이름 (비교 출력용)")
+    parser.add_argument("--output", help="결과 JSON 저장 경로")
+    parser.add_argument("--compare", help="비교할 이전 결과 JSON")
+    args = parser.parse_args(argv)
+
+    args.database_path = None
+    if not args.database_url:
+        if args.target:
+            parser.error("--target 사용 시 --database-url 필요 (테스트 사용자 추가)")
+        args.database_path = os.path.join(tempfile.gettempdir(), "kolang-bench.db")
+        args.database_url = f"sqlite:///{args.database_path}"
+    elif args.database_url.startswith("sqlite:///"):
+        args.database_path = args.database_url[len("sqlite:///"):]
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+
+    result = asyncio.run(run(args))
+    print_report({**result["summary"], "server_stages": result["server_stages"]}, baseline)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as file:
+            json.dump(result, file, indent=2, ensure_ascii=False)
+        print(f"\nsaved {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+# 요청 처리 중 CPU 를 쓰는 구간 마이크로벤치마크 (DB / OpenAI 호출 없이 합성 데이터로 측정)
+# 프롬프트 렌더링, 이전 대화 구성, 요약용 대화 문자열, 응답 직렬화 (Pydantic / orjson), JWT 검증
+#
+# python -m bench.micro                               # 전체 실행 후 bench/results/micro-<commit>.json 저장 (git 에서 제외)
+# python -m bench.micro --compare bench/results/micro-<이전 commit>.json --fail-on-regression
+# python -m bench.micro --filter history --quick      # 일부만 빠르게
+#
+# 시간 : 호출 1회 (min / median, µs), 메모리 : 호출 1회 중 최대 할당량 (tracemalloc peak, KB)
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 앱 모듈 import 시 필요한 설정 (이미 있으면 그대로 사용)
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ.setdefault("PROMPT_PATH", os.path.join(ROOT, "prompts"))
+os.environ.setdefault("SUMMARY_PATH", os.path.join(ROOT, "prompts", "summary.txt"))
+os.environ.setdefault("FEEDBACK_PATH", os.path.join(ROOT, "prompts", "feedback.txt"))
+
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import timeit
+import tracemalloc
+import uuid
+
+import orjson
+from jose import jwt
+from pydantic import TypeAdapter
+
+from routes.auth import ALGORITHM, SECRET_KEY, create_access_token
+from routes.schemas import ChatDetailResponse, ChatListResponse
+from services.context import load_encoding
+from services.conversation import assemble_messages, format_conversation, read_situation_prompt
+from services.prompts import registry as prompt_registry
+from services.state import CachedMessage
+
+RESULTS_DIR = os.path.join(ROOT, "bench", "results")
+
+# 대화 길이 (메시지 수), 채팅 목록 길이
+MESSAGE_SCALES = (10, 100, 500)
+CHATLIST_SCALES = (10, 50)
+
+SAMPLE_MESSAGES = [
+    "안녕하세요! 오늘 뭐 하세요?",
+    "저는 주말에 친구랑 명동에서 쇼핑을 했어요. 사람이 정말 많았어요.",
+    "공항에서 인천 시내까지 가는 리무진 버스는 어디에서 타요?",
+    "이거 좀 더 작은 사이즈 있어요? 그리고 계산은 카드로 해도 돼요?",
+    "좋아요. 그럼 다음에 같이 한국 음식 먹으러 가요!",
+]
+
+def make_messages(count: int) -> List[CachedMessage]:
+    return [
+        CachedMessage(index + 1, random.choice(SAMPLE_MESSAGES), index % 2 == 1)
+        for index in range(count)
+    ]
+
+def make_chat_detail(count: int) -> dict:
+    chat_id = str(uuid.uuid4())
+    now = datetime.now()
+    return {
+        "user_id": "bench-user",
+        "chat_id": chat_id,
+        "situation": "airport",
+        "summary": "공항에서 길 묻기",
+        "messages": [
+            {
+                "message_id": index + 1,
+                "chat_id": chat_id,
+                "message": random.choice(SAMPLE_MESSAGES),
+                "created_at": now + timedelta(seconds=index),
+                "is_answer": index % 2 == 1
+            }
+            for index in range(count)
+        ],
+        "next_cursor": None
+    }
+
+def make_chat_list(count: int) -> List[dict]:
+    now = datetime.now()
+    return [
+        {
+            "user_id": "bench-user",
+            "chat_id": str(uuid.uuid4()),
+            "summary": "공항에서 길 묻기",
+            "feedback": {"grammar_points": SAMPLE_MESSAGES[1], "study_tips": SAMPLE_MESSAGES[3]},
+            "situation": "airport",
+            "created_at": now - timedelta(hours=index),
+            "completed_at": now - timedelta(hours=index) + timedelta(minutes=10),
+            "active": False
+        }
+        for index in range(count)
+    ]
+
+def cases() -> Dict[str, Callable[[], object]]:
+    prompt_registry.load()
+    # 서버 시작 시와 같이 토큰 계산 인코딩 로드 (받을 수 없으면 추정치로 측정)
+    load_encoding()
+    system_prompt = read_situation_prompt("airport", "Beginner", "travel", "20s")
+    chat_list_adapter = TypeAdapter(List[ChatListResponse])
+    token = create_access_token({"sub": "bench-user"})
+
+    def render_uncached():
+        prompt_registry.rendered.clear()
+        return read_situation_prompt("airport", "Beginner", "travel", "20s")
+
+    suite = {
+        "read_situation_prompt[cached]": lambda: read_situation_prompt("airport", "Beginner", "travel", "20s"),
+        "read_situation_prompt[uncached]": render_uncached,
+        "jwt_decode": lambda: jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]),
+    }
+    for count in MESSAGE_SCALES:
+        messages = make_messages(count)
+        detail = make_chat_detail(count)
+        suite[f"history_assembly[n={count}]"] = (
+            lambda messages=messages: assemble_messages(system_prompt, messages, "이전 대화 요약", "안녕하세요")
+        )
+        suite[f"format_conversation[n={count}]"] = lambda messages=messages: format_conversation(messages)
+        suite[f"chat_detail_pydantic[n={count}]"] = (
+            lambda detail=detail: ChatDetailResponse.model_validate(detail).model_dump_json()
+        )
+        suite[f"chat_detail_orjson[n={count}]"] = lambda detail=detail: orjson.dumps(detail)
+    for count in CHATLIST_SCALES:
+        chats = make_chat_list(count)
+        suite[f"chat_list_pydantic[n={count}]"] = (
+            lambda chats=chats: chat_list_adapter.dump_json(chat_list_adapter.validate_python(chats))
+        )
+        suite[f"chat_list_orjson[n={count}]"] = lambda chats=chats: orjson.dumps(chats)
+    return suite
+
+def measure(func: Callable[[], object], repeat: int, min_time: float) -> dict:
+    # 첫 호출 비용(지연 로딩 등) 제외
+    func()
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    times = [elapsed / number * 1e6 for elapsed in timer.repeat(repeat, number)]
+
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "min_us": min(times),
+        "median_us": statistics.median(times),
+        "peak_kb": (peak - before) / 1024,
+        "loops": number
+    }
+
+def git_commit() -> str:
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short=12", "HEAD"], cwd=ROOT, text=True).strip()
+        dirty = subprocess.run(["git", "diff", "--quiet", "HEAD"], cwd=ROOT).returncode != 0
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if dirty else commit
+
+# 이전 결과와 비교, 기준(threshold %)보다 느려지거나 메모리를 더 쓰면 회귀로 표시
+def compare(results: Dict[str, dict], baseline: dict, threshold: float) -> List[str]:
+    regressions = []
+    print(f"\nvs {baseline['commit']}:")
+    for name, result in results.items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        time_change = (result["min_us"] - before["min_us"]) / before["min_us"] * 100
+        peak_change = (
+            (result["peak_kb"] - before["peak_kb"]) / before["peak_kb"] * 100
+            if before["peak_kb"] > 0 else 0.0
+        )
+        regressed = time_change > threshold or peak_change > threshold
+        if regressed:
+            regressions.append(name)
+        print(
+            f"  {name:<36}{before['min_us']:>10.1f} -> {result['min_us']:>10.1f} us ({time_change:+6.1f}%)"
+            f"  peak {peak_change:+6.1f}%{'  REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kolang microbenchmarks")
+    parser.add_argument("--filter", default="", help="이름에 포함된 항목만 실행")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="반복 1회 최소 측정 시간 (초)")
+    parser.add_argument("--quick", action="store_true", help="repeat 3, min-time 0.05")
+    parser.add_argument("--output", help="결과 저장 경로 (기본 : bench/results/micro-<commit>.json)")
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--compare", help="비교할 이전 결과 JSON")
+    parser.add_argument("--threshold", type=float, default=10, help="회귀 판단 기준 (%%)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="회귀가 있으면 종료 코드 1")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.repeat, args.min_time = 3, 0.05
+
+    random.seed(0)
+    results = {}
+    for name, func in cases().items():
+        if args.filter not in name:
+            continue
+        results[name] = measure(func, args.repeat, args.min_time)
+        result = results[name]
+        print(f"{name:<36}{result['min_us']:>10.1f} us (median {result['median_us']:.1f})  peak {result['peak_kb']:.1f} KB")
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results
+    }
+
+    if not args.no_save:
+        output = args.output or os.path.join(RESULTS_DIR, f"micro-{commit}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"\nsaved {output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,64 +1,410 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, desc, func, select, update
 from fastapi import HTTPException
-from typing import List
+from typing import Any, List, Optional, Tuple
+from datetime import datetime, timedelta
 
 from db.models import ChatList, Message, User
-from routes.schemas import ChatDetailResponse
+from db.pagination import after_cursor, encode_cursor
+from services.metrics import timed
+from services.usage import TokenUsage
 
 # chat.py + stc.py
 
-# 온보딩 정보 불러오기
-def get_user_onboarding(db: Session, userid: str):
-    user = db.query(User).filter(User.user_id == userid).first()
-    if not user:
-        raise HTTPException(
-            status_code=404,
-            detail="사용자 정보가 없습니다."
+# 채팅방 조회 (active_only=True 이면 진행 중인 대화만)
+@timed("db.get_chat")
+def get_chat(
+    db: Session,
+    chat_id: str,
+    active_only: bool = False,
+    user_id: Optional[str] = None
+) -> Optional[ChatList]:
+    query = db.query(ChatList).filter(ChatList.chat_id == chat_id)
+    # user_id 를 지정하면 해당 사용자의 대화만
+    if user_id is not None:
+        query = query.filter(ChatList.user_id == user_id)
+    if active_only:
+        query = query.filter(ChatList.active == True)
+    return query.first()
+
+# 채팅 메시지 조회 (오름차순 정렬, after_id 이후 메시지만 조회 가능)
+@timed("db.get_chat_messages")
+def get_chat_messages(db: Session, chat_id: str, after_id: Optional[int] = None) -> List[Message]:
+    query = db.query(Message).filter(Message.chat_id == chat_id)
+    if after_id is not None:
+        query = query.filter(Message.message_id > after_id)
+    # 같은 턴의 사용자 / AI 메시지는 같은 트랜잭션에서 저장되어 created_at 이 같을 수 있으므로 message_id 로 순서 고정
+    return query.order_by(Message.created_at, Message.message_id).all()
+
+# 채팅방 토큰 사용량 누적 (동시에 다른 작업이 갱신해도 유실되지 않도록 SQL 에서 더함)
+def usage_increments(usage: Optional[TokenUsage]) -> dict:
+    if usage is None:
+        return {}
+    return {
+        "prompt_tokens": ChatList.prompt_tokens + usage.prompt_tokens,
+        "completion_tokens": ChatList.completion_tokens + usage.completion_tokens,
+        "cached_tokens": ChatList.cached_tokens + usage.cached_tokens
+    }
+
+# 대화 턴 저장 (한 트랜잭션)
+# 사용자 메시지 + AI 응답 저장, new_chat_situation 이 있으면 채팅방 생성, complete=True 이면 대화 종료 처리
+# usage 가 있으면 AI 응답 메시지에 기록하고 채팅방 사용량에 누적
+# 실패 시 롤백하므로 모델 응답 없이 채팅방만 남는 경우가 없음
+# 반환 : (사용자 message_id, AI 응답 message_id)
+@timed("db.save_turn")
+def save_turn(
+    db: Session,
+    chat_id: str,
+    user_id: str,
+    user_message: str,
+    assistant_message: str,
+    complete: bool = False,
+    new_chat_situation: Optional[str] = None,
+    usage: Optional[TokenUsage] = None
+):
+    now = datetime.now()
+    # 사용자 / 대화 상태는 워커 별 캐시 기준이라 다른 워커에서 바뀌었을 수 있으므로 저장 시 DB 기준으로 다시 확인
+    active_user = select(User.user_id).where(User.user_id == user_id, User.deleted_at.is_(None))
+    try:
+        if new_chat_situation is not None:
+            if db.execute(active_user).first() is None:
+                raise HTTPException(status_code=404, detail="사용자 정보를 찾을 수 없습니다.")
+            db.add(ChatList(
+                chat_id=chat_id,
+                user_id=user_id,
+                situation=new_chat_situation,
+                summary="New conversation",
+                created_at=now,
+                completed_at=now if complete else None,
+                active=not complete,
+                # 대화를 종료한 워커가 요약/피드백 작업을 선점
+                summary_attempts=1 if complete else 0,
+                summary_claimed_at=now if complete else None,
+                **(usage or TokenUsage())._asdict()
+            ))
+        else:
+            values = usage_increments(usage)
+            if complete:
+                values.update(active=False, completed_at=now, summary_attempts=1, summary_claimed_at=now)
+            # 진행 중인 대화인지 확인하면서 갱신 (종료된 대화, 다른 사용자의 대화, 탈퇴한 사용자는 0건)
+            # 행 잠금으로 다른 워커의 종료 처리와 순서가 정해짐
+            result = db.execute(
+                update(ChatList).where(
+                    ChatList.chat_id == chat_id,
+                    ChatList.user_id.in_(active_user),
+                    ChatList.active == True
+                ).values(**(values or {"active": True}))
+            )
+            if result.rowcount != 1:
+                raise HTTPException(status_code=404, detail="유효하지 않은 대화입니다.")
+
+        user_row = Message(
+            chat_id=chat_id,
+            user_id=user_id,
+            message=user_message,
+            is_answer=False
         )
-    if not user.onboarding or not user.onboarding_info:
-        raise HTTPException(
-            status_code=400,
-            detail="사용자의 온보딩 정보를 불러올 수 없습니다."
+        assistant_row = Message(
+            chat_id=chat_id,
+            user_id=user_id,
+            message=assistant_message,
+            is_answer=True,
+            **(usage._asdict() if usage is not None else {})
         )
-    
-    return user.onboarding_info
+        # 채팅방 -> 메시지 순서로 한 번에 flush
+        db.add_all([user_row, assistant_row])
+
+        # 커밋 후에는 속성이 만료되므로 flush 시점에 message_id 확보
+        db.flush()
+        message_ids = (user_row.message_id, assistant_row.message_id)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return message_ids
 
+# 누적 대화 요약 저장 (upto : 요약에 포함된 마지막 message_id, usage : 요약 생성 토큰 사용량)
+@timed("db.update_context_summary")
+def update_context_summary(
+    db: Session,
+    chat_id: str,
+    context_summary: str,
+    upto: int,
+    usage: Optional[TokenUsage] = None
+):
+    db.execute(
+        update(ChatList).where(
+            ChatList.chat_id == chat_id
+        ).values(
+            context_summary=context_summary,
+            context_summary_upto=upto,
+            **usage_increments(usage)
+        )
+    )
+    db.commit()
+
+# 요약, 피드백 저장 (usage : 요약/피드백 생성 토큰 사용량)
+@timed("db.update_chat_feedback")
+def update_chat_feedback(
+    db: Session,
+    chat_id: str,
+    summary: str,
+    feedback: dict,
+    usage: Optional[TokenUsage] = None
+):
+    db.execute(
+        update(ChatList).where(
+            ChatList.chat_id == chat_id
+        ).values(
+            summary=summary,
+            feedback=feedback,
+            **usage_increments(usage)
+        )
+    )
+    db.commit()
+
+# 요약/피드백 작업 선점 (조건부 UPDATE 라 여러 워커 중 하나만 성공)
+# 종료된 채팅방이고, 피드백이 없고, 실행 횟수가 남아 있고, 다른 워커의 선점이 없거나 만료된 경우에만 선점
+@timed("db.claim_summary")
+def claim_summary(db: Session, chat_id: str, max_attempts: int, claim_ttl: float) -> bool:
+    now = datetime.now()
+    result = db.execute(
+        update(ChatList).where(
+            ChatList.chat_id == chat_id,
+            ChatList.active == False,
+            ChatList.feedback.is_(None),
+            ChatList.summary_attempts < max_attempts,
+            (ChatList.summary_claimed_at.is_(None))
+            | (ChatList.summary_claimed_at < now - timedelta(seconds=claim_ttl))
+        ).values(
+            summary_attempts=ChatList.summary_attempts + 1,
+            summary_claimed_at=now
+        )
+    )
+    db.commit()
+    return result.rowcount == 1
+
+# 요약/피드백 작업 선점 해제 (실패 / 서버 종료 시, 다음 상태 조회에서 다시 선점 가능)
+@timed("db.release_summary")
+def release_summary(db: Session, chat_id: str):
+    db.execute(
+        update(ChatList).where(
+            ChatList.chat_id == chat_id,
+            ChatList.feedback.is_(None)
+        ).values(summary_claimed_at=None)
+    )
+    db.commit()
 
 
 # chatlist.py
 
-# 최근 채팅방 목록 조회
-def get_user_chats(db: Session, user_id: int, limit: int = 10) -> List[ChatList]:
-    chats = db.query(ChatList).filter(
-        ChatList.user_id == user_id
-    ).order_by(
-        desc(ChatList.created_at)
-    ).limit(limit).all()
+# 목록/내역 조회는 ORM 객체 대신 필요한 컬럼만 조회해 dict 로 반환 (응답에서 바로 직렬화)
+CHAT_LIST_COLUMNS = (
+    ChatList.user_id,
+    ChatList.chat_id,
+    ChatList.summary,
+    ChatList.feedback,
+    ChatList.situation,
+    ChatList.created_at,
+    ChatList.completed_at,
+    ChatList.active
+)
+
+# 최근 채팅방 목록 조회 (최신순, cursor 이후 limit 개)
+# 반환 : (채팅방 목록, 다음 페이지 커서)
+@timed("db.get_user_chats")
+async def get_user_chats(
+    db: AsyncSession,
+    user_id: str,
+    limit: int = 10,
+    cursor: Optional[Tuple[datetime, Any]] = None
+) -> Tuple[List[dict], Optional[str]]:
+    query = select(*CHAT_LIST_COLUMNS).where(ChatList.user_id == user_id)
+    if cursor is not None:
+        query = query.where(after_cursor(ChatList.created_at, ChatList.chat_id, cursor, descending=True))
+
+    # 다음 페이지 존재 여부 확인을 위해 1개 더 조회
+    result = await db.execute(
+        query.order_by(
+            desc(ChatList.created_at),
+            desc(ChatList.chat_id)
+        ).limit(limit + 1)
+    )
+    chats = [dict(row) for row in result.mappings()]
     
-    if not chats:
+    if not chats and cursor is None:
         raise HTTPException(status_code=404, detail="No chats found")
     
-    return chats
+    next_cursor = None
+    if len(chats) > limit:
+        chats = chats[:limit]
+        next_cursor = encode_cursor(chats[-1]["created_at"], chats[-1]["chat_id"])
+    return chats, next_cursor
 
-def get_chat_detail(db: Session, chat_id: str, current_user: User) -> ChatDetailResponse:
+# 채팅 내역 조회 (메시지 오름차순, cursor 이후 limit 개)
+# 채팅방 정보와 메시지를 outer join 한 번으로 조회 (메시지가 없어도 채팅방 행 1개 반환)
+@timed("db.get_chat_detail")
+async def get_chat_detail(
+    db: AsyncSession,
+    chat_id: str,
+    user_id: str,
+    limit: int = 100,
+    cursor: Optional[Tuple[datetime, Any]] = None
+) -> dict:
+    join_condition = Message.chat_id == ChatList.chat_id
+    if cursor is not None:
+        join_condition = and_(join_condition, after_cursor(Message.created_at, Message.message_id, cursor))
 
-    # 채팅방 정보 조회 (chat_id)
-    chat = db.query(ChatList).filter(ChatList.chat_id == chat_id).first()
-    if not chat:
+    result = await db.execute(
+        select(
+            ChatList.situation,
+            ChatList.summary,
+            Message.message_id,
+            Message.message,
+            Message.created_at,
+            Message.is_answer
+        ).select_from(
+            ChatList
+        ).outerjoin(
+            Message, join_condition
+        ).where(
+            # 다른 사용자의 채팅방은 없는 것과 같이 404
+            ChatList.chat_id == chat_id,
+            ChatList.user_id == user_id
+        ).order_by(
+            Message.created_at,
+            Message.message_id
+        ).limit(limit + 1)
+    )
+    rows = result.all()
+    if not rows:
         raise HTTPException(status_code=404, detail="No chats found")
+
+    messages = [
+        {
+            "message_id": row.message_id,
+            "chat_id": chat_id,
+            "message": row.message,
+            "created_at": row.created_at,
+            "is_answer": row.is_answer
+        }
+        for row in rows
+        if row.message_id is not None
+    ]
+
+    next_cursor = None
+    if len(messages) > limit:
+        messages = messages[:limit]
+        next_cursor = encode_cursor(messages[-1]["created_at"], messages[-1]["message_id"])
     
-    # 메시지 내역 조회 (오름차순 정렬)
-    messages = db.query(Message).filter(
-        Message.chat_id == chat_id
-    ).order_by(
-        Message.created_at
-    ).all()
-    
-    return ChatDetailResponse(
-        user_id=current_user.user_id,
-        chat_id=chat.chat_id,
-        situation=chat.situation,
-        summary=chat.summary,
-        messages=messages if messages else []
-    )
\ No newline at end of file
+    return {
+        "user_id": user_id,
+        "chat_id": chat_id,
+        "situation": rows[0].situation,
+        "summary": rows[0].summary,
+        "messages": messages,
+        "next_cursor": next_cursor
+    }
+
+
+# admin.py
+
+# 토큰 사용량 집계 기준
+USAGE_GROUPS = {
+    "user": ChatList.user_id,
+    "situation": ChatList.situation
+}
+
+def usage_filters(
+    user_id: Optional[str],
+    since: Optional[datetime],
+    until: Optional[datetime]
+) -> list:
+    filters = []
+    if user_id is not None:
+        filters.append(ChatList.user_id == user_id)
+    if since is not None:
+        filters.append(ChatList.created_at >= since)
+    if until is not None:
+        filters.append(ChatList.created_at < until)
+    return filters
+
+# 사용자 / 상황 별 토큰 사용량 합계 (사용량 많은 순, 채팅방 생성 시각 기준 기간)
+@timed("db.get_usage_summary")
+async def get_usage_summary(
+    db: AsyncSession,
+    group_by: str,
+    user_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = 50
+) -> List[dict]:
+    key = USAGE_GROUPS[group_by]
+    prompt_tokens = func.sum(ChatList.prompt_tokens)
+    completion_tokens = func.sum(ChatList.completion_tokens)
+    result = await db.execute(
+        select(
+            key.label("key"),
+            func.count().label("chats"),
+            prompt_tokens.label("prompt_tokens"),
+            completion_tokens.label("completion_tokens"),
+            func.sum(ChatList.cached_tokens).label("cached_tokens")
+        ).where(
+            *usage_filters(user_id, since, until)
+        ).group_by(
+            key
+        ).order_by(
+            desc(prompt_tokens + completion_tokens)
+        ).limit(limit)
+    )
+    return [dict(row) for row in result.mappings()]
+
+# 토큰 사용량이 많은 채팅방 (턴 수, 가장 큰 프롬프트 크기 포함)
+@timed("db.get_top_usage_chats")
+async def get_top_usage_chats(
+    db: AsyncSession,
+    user_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = 50
+) -> List[dict]:
+    result = await db.execute(
+        select(
+            ChatList.chat_id,
+            ChatList.user_id,
+            ChatList.situation,
+            ChatList.created_at,
+            ChatList.active,
+            ChatList.prompt_tokens,
+            ChatList.completion_tokens,
+            ChatList.cached_tokens
+        ).where(
+            *usage_filters(user_id, since, until)
+        ).order_by(
+            desc(ChatList.prompt_tokens + ChatList.completion_tokens)
+        ).limit(limit)
+    )
+    chats = [dict(row) for row in result.mappings()]
+    if not chats:
+        return chats
+
+    # 조회된 채팅방의 AI 응답 수 / 최대 프롬프트 토큰
+    turns = await db.execute(
+        select(
+            Message.chat_id,
+            func.count().label("turns"),
+            func.max(Message.prompt_tokens).label("max_prompt_tokens")
+        ).where(
+            Message.chat_id.in_([chat["chat_id"] for chat in chats]),
+            Message.is_answer == True
+        ).group_by(
+            Message.chat_id
+        )
+    )
+    stats = {row.chat_id: row for row in turns}
+    for chat in chats:
+        row = stats.get(chat["chat_id"])
+        chat["turns"] = row.turns if row else 0
+        chat["max_prompt_tokens"] = row.max_prompt_tokens if row else None
+    return chats
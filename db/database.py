@@ -1,17 +1,121 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from dotenv import load_dotenv
+from typing import Optional
 import os
+import threading
+import time
 
 env_state = os.getenv("ENV_STATE", "dev")
 env_file = ".env.prod" if env_state == "prod" else ".env.dev"
 load_dotenv(env_file)
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# 비동기 드라이버 URL (없으면 DATABASE_URL 의 드라이버만 바꿔서 사용)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
 
-engine = create_engine(DATABASE_URL, echo=True)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+# 커넥션 풀 대기 최대 시간 (초)
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+# MySQL wait_timeout 보다 짧게 설정해 끊긴 커넥션 재사용 방지 (초)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", 5))
+# SQL 로그 출력 여부
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+
+# 비동기 엔진 드라이버 (requirements.txt : aiomysql, aiosqlite)
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+# 커넥션 풀 checkout 통계 (대기 시간 포함, 풀 크기 조정용)
+class PoolMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, waited: float, timed_out: bool):
+        with self.lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def stats(self, pool) -> dict:
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_avg_ms": self.wait_total / self.checkouts * 1000 if self.checkouts else 0.0,
+            "wait_max_ms": self.wait_max * 1000
+        }
+
+# 풀에서 커넥션을 꺼낼 때까지 걸린 시간 측정 (새 커넥션 생성 시간 포함)
+class TimedPoolMixin:
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            self.metrics.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - started, timed_out=False)
+        return connection
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    metrics = PoolMetrics()
+
+class TimedAsyncQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    metrics = PoolMetrics()
+
+# 엔진 옵션 (메모리 SQLite 는 커넥션 풀 설정을 사용하지 않음)
+def engine_options(url: URL, poolclass) -> dict:
+    options = {"echo": DB_ECHO}
+    backend = url.get_backend_name()
+    if backend == "sqlite" and url.database in (None, "", ":memory:"):
+        return options
+
+    options.update(
+        poolclass=poolclass,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING
+    )
+    if backend == "mysql":
+        options["connect_args"] = {"connect_timeout": DB_CONNECT_TIMEOUT}
+    return options
+
+def create_db_engine(database_url: str):
+    url = make_url(database_url)
+    return create_engine(url, **engine_options(url, TimedQueuePool))
+
+def create_async_db_engine(database_url: str) -> AsyncEngine:
+    url = make_url(database_url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver and url.drivername != driver and not ASYNC_DATABASE_URL:
+        url = url.set(drivername=driver)
+    return create_async_engine(url, **engine_options(url, TimedAsyncQueuePool))
+
+engine = create_db_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False,autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -20,4 +124,37 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# 비동기 엔진은 처음 사용할 때 생성 (aiomysql 미설치 환경에서도 동기 경로는 동작)
+async_engine: Optional[AsyncEngine] = None
+AsyncSessionLocal: Optional[async_sessionmaker] = None
+
+def get_async_sessionmaker() -> async_sessionmaker:
+    global async_engine, AsyncSessionLocal
+    if AsyncSessionLocal is None:
+        async_engine = create_async_db_engine(ASYNC_DATABASE_URL or DATABASE_URL)
+        AsyncSessionLocal = async_sessionmaker(
+            async_engine,
+            autoflush=False,
+            expire_on_commit=False
+        )
+    return AsyncSessionLocal
+
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+# 서버 종료 시 비동기 엔진 정리
+async def dispose_async_engine():
+    if async_engine is not None:
+        await async_engine.dispose()
+
+# 커넥션 풀 통계 (metrics 용)
+def pool_stats() -> dict:
+    stats = {}
+    if isinstance(engine.pool, TimedQueuePool):
+        stats["sync"] = TimedQueuePool.metrics.stats(engine.pool)
+    if async_engine is not None and isinstance(async_engine.pool, TimedAsyncQueuePool):
+        stats["async"] = TimedAsyncQueuePool.metrics.stats(async_engine.pool)
+    return stats
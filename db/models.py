@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from db.database import Base
 from datetime import datetime
@@ -8,6 +8,10 @@ from sqlalchemy import String, DateTime
 # users 테이블
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # 로그인 시 email + 탈퇴 여부 조회
+        Index("ix_users_email_deleted_at", "email", "deleted_at"),
+    )
     
     user_id = Column(String(255), primary_key=True)
     email = Column(String(255), nullable=False)
@@ -23,6 +27,10 @@ class User(Base):
 # chatlist 테이블
 class ChatList(Base):
     __tablename__ = "chatlist"
+    __table_args__ = (
+        # 사용자별 최근 채팅방 목록 조회
+        Index("ix_chatlist_user_id_created_at", "user_id", "created_at"),
+    )
     
     chat_id = Column(String(255), primary_key=True)
     user_id = Column(String(255), ForeignKey("users.user_id"), nullable=False)
@@ -32,6 +40,15 @@ class ChatList(Base):
     created_at = Column(DateTime(6), nullable=False, default=datetime.now)
     completed_at = Column(DateTime(6), nullable=True)
     active = Column(Boolean, nullable=False, default=True)
+    context_summary = Column(Text, nullable=True)
+    context_summary_upto = Column(Integer, nullable=True)
+    # 채팅방 전체 OpenAI 토큰 사용량 (대화 턴 + 요약/피드백 + 누적 요약)
+    prompt_tokens = Column(Integer, nullable=False, default=0, server_default="0")
+    completion_tokens = Column(Integer, nullable=False, default=0, server_default="0")
+    cached_tokens = Column(Integer, nullable=False, default=0, server_default="0")
+    # 요약/피드백 작업 선점 (여러 워커 중 하나만 실행, 실행 횟수 제한)
+    summary_attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    summary_claimed_at = Column(DateTime(6), nullable=True)
     
     user = relationship("User", back_populates="chats")
     messages = relationship("Message", back_populates="chat")
@@ -39,6 +56,10 @@ class ChatList(Base):
 # messages 테이블
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # 채팅방별 메시지 시간순 조회
+        Index("ix_messages_chat_id_created_at", "chat_id", "created_at"),
+    )
     
     message_id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(String(255), ForeignKey("users.user_id"), nullable=False)
@@ -46,6 +67,10 @@ class Message(Base):
     created_at = Column(DateTime(6), nullable=False, default=datetime.now)
     message = Column(String(255))
     is_answer = Column(Boolean, nullable=False, default=False)
+    # AI 응답을 만든 호출의 토큰 사용량 (사용자 메시지, 캐시된 응답은 NULL)
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    cached_tokens = Column(Integer, nullable=True)
     
     user = relationship("User", back_populates="messages")
     chat = relationship("ChatList", back_populates="messages")
\ No newline at end of file
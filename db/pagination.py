@@ -0,0 +1,37 @@
+# 키셋(커서) 페이지네이션
+# 커서 : 마지막 항목의 (created_at, id) 를 base64 로 인코딩한 문자열 (클라이언트는 그대로 전달만 함)
+# OFFSET 없이 인덱스 범위 조건으로 다음 페이지를 조회하므로 뒤쪽 페이지도 첫 페이지와 같은 비용
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+from datetime import datetime
+from typing import Any, Optional, Tuple
+import base64
+import json
+
+def encode_cursor(created_at: datetime, key: Any) -> str:
+    payload = json.dumps([created_at.isoformat(), key], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).rstrip(b"=").decode("ascii")
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, Any]]:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, key = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), key
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="유효하지 않은 커서입니다.")
+
+# 커서 이후 항목 조건 (descending=True 이면 최신순)
+def after_cursor(created_at_column, key_column, cursor: Tuple[datetime, Any], descending: bool = False):
+    created_at, key = cursor
+    if descending:
+        return or_(
+            created_at_column < created_at,
+            and_(created_at_column == created_at, key_column < key)
+        )
+    return or_(
+        created_at_column > created_at,
+        and_(created_at_column == created_at, key_column > key)
+    )
@@ -1,22 +1,45 @@
 import os
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
-from db.database import engine
-from db import models
+from db.database import dispose_async_engine
 
-from routes import chat, chatlist, stc, auth
+from routes import chat, chatlist, stc, auth, admin, metrics
+from services.prompts import registry as prompt_registry
+from services.jobs import job_queue
+from services import audio, context, llm, stt
+from services.metrics import TimingMiddleware
 
 env_state = os.getenv("ENV_STATE", "dev")
 env_file = ".env.prod" if env_state == "prod" else ".env.dev"
 load_dotenv(env_file)
 
 SECRET_KEY=os.getenv("SECRET_KEY")
+# /metrics 엔드포인트 사용 여부
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
 
-models.Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 프롬프트 템플릿 미리 로드
+    prompt_registry.load()
+    # 토큰 수 계산용 인코딩 로드
+    await context.warmup()
+    # 요약/피드백 생성 작업 워커 시작
+    await job_queue.start()
+    # STT 백엔드 준비 (로컬 엔진이면 워커에 모델 미리 로드)
+    await stt.backend.start()
+    # OpenAI 커넥션 미리 연결
+    await llm.warmup()
+    yield
+    await job_queue.stop()
+    audio.shutdown()
+    stt.backend.shutdown()
+    await dispose_async_engine()
+    await llm.close()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 origins = [
     "http://localhost:3000",
@@ -29,7 +52,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
-    expose_headers=["*"],
+    # credentials 요청에서는 "*" 가 와일드카드로 동작하지 않으므로 사용하는 헤더를 명시
+    expose_headers=["*", "X-Next-Cursor", "Server-Timing"],
 )
 
 app.add_middleware(
@@ -40,6 +64,9 @@ app.add_middleware(
     https_only=False
 )
 
+# 가장 바깥에서 요청 전체 소요 시간 측정 + Server-Timing 헤더 추가
+app.add_middleware(TimingMiddleware)
+
 @app.get("/")
 async def read_root():
     return {"Hello" : "World"}
@@ -47,4 +74,7 @@ async def read_root():
 app.include_router(chatlist.router)
 app.include_router(stc.router)
 app.include_router(chat.router)
-app.include_router(auth.router)
\ No newline at end of file
+app.include_router(auth.router)
+app.include_router(admin.router)
+if METRICS_ENABLED:
+    app.include_router(metrics.router)
\ No newline at end of file
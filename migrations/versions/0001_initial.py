@@ -0,0 +1,72 @@
+"""초기 스키마 (users, chatlist, messages)
+
+기존 sql/init.sql + create_all 로 만들어진 스키마와 같음
+alembic_version 없이 이미 테이블이 있는 기존 DB 는 있는 테이블을 건너뛰므로 그대로 upgrade head 실행
+(이후 컬럼은 0001a 부터 추가되며, 이미 있는 컬럼은 건너뜀)
+
+Revision ID: 0001
+Revises:
+Create Date: 2024-10-20 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DATETIME6 = sa.DateTime().with_variant(mysql.DATETIME(fsp=6), "mysql")
+TIMESTAMP6 = sa.DateTime().with_variant(mysql.TIMESTAMP(fsp=6), "mysql")
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "mysql":
+        now = sa.text("CURRENT_TIMESTAMP(6)")
+    else:
+        now = sa.func.current_timestamp()
+    # 버전 기록 없이 만들어진 기존 DB 의 테이블은 건너뜀
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("user_id", sa.String(255), primary_key=True),
+            sa.Column("email", sa.String(255), nullable=False),
+            sa.Column("name", sa.String(255), nullable=True),
+            sa.Column("created_at", DATETIME6, nullable=False),
+            sa.Column("deleted_at", DATETIME6, nullable=True),
+            sa.Column("onboarding", sa.Boolean(), nullable=False),
+            sa.Column("onboarding_info", sa.JSON(), nullable=True),
+        )
+    if "chatlist" not in existing:
+        op.create_table(
+            "chatlist",
+            sa.Column("chat_id", sa.String(255), primary_key=True),
+            sa.Column("user_id", sa.String(255), sa.ForeignKey("users.user_id"), nullable=False),
+            sa.Column("summary", sa.String(255), nullable=True),
+            sa.Column("feedback", sa.JSON(), nullable=True),
+            sa.Column("situation", sa.String(255), nullable=True),
+            sa.Column("created_at", TIMESTAMP6, nullable=False, server_default=now),
+            sa.Column("completed_at", TIMESTAMP6, nullable=True),
+            sa.Column("active", sa.Boolean(), nullable=False, server_default=sa.true()),
+        )
+    if "messages" not in existing:
+        op.create_table(
+            "messages",
+            sa.Column("message_id", sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column("chat_id", sa.String(255), sa.ForeignKey("chatlist.chat_id"), nullable=False),
+            sa.Column("user_id", sa.String(255), sa.ForeignKey("users.user_id"), nullable=False),
+            sa.Column("created_at", TIMESTAMP6, nullable=False, server_default=now),
+            sa.Column("message", sa.String(255), nullable=True),
+            sa.Column("is_answer", sa.Boolean(), nullable=False),
+        )
+
+def downgrade() -> None:
+    op.drop_table("messages")
+    op.drop_table("chatlist")
+    op.drop_table("users")
@@ -0,0 +1,37 @@
+"""누적 대화 요약 컬럼 추가 (chatlist.context_summary, context_summary_upto)
+
+컬럼 추가 이후의 sql/init.sql 로 만든 DB 는 이미 컬럼이 있으므로 건너뜀
+
+Revision ID: 0001a
+Revises: 0001
+Create Date: 2024-10-20 00:05:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0001a"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = (
+    ("context_summary", sa.Text()),
+    ("context_summary_upto", sa.Integer()),
+)
+
+
+def upgrade() -> None:
+    existing = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("chatlist")}
+    with op.batch_alter_table("chatlist") as batch_op:
+        for name, type_ in COLUMNS:
+            if name not in existing:
+                batch_op.add_column(sa.Column(name, type_, nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("chatlist") as batch_op:
+        for name, _ in reversed(COLUMNS):
+            batch_op.drop_column(name)
@@ -0,0 +1,38 @@
+"""조회 경로 복합 인덱스 추가
+
+- messages (chat_id, created_at) : 채팅방별 메시지 시간순 조회
+- chatlist (user_id, created_at) : 사용자별 최근 채팅방 목록
+- users (email, deleted_at) : 로그인 시 사용자 조회
+
+InnoDB 는 보조 인덱스에 PK 가 포함되므로 (created_at, PK) 순서 조회도 인덱스 범위 스캔으로 처리됨
+MySQL 8 은 ADD INDEX 를 online DDL (INPLACE, LOCK=NONE) 로 처리
+
+Revision ID: 0002
+Revises: 0001a
+Create Date: 2024-10-20 00:10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "0002"
+down_revision: Union[str, None] = "0001a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_messages_chat_id_created_at", "messages", ["chat_id", "created_at"])
+    op.create_index("ix_chatlist_user_id_created_at", "chatlist", ["user_id", "created_at"])
+    op.create_index("ix_users_email_deleted_at", "users", ["email", "deleted_at"])
+
+
+def downgrade() -> None:
+    # MySQL 은 외래 키에 인덱스가 필요하므로 단일 컬럼 인덱스를 먼저 만든 뒤 복합 인덱스 제거
+    if op.get_bind().dialect.name == "mysql":
+        op.create_index("ix_messages_chat_id", "messages", ["chat_id"])
+        op.create_index("ix_chatlist_user_id", "chatlist", ["user_id"])
+    op.drop_index("ix_users_email_deleted_at", table_name="users")
+    op.drop_index("ix_chatlist_user_id_created_at", table_name="chatlist")
+    op.drop_index("ix_messages_chat_id_created_at", table_name="messages")
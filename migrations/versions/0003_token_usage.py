@@ -0,0 +1,39 @@
+"""OpenAI 토큰 사용량 컬럼 추가
+
+- chatlist : 채팅방 전체 사용량 (대화 턴 + 요약/피드백 + 누적 요약)
+- messages : AI 응답을 만든 호출의 사용량 (사용자 메시지, 캐시된 응답은 NULL)
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2024-10-27 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TOKEN_COLUMNS = ("prompt_tokens", "completion_tokens", "cached_tokens")
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("chatlist") as batch_op:
+        for name in TOKEN_COLUMNS:
+            batch_op.add_column(sa.Column(name, sa.Integer(), nullable=False, server_default="0"))
+    with op.batch_alter_table("messages") as batch_op:
+        for name in TOKEN_COLUMNS:
+            batch_op.add_column(sa.Column(name, sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("messages") as batch_op:
+        for name in reversed(TOKEN_COLUMNS):
+            batch_op.drop_column(name)
+    with op.batch_alter_table("chatlist") as batch_op:
+        for name in reversed(TOKEN_COLUMNS):
+            batch_op.drop_column(name)
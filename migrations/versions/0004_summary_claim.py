@@ -0,0 +1,37 @@
+"""요약/피드백 작업 선점 컬럼 추가
+
+- summary_attempts : 요약/피드백 작업 실행 횟수 (실패 시 재등록 횟수 제한)
+- summary_claimed_at : 작업을 선점한 시각 (여러 워커가 같은 채팅방 작업을 중복 등록하지 않도록 조건부 UPDATE 로 선점)
+
+이미 종료된 채팅방은 작업 1회 실행으로 간주
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2024-11-03 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DATETIME6 = sa.DateTime().with_variant(mysql.DATETIME(fsp=6), "mysql")
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("chatlist") as batch_op:
+        batch_op.add_column(sa.Column("summary_attempts", sa.Integer(), nullable=False, server_default="0"))
+        batch_op.add_column(sa.Column("summary_claimed_at", DATETIME6, nullable=True))
+    op.execute("UPDATE chatlist SET summary_attempts = 1 WHERE active = false")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("chatlist") as batch_op:
+        batch_op.drop_column("summary_claimed_at")
+        batch_op.drop_column("summary_attempts")
@@ -0,0 +1,48 @@
+# 관리자 조회 (OpenAI 토큰 사용량 / 비용)
+# 기간은 채팅방 생성 시각 기준, 비용은 현재 단가(OPENAI_PRICE_*)로 계산
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import List, Literal, Optional
+
+from db import crud
+from db.database import get_async_db
+from routes.auth import get_admin_user
+from routes.schemas import ChatUsageResponse, UsageSummaryResponse
+from services.usage import cost_usd
+
+router = APIRouter(
+    prefix="/api/admin",
+    tags=["Admin"],
+    dependencies=[Depends(get_admin_user)]
+)
+
+USAGE_MAX_LIMIT = 500
+
+def with_cost(row: dict) -> dict:
+    row["cost_usd"] = cost_usd(row["prompt_tokens"], row["completion_tokens"], row["cached_tokens"])
+    return row
+
+@router.get("/usage", response_model=List[UsageSummaryResponse], description="사용자 / 상황 별 토큰 사용량 (사용량 많은 순)")
+async def get_usage_summary(
+    group_by: Literal["user", "situation"] = "situation",
+    user_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(50, ge=1, le=USAGE_MAX_LIMIT),
+    db: AsyncSession = Depends(get_async_db)
+):
+    rows = await crud.get_usage_summary(db, group_by, user_id, since, until, limit)
+    return [with_cost(row) for row in rows]
+
+@router.get("/usage/chats", response_model=List[ChatUsageResponse], description="토큰 사용량이 많은 채팅방")
+async def get_top_usage_chats(
+    user_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(50, ge=1, le=USAGE_MAX_LIMIT),
+    db: AsyncSession = Depends(get_async_db)
+):
+    rows = await crud.get_top_usage_chats(db, user_id, since, until, limit)
+    return [with_cost(row) for row in rows]
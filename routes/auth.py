@@ -3,6 +3,7 @@
 import os
 from dotenv import load_dotenv
 from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from authlib.integrations.starlette_client import OAuth
 from starlette.config import Config
@@ -16,6 +17,8 @@ from fastapi.security import OAuth2PasswordBearer
 from typing import Optional
 from fastapi.responses import RedirectResponse
 from routes.schemas import OnboardingRequest
+from services.state import invalidate_user_states
+from services.users import CachedUser, get_cached_user, invalidate_user
 
 # 환경 변수 설정
 env_state = os.getenv("ENV_STATE", "dev")
@@ -29,6 +32,12 @@ GOOGLE_REDIRECT_URI=os.getenv("GOOGLE_REDIRECT_URI")
 FRONTEND_URL=os.getenv("FRONTEND_URL")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 72
+# 관리자 이메일 목록 (쉼표로 구분, /api/admin 접근 허용)
+ADMIN_EMAILS = {
+    email.strip().lower()
+    for email in os.getenv("ADMIN_EMAILS", "").split(",")
+    if email.strip()
+}
 
 router = APIRouter(
     tags=['User'],
@@ -58,11 +67,9 @@ def create_access_token(data: dict):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-# 현재 유저 정보 반환
-async def get_current_user(
-    token: str | None = Depends(oauth2_schema),
-    db: Session = Depends(get_db)
-) -> Optional[models.User]:
+# 토큰 검증 후 유저 조회 (HTTP 요청 / WebSocket 공용)
+# 사용자 정보는 워커 캐시에서 조회하고 없을 때만 DB 조회
+async def authenticate_token(token: Optional[str]) -> CachedUser:
     if token is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -84,16 +91,30 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
 
-    user = db.query(models.User).filter(
-        models.User.user_id == user_id,
-        models.User.deleted_at.is_(None)
-    ).first()
+    user = await get_cached_user(user_id)
     
     if user is None:
         raise credentials_exception
         
     return user
 
+# 현재 유저 정보 반환
+async def get_current_user(
+    token: str | None = Depends(oauth2_schema)
+) -> CachedUser:
+    return await authenticate_token(token)
+
+# 관리자 확인 (ADMIN_EMAILS 에 없으면 403)
+async def get_admin_user(
+    current_user: CachedUser = Depends(get_current_user)
+) -> CachedUser:
+    if current_user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="관리자 권한이 필요합니다."
+        )
+    return current_user
+
 # 사용자를 구글 로그인 페이지로 리다이렉트
 @router.get("/login")
 async def login(request: Request):
@@ -186,7 +207,7 @@ async def google_callback(request: Request, db: Session = Depends(get_db)):
 
 # 현재 로그인한 사용자 정보 조회
 @router.get("/me")
-async def get_user_info(current_user: models.User = Depends(get_current_user)):
+async def get_user_info(current_user: CachedUser = Depends(get_current_user)):
     return {
         "user_id": current_user.user_id,
         "email": current_user.email,
@@ -200,7 +221,7 @@ async def get_user_info(current_user: models.User = Depends(get_current_user)):
 @router.post("/start")
 async def save_onboarding(
     onboarding_data: OnboardingRequest,
-    current_user: models.User = Depends(get_current_user),
+    current_user: CachedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     try:
@@ -211,18 +232,24 @@ async def save_onboarding(
             onboarding_data.age
         ]
         
-        # 현재 사용자의 온보딩 정보 저장
-        current_user.onboarding = True
-        current_user.onboarding_info = onboarding_info
-        
-        db.commit()
-        db.refresh(current_user)
+        # 현재 사용자의 온보딩 정보 저장 (current_user 는 캐시 값이므로 DB 에서 다시 조회)
+        def update_onboarding():
+            user = db.get(models.User, current_user.user_id)
+            user.onboarding = True
+            user.onboarding_info = onboarding_info
+            db.commit()
+
+        await run_in_threadpool(update_onboarding)
+
+        # 사용자 캐시 / 진행 중인 대화의 시스템 프롬프트가 바뀌므로 캐시된 대화 상태 제거
+        invalidate_user(current_user.user_id)
+        invalidate_user_states(current_user.user_id)
         
         return {
             "success": True,
             "user_id": current_user.user_id,
-            "onboarding": current_user.onboarding,
-            "onboarding_info": current_user.onboarding_info
+            "onboarding": True,
+            "onboarding_info": onboarding_info
         }
         
     except Exception as e:
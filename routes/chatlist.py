@@ -1,28 +1,101 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
-from db.database import get_db
-from routes.schemas import ChatListResponse, ChatDetailResponse
-from db.models import User
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from db.database import get_db, get_async_db
+from routes.schemas import ChatListResponse, ChatDetailResponse, ChatStatusResponse
 from routes.auth import get_current_user
 from db import crud
+from db.pagination import decode_cursor
+from services.conversation import SUMMARY_MAX_ATTEMPTS, ensure_summary_job
+from services.jobs import job_queue, COMPLETED, FAILED, PENDING
+from services.users import CachedUser
 
 router = APIRouter(
     prefix="/api",
     tags=["Chatlist"]
 )
 
+# 페이지 크기 (기본값, 최대값)
+CHATLIST_PAGE_SIZE = 10
+CHATLIST_MAX_PAGE_SIZE = 50
+MESSAGES_PAGE_SIZE = 100
+MESSAGES_MAX_PAGE_SIZE = 200
+
+# 조회 결과(dict)를 응답 모델 검증 없이 orjson 으로 바로 직렬화 (response_model 은 문서용)
+# 다음 페이지 커서는 X-Next-Cursor 헤더로 전달 (마지막 페이지면 헤더 없음)
 @router.get("/chatlist", response_model=List[ChatListResponse], description="채팅방 내역 조회")
 async def get_user_chats(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    limit: int = Query(CHATLIST_PAGE_SIZE, ge=1, le=CHATLIST_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CachedUser = Depends(get_current_user)
 ):
-    return crud.get_user_chats(db=db, user_id=current_user.user_id)
+    chats, next_cursor = await crud.get_user_chats(
+        db=db,
+        user_id=current_user.user_id,
+        limit=limit,
+        cursor=decode_cursor(cursor)
+    )
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return ORJSONResponse(chats, headers=headers)
 
+# 다음 메시지 페이지는 응답의 next_cursor 로 조회
 @router.get("/chatlist/detail/{chatId}", response_model=ChatDetailResponse)
 async def get_chat_messages(
     chatId: str,
+    limit: int = Query(MESSAGES_PAGE_SIZE, ge=1, le=MESSAGES_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CachedUser = Depends(get_current_user)
+):
+    detail = await crud.get_chat_detail(
+        db=db,
+        chat_id=chatId,
+        user_id=current_user.user_id,
+        limit=limit,
+        cursor=decode_cursor(cursor)
+    )
+    return ORJSONResponse(detail)
+
+# wait > 0 이면 요약/피드백 생성이 끝날 때까지 최대 wait초 대기 (long polling)
+@router.get("/chatlist/detail/{chatId}/status", response_model=ChatStatusResponse, description="대화 요약/피드백 생성 상태 조회")
+async def get_chat_status(
+    chatId: str,
+    wait: float = Query(0, ge=0, le=30),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: CachedUser = Depends(get_current_user)
 ):
-    return crud.get_chat_detail(db=db, chat_id=chatId, current_user=current_user)
+    chat = await run_in_threadpool(crud.get_chat, db, chatId)
+    if not chat or chat.user_id != current_user.user_id:
+        raise HTTPException(status_code=404, detail="No chats found")
+
+    if chat.active:
+        status = "active"
+    elif chat.feedback is not None:
+        status = COMPLETED
+    else:
+        # 서버 재시작 / 실패 등으로 작업이 없으면 다시 등록 (여러 워커 중 DB 에서 선점한 워커만)
+        job = await ensure_summary_job(db, chatId)
+        if job is not None:
+            job = await job_queue.wait("summary", chatId, wait)
+        # 선점 커밋으로 만료된 속성 다시 조회 (다른 워커가 완료했을 수 있음)
+        await run_in_threadpool(db.refresh, chat)
+        if chat.feedback is not None:
+            status = COMPLETED
+        elif job is not None:
+            status = job["status"]
+        elif chat.summary_attempts >= SUMMARY_MAX_ATTEMPTS and chat.summary_claimed_at is None:
+            status = FAILED
+        else:
+            # 다른 워커가 처리 중
+            status = PENDING
+
+    return ChatStatusResponse(
+        chat_id=chat.chat_id,
+        status=status,
+        summary=chat.summary if status == COMPLETED else None,
+        feedback=chat.feedback if status == COMPLETED else None
+    )
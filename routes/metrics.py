@@ -0,0 +1,34 @@
+# Prometheus 지표 (단계별 지연 시간 히스토그램 + 캐시/작업 큐/커넥션 풀/호출 제한/재시도·서킷 브레이커 통계)
+# 외부에 공개하지 않도록 프록시에서 /metrics 경로는 내부망에서만 허용
+
+from fastapi import APIRouter, Response
+from fastapi.concurrency import run_in_threadpool
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from db.database import pool_stats as db_pool_stats
+from services import llm
+from services.jobs import job_queue
+from services.limiter import llm_limiter
+from services.llm_cache import llm_cache
+from services.metrics import stats_collector
+from services.state import chat_states
+from services.stt import stt_cache
+from services.users import user_cache
+
+router = APIRouter(tags=["Metrics"])
+
+stats_collector.register("llm_cache", llm_cache.stats)
+stats_collector.register("stt_cache", stt_cache.stats)
+stats_collector.register("chat_state_cache", chat_states.stats)
+stats_collector.register("user_cache", user_cache.stats)
+stats_collector.register("jobs", job_queue.stats)
+stats_collector.register("db_pool", db_pool_stats)
+stats_collector.register("openai_pool", llm.pool_stats)
+stats_collector.register("llm_limiter", llm_limiter.stats)
+stats_collector.register("openai_chat", llm.chat_upstream.stats)
+stats_collector.register("openai_transcription", llm.transcription_upstream.stats)
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    # 수집 중 풀 상태 조회 등이 이벤트 루프를 막지 않도록 스레드풀에서 실행
+    return Response(await run_in_threadpool(generate_latest), media_type=CONTENT_TYPE_LATEST)
@@ -60,13 +60,47 @@ class ChatDetailResponse(BaseModel):
     situation: str
     summary: str
     messages: List[MessageResponse]
+    # 다음 메시지 페이지 커서 (마지막 페이지면 None)
+    next_cursor: Optional[str] = None
     
     class Config:
         from_attributes = True
 
+# 요약/피드백 생성 상태 Response 모델 (active, pending, running, completed, failed)
+class ChatStatusResponse(BaseModel):
+    chat_id: str
+    status: str
+    summary: Optional[str] = None
+    feedback: Optional[Dict[str, Any]] = None
+
 # auth.py
 
 class OnboardingRequest(BaseModel):
     level: str
     purpose: str
-    age: str
\ No newline at end of file
+    age: str
+
+# admin.py
+
+# 사용자 / 상황 별 토큰 사용량 (key : user_id 또는 situation)
+class UsageSummaryResponse(BaseModel):
+    key: Optional[str] = None
+    chats: int
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int
+    cost_usd: float
+
+# 채팅방 별 토큰 사용량 (turns : AI 응답 수, max_prompt_tokens : 가장 큰 프롬프트 크기)
+class ChatUsageResponse(BaseModel):
+    chat_id: str
+    user_id: str
+    situation: Optional[str] = None
+    created_at: datetime
+    active: bool
+    turns: int
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int
+    max_prompt_tokens: Optional[int] = None
+    cost_usd: float
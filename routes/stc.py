@@ -1,48 +1,56 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Form
+from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Form, Request
+from fastapi.routing import APIRoute
 from sqlalchemy.orm import Session
-from typing import Optional, Dict, Tuple
+from typing import Optional
 import os
-import tempfile
-from openai import OpenAI
-from dotenv import load_dotenv
-from contextlib import contextmanager
+import io
 import logging
-import uuid
-from datetime import datetime
-import json
-import random
-from string import Template
 
 from db.database import get_db
-from db import models
-from db.crud import *
 from routes.schemas import STCResponse
 from routes.auth import get_current_user
+from services.conversation import get_completion
+from services.stt import backend as stt_backend, speech2text
+from services.users import CachedUser
+from services.limiter import llm_limiter
+from services.metrics import stage
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(funcName)s - %(message)s',
                     datefmt='%Y-%m-%d %H:%M:%S')
 logger = logging.getLogger(__name__)
 
-router = APIRouter(
-    prefix="/api/ai",
-    tags=["AI"]
-)
+# 업로드 음성 파일 최대 크기 (whisper-1 제한 25MB)
+MAX_AUDIO_SIZE = int(os.environ.get('MAX_AUDIO_SIZE', 25 * 1024 * 1024))
+AUDIO_CHUNK_SIZE = 64 * 1024
+# multipart 본문에서 음성 파일 외 부분(경계, 폼 필드) 여유분
+MULTIPART_OVERHEAD = 64 * 1024
 
-# 환경 변수 로드
-env_state = os.getenv("ENV_STATE", "dev")
-env_file = ".env.prod" if env_state == "prod" else ".env.dev"
-load_dotenv(env_file)
+def audio_too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail="음성 파일 크기가 너무 큽니다.")
 
-OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
-PROMPT_PATH = os.environ.get('PROMPT_PATH')
-SUMMARY_PATH = os.environ.get('SUMMARY_PATH')
-FEEDBACK_PATH = os.environ.get('FEEDBACK_PATH')
+# 본문을 받기 전에 Content-Length 로 크기 확인
+# (FastAPI 는 핸들러 / 의존성 실행 전에 multipart 본문 전체를 받아 파싱하므로 핸들러 안에서 확인하면 이미 다 받은 뒤)
+class AudioUploadRoute(APIRoute):
+    def get_route_handler(self):
+        handler = super().get_route_handler()
 
-client = OpenAI(api_key = OPENAI_API_KEY)
+        async def limited_handler(request: Request):
+            content_length = request.headers.get("content-length", "")
+            if content_length.isdigit() and int(content_length) > MAX_AUDIO_SIZE + MULTIPART_OVERHEAD:
+                raise audio_too_large()
+            return await handler(request)
 
-# content_type에 따른 적절한 파일 확장자 반환
-def get_extension_from_content_type(content_type: str) -> str:
+        return limited_handler
+
+router = APIRouter(
+    prefix="/api/ai",
+    tags=["AI"],
+    route_class=AudioUploadRoute
+)
+
+# content_type에 따른 적절한 파일 확장자 반환 (지원하지 않는 형식이면 None)
+def get_extension_from_content_type(content_type: str) -> Optional[str]:
     content_type_map = {
         'audio/webm': '.webm',
         'audio/mp3': '.mp3',
@@ -52,281 +60,41 @@ def get_extension_from_content_type(content_type: str) -> str:
         'audio/x-m4a': '.m4a',
         'audio/mp4': '.mp4',
         'audio/x-wav': '.wav',
-        'video/webm': '.webm'
+        'audio/ogg': '.ogg',
+        'audio/oga': '.oga',
+        'video/webm': '.webm',
+        # 형식을 지정하지 않은 업로드는 기존처럼 webm 으로 처리
+        'application/octet-stream': '.webm'
     }
-    extension = content_type_map.get(content_type, '.webm')
+    # "audio/webm;codecs=opus" 처럼 파라미터가 붙은 경우 제거
+    mime_type = content_type.split(';')[0].strip().lower()
+    extension = content_type_map.get(mime_type)
     logger.debug(f"Content type {content_type} mapped to extension {extension}")
     return extension
 
-@contextmanager
-def temporary_file(file_content: bytes, extension: str):
-    temp_path = None
-    try:
-        with tempfile.NamedTemporaryFile(suffix=extension, delete=False) as tmp:
-            temp_path = tmp.name
-            tmp.write(file_content)
-            tmp.flush()
-            yield tmp.name
-    finally:
-        if temp_path and os.path.exists(temp_path):
-            try:
-                os.remove(temp_path)
-                logger.debug(f"Deleted temporary file: {temp_path}")
-            except Exception as e:
-                logger.error(f"Failed to remove temp file: {e}")
-
-# STT 모델 : OpenAI whisper-1
-async def speech2text(file_path):
-    try:
-        with open(file_path, "rb") as audio_file:
-            transcription = client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file,
-                language="ko",
-                temperature=0.0,
-            )
-            return transcription.text
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"STT 처리 중 오류 발생: {str(e)}"
-        )
-        
-# 상황 별 프롬프트 파일 매핑
-SITUATION_PROMPTS = {
-    "go-shopping": "shopping.txt",
-    "talk-with-friends": "friend.txt",
-    "travel": "travel.txt",
-    "learn-alphabet": "alphabet.txt",
-    "airport": "airport.txt"
-}
-
-# 상황 별 prompt 불러오기
-def read_situation_prompt(situation: str, level: str, purpose: str, age: str) -> str:
-    
-    if situation not in SITUATION_PROMPTS:
-        raise ValueError(f"유효하지 않은 상황입니다: {situation}")
-        
-    prompt_file = os.path.join(PROMPT_PATH, SITUATION_PROMPTS[situation])
-    
-    with open(prompt_file, 'r', encoding='utf-8') as file:
-        prompt = file.read().strip()
-        
-    template = Template(prompt)
-    prompt = template.substitute(
-        level=level,
-        purpose=purpose,
-        age=age
-    )
-    
-    return prompt
-
-# prompt 불러오기
-def read_prompt(filename):
-    with open(filename, 'r', encoding='utf-8') as file:
-        prompt = file.read().strip()
-    return prompt
-
-# 대화 요약 및 피드백 생성
-def generate_summary_and_feedback(db: Session, chat_id: str) -> Tuple[str, dict]:
-    
-    # 전체 대화 불러오기
-    messages = db.query(models.Message).filter(
-        models.Message.chat_id == chat_id
-    ).order_by(models.Message.created_at).all()
-    
-    conversation = "\n".join([
-        f"{'AI' if msg.is_answer else 'User'}: {msg.message}"
-        for msg in messages
-    ])
-    
-    # 요약 생성
-    summary_prompt = read_prompt(SUMMARY_PATH)
-    summary_messages = [
-        {"role": "system", "content": summary_prompt},
-        {"role": "user", "content": conversation}
-    ]
-    summary_response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=summary_messages,
-        temperature=0.3,
-        max_tokens=50,
-        response_format={"type": "json_object"}
-    )
-
-    try:
-        summary_data = json.loads(summary_response.choices[0].message.content)
-        summary = summary_data.get("summary", "요약을 생성할 수 없습니다.")
-    except json.JSONDecodeError:
-        summary = "요약을 생성할 수 없습니다."
-    
-    # 피드백 생성
-    
-    user = db.query(models.User).filter(
-        models.User.user_id == messages[0].user_id
-    ).first()
-    
-    if not user or not user.onboarding_info:
-        raise HTTPException(status_code=400, detail="사용자 정보를 찾을 수 없습니다.")
-    
-    level, purpose, age = user.onboarding_info
-    
-    feedback_prompt = read_prompt(FEEDBACK_PATH)
-    feedback_template = Template(feedback_prompt)
-    formatted_feedback_prompt = feedback_template.substitute(
-        level=level,
-        purpose=purpose,
-        age=age
-    )
-    
-    feedback_messages = [
-        {"role": "system", "content": formatted_feedback_prompt},
-        {"role": "user", "content": conversation}
-    ]
-    
-    feedback_response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=feedback_messages,
-        temperature=0.3,
-        response_format={"type": "json_object"}
-    )
-
-    try:
-        feedback_content = feedback_response.choices[0].message.content
-        feedback = json.loads(feedback_content)
-            
-        if not isinstance(feedback, dict) or \
-           not all(key in feedback for key in ["grammar_points", "study_tips"]):
-            raise ValueError("Invalid feedback format")
-
-        chat = db.query(models.ChatList).filter(models.ChatList.chat_id == chat_id).first()
-        if chat:
-            chat.feedback = feedback
-            db.commit()
-            
-        return summary, feedback
-        
-    except (json.JSONDecodeError, ValueError) as e:
-        print("Error processing feedback:", str(e))
-        feedback = {
-            "grammar_points": "문법 피드백을 생성할 수 없습니다.",
-            "study_tips": "학습 팁을 생성할 수 없습니다."
-        }
-        return summary, feedback
-
-# Chat 모델 : OpenAI 4o-mini
-def get_completion(db: Session, current_user: models.User, situation: str, inst: str, chatid: Optional[str] = None):
-    situations = ["go-shopping", "talk-with-friends", "travel", "learn-alphabet", "airport"]
-    actual_situation = situation
-    userid = current_user.user_id
-    
-    # random course인 경우 처리 (랜덤 상황 선택)
-    if situation == "random-course":
-        if chatid:
-            chat = db.query(models.ChatList).filter(models.ChatList.chat_id == chatid).first()
-            if chat:
-                actual_situation = chat.situation
-            else:
-                actual_situation = random.choice(situations)
-        else:
-            actual_situation = random.choice(situations)
-
-    # 새로운 대화 시작
-    if chatid is None:
-        chatid = str(uuid.uuid4())
-        new_chat = models.ChatList(
-            chat_id=chatid,
-            user_id=userid,
-            situation=actual_situation,
-            summary="New conversation",
-            active=True
-        )
-        db.add(new_chat)
-        db.commit()
-    else:
-        chat = db.query(models.ChatList).filter(
-            models.ChatList.chat_id == chatid,
-            models.ChatList.active == True
-        ).first()
-        
-        if not chat:
-            raise HTTPException(status_code=404, detail="유효하지 않은 대화입니다.") 
-
-    # 기존 대화 이어가기
-    chat_messages = db.query(models.Message).filter(
-        models.Message.chat_id == chatid
-    ).order_by(models.Message.created_at).all()
-
-    # 온보딩 정보 가져오기
-    level, purpose, age = get_user_onboarding(db, userid)
-    
-    # 상황 별 프롬프트 불러오기
-    prompt = read_situation_prompt(actual_situation, level, purpose, age)
-
-    messages = [{"role": "system", "content": prompt}]
-
-    # 이전 대화 내역 추가
-    for msg in chat_messages:
-        role = "assistant" if msg.is_answer else "user"
-        messages.append({
-            "role": role,
-            "content": f"[이전 대화 기록] {msg.message}"
-        })
-
-    # 현재 메시지 추가
-    messages.append({
-        "role": "user", 
-        "content": f"[현재 메시지] {inst}"
-        })
-
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=messages,
-        temperature=0,
-        response_format={"type": "json_object"}
-    )
-
-    try:
-        response_data = json.loads(response.choices[0].message.content)
-        is_conversation_end = response_data.get("error", False)
-        assistant_response = response_data.get("response", "응답을 처리할 수 없습니다.")
-    except json.JSONDecodeError:
-        is_conversation_end = False
-        assistant_response = "응답을 처리할 수 없습니다."
-    
-    # 대화 메시지 수가 2개 이하면 종료 조건 무시 (초기 대화 시 종료 에러 방지)
-    if is_conversation_end and len(chat_messages) < 2:
-        is_conversation_end = False
-    
-    # 사용자 메시지 저장
-    user_message = models.Message(
-        chat_id=chatid,
-        user_id=userid,
-        message=inst,
-        is_answer=False
-    )
-    db.add(user_message)
-    
-    # AI 응답 저장
-    assistant_message = models.Message(
-        chat_id=chatid,
-        user_id=userid,
-        message=assistant_response,
-        is_answer=True
-    )
-    db.add(assistant_message)
-    
-    if is_conversation_end:
-        chat = db.query(models.ChatList).filter(models.ChatList.chat_id == chatid).first()
-        summary, feedback = generate_summary_and_feedback(db, chatid)
-        chat.summary = summary
-        chat.feedback = feedback
-        chat.active = False
-        chat.completed_at = datetime.now()
-
-    db.commit()
+# 업로드 파일을 크기 제한 내에서 메모리 버퍼로 복사 (별도 임시 파일을 만들지 않고 STT API에 그대로 전달)
+# 파일은 이미 Starlette 가 받아둔 상태 (1MB 까지 메모리, 넘으면 임시 파일)
+# Content-Length 없는 chunked 업로드는 여기서 크기 확인
+async def read_audio(file: UploadFile, extension: str) -> io.BytesIO:
+    if file.size is not None and file.size > MAX_AUDIO_SIZE:
+        raise audio_too_large()
+
+    buffer = io.BytesIO()
+    while True:
+        chunk = await file.read(AUDIO_CHUNK_SIZE)
+        if not chunk:
+            break
+        if buffer.tell() + len(chunk) > MAX_AUDIO_SIZE:
+            raise audio_too_large()
+        buffer.write(chunk)
+
+    if buffer.tell() == 0:
+        raise HTTPException(status_code=400, detail="음성 파일을 입력해주세요.")
 
-    return chatid, assistant_response, actual_situation
+    # API가 파일 형식을 확장자로 판단하므로 이름 지정
+    buffer.name = f"audio{extension}"
+    buffer.seek(0)
+    return buffer
 
 @router.post("/stc", response_model=STCResponse)
 async def speechtochat(
@@ -334,39 +102,53 @@ async def speechtochat(
     situation: str = Form(...),
     chat_id: Optional[str] = Form(None),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)):
+    current_user: CachedUser = Depends(get_current_user)):
     
+    userid = current_user.user_id
+
     if not file.file:
         raise HTTPException(status_code=400, detail="음성 파일을 입력해주세요.")
 
+    # 지원하지 않는 형식은 파일을 읽기 전에 거절
+    content_type = file.content_type or 'audio/webm'
+    extension = get_extension_from_content_type(content_type)
+    if extension is None:
+        raise HTTPException(status_code=415, detail=f"지원하지 않는 음성 파일 형식입니다: {content_type}")
+
+    # 사용자별 요청 빈도 제한 (초과 시 429)
+    llm_limiter.check_user(userid)
+    # 전사 서버 장애 중(서킷 열림)이면 업로드 / 전사 전에 503
+    stt_backend.check_available()
+
     try:
-        content = await file.read()
-        content_type = file.content_type or 'audio/webm'
-        logger.info(f"Processing file: {file.filename}, type: {content_type}")
+        with stage("upload"):
+            audio = await read_audio(file, extension)
+        logger.info(f"Processing file: {file.filename}, type: {content_type}, size: {audio.getbuffer().nbytes}")
         
-        # STT 처리
-        extension = get_extension_from_content_type(content_type)
-        
-        with temporary_file(content, extension) as temp_path:
-            transcribed_text = await speech2text(temp_path)
+        # STT 처리 (같은 음성 재전송이면 캐시된 결과 사용)
+        with stage("stt"):
+            transcribed_text = await speech2text(audio)
         
         # Chat 처리
-        chatid, assistant_response, actual_situation = get_completion(
+        chatid, assistant_response, actual_situation = await get_completion(
             db,
-            current_user,
+            userid,
             situation,
             transcribed_text,
-            chat_id
+            chat_id,
+            min_history_for_end=2
         )
         
         return STCResponse(
-            user_id=current_user.user_id,
+            user_id=userid,
             chat_id=chatid,
             message=transcribed_text,  # STT 결과
             response=assistant_response,  # Chat 응답
             situation=actual_situation
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing file: {str(e)}", exc_info=True)
         raise HTTPException(
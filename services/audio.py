@@ -0,0 +1,186 @@
+# 음성 전처리 (STT 전 무음 제거 + 16kHz 모노 변환 + 압축 인코딩)
+# ffmpeg 로 디코딩/인코딩하고, 음성 구간 검출(VAD)은 webrtcvad 가 있으면 사용, 없으면 에너지 기반으로 처리
+# CPU 작업이므로 프로세스 풀에서 실행, 실패하면 원본 음성을 그대로 사용
+
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+from typing import Optional, Tuple
+import asyncio
+import io
+import logging
+import math
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+# 환경 변수 로드
+env_state = os.getenv("ENV_STATE", "dev")
+env_file = ".env.prod" if env_state == "prod" else ".env.dev"
+load_dotenv(env_file)
+
+AUDIO_PREPROCESS = os.environ.get('AUDIO_PREPROCESS', 'false').lower() == 'true'
+AUDIO_PREPROCESS_WORKERS = int(os.environ.get('AUDIO_PREPROCESS_WORKERS', 2))
+AUDIO_PREPROCESS_TIMEOUT = float(os.environ.get('AUDIO_PREPROCESS_TIMEOUT', 10))
+AUDIO_BITRATE = os.environ.get('AUDIO_BITRATE', '24k')
+# 에너지 기반 VAD 최소 RMS (16bit PCM 기준)
+AUDIO_VAD_MIN_RMS = int(os.environ.get('AUDIO_VAD_MIN_RMS', 300))
+FFMPEG_PATH = os.environ.get('FFMPEG_PATH') or shutil.which("ffmpeg")
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+# 음성 구간 앞뒤로 남겨둘 여유 구간
+PADDING_MS = 300
+FRAME_BYTES = SAMPLE_RATE * FRAME_MS // 1000 * 2
+
+try:
+    import webrtcvad
+except ImportError:
+    webrtcvad = None
+
+# ffmpeg 실행 (stdin -> stdout 파이프, 임시 파일 없음)
+def _ffmpeg(args: list, data: bytes) -> bytes:
+    result = subprocess.run(
+        [FFMPEG_PATH, "-hide_banner", "-loglevel", "error", *args],
+        input=data,
+        capture_output=True,
+        timeout=AUDIO_PREPROCESS_TIMEOUT,
+        check=True
+    )
+    return result.stdout
+
+# 음성 파일 -> 16kHz 모노 16bit PCM
+def decode_pcm(data: bytes) -> bytes:
+    return _ffmpeg(
+        ["-i", "pipe:0", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "pipe:1"],
+        data
+    )
+
+# 16kHz 모노 PCM -> Ogg/Opus
+def encode_opus(pcm: bytes) -> bytes:
+    return _ffmpeg(
+        [
+            "-f", "s16le", "-ar", str(SAMPLE_RATE), "-ac", "1", "-i", "pipe:0",
+            "-c:a", "libopus", "-b:a", AUDIO_BITRATE, "-application", "voip",
+            "-f", "ogg", "pipe:1"
+        ],
+        pcm
+    )
+
+def _frame_rms(frame: bytes) -> float:
+    samples = array("h", frame)
+    if sys.byteorder == "big":
+        samples.byteswap()
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+# 프레임 별 음성 여부 (webrtcvad 또는 에너지 기준)
+def detect_speech_frames(pcm: bytes) -> list:
+    frames = [
+        pcm[i:i + FRAME_BYTES]
+        for i in range(0, len(pcm) - FRAME_BYTES + 1, FRAME_BYTES)
+    ]
+    if not frames:
+        return []
+
+    if webrtcvad is not None:
+        vad = webrtcvad.Vad(2)
+        return [vad.is_speech(frame, SAMPLE_RATE) for frame in frames]
+
+    # 하위 10% 프레임을 배경 소음으로 보고 그보다 충분히 큰 프레임을 음성으로 판단
+    rms = [_frame_rms(frame) for frame in frames]
+    noise_floor = sorted(rms)[len(rms) // 10]
+    threshold = max(AUDIO_VAD_MIN_RMS, noise_floor * 3)
+    return [value > threshold for value in rms]
+
+# 앞뒤 무음 제거 (음성이 없으면 None)
+def trim_silence(pcm: bytes) -> Optional[bytes]:
+    speech = detect_speech_frames(pcm)
+    if not any(speech):
+        return None
+
+    first = speech.index(True)
+    last = len(speech) - 1 - speech[::-1].index(True)
+    padding = PADDING_MS // FRAME_MS
+    start = max(0, first - padding) * FRAME_BYTES
+    end = min(len(pcm), (last + 1 + padding) * FRAME_BYTES)
+    return pcm[start:end]
+
+# 전처리 (프로세스 풀에서 실행) -> (음성 데이터, 확장자)
+# 음성이 검출되지 않거나 결과가 원본보다 크면 원본 반환
+def preprocess_audio(data: bytes, extension: str) -> Tuple[bytes, str]:
+    pcm = decode_pcm(data)
+    trimmed = trim_silence(pcm)
+    if trimmed is None:
+        return data, extension
+
+    encoded = encode_opus(trimmed)
+    if not encoded or len(encoded) >= len(data):
+        return data, extension
+    return encoded, ".ogg"
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=AUDIO_PREPROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+# 프로세스 풀 종료 (서버 종료 시)
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+# 업로드 음성 전처리 (AUDIO_PREPROCESS=true 이고 ffmpeg 가 있을 때만)
+async def preprocess_upload(audio: io.BytesIO) -> io.BytesIO:
+    if not AUDIO_PREPROCESS:
+        return audio
+    if not FFMPEG_PATH:
+        logger.warning("AUDIO_PREPROCESS is enabled but ffmpeg was not found")
+        return audio
+
+    data = audio.getvalue()
+    extension = os.path.splitext(audio.name)[1]
+    started = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        processed, processed_extension = await loop.run_in_executor(
+            _get_executor(), preprocess_audio, data, extension
+        )
+    except Exception as e:
+        # mp4/m4a 처럼 파이프 입력으로 디코딩할 수 없는 형식 등은 원본 사용
+        logger.warning(f"Audio preprocessing failed, using original audio: {e}")
+        return audio
+
+    logger.info(
+        f"Preprocessed audio {len(data)} -> {len(processed)} bytes "
+        f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+    )
+    result = io.BytesIO(processed)
+    result.name = f"audio{processed_extension}"
+    return result
+
+# 로컬 샘플 파일로 전처리 결과 확인
+# python -m services.audio sample.webm [sample2.wav ...]
+if __name__ == "__main__":
+    if not FFMPEG_PATH:
+        sys.exit("ffmpeg not found")
+    for path in sys.argv[1:]:
+        with open(path, "rb") as file:
+            data = file.read()
+        started = time.perf_counter()
+        processed, processed_extension = preprocess_audio(data, os.path.splitext(path)[1])
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"{path}: {len(data)} -> {len(processed)} bytes ({processed_extension}), {elapsed:.0f}ms")
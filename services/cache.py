@@ -0,0 +1,72 @@
+# 프로세스(워커) 내 LRU + TTL 캐시
+
+from collections import OrderedDict
+from typing import Any, Hashable
+import threading
+import time
+
+_MISSING = object()
+
+# maxsize 초과 시 가장 오래 사용하지 않은 항목부터 제거, ttl(초)이 지나면 만료 (ttl=0 이면 만료 없음)
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float = 0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self.lock:
+            item = self.data.get(key, _MISSING)
+            if item is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = item
+            if expires_at and expires_at < time.monotonic():
+                del self.data[key]
+                self.misses += 1
+                return default
+            self.data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0
+        with self.lock:
+            self.data[key] = (expires_at, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self.lock:
+            item = self.data.pop(key, None)
+        return default if item is None else item[1]
+
+    # 조건에 맞는 항목 일괄 제거
+    def pop_where(self, predicate) -> int:
+        with self.lock:
+            keys = [key for key, (_, value) in self.data.items() if predicate(key, value)]
+            for key in keys:
+                del self.data[key]
+        return len(keys)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    # 캐시 통계 (metrics 용)
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self.data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
@@ -0,0 +1,104 @@
+# 대화 컨텍스트 관리 (토큰 예산 내 최근 대화 + 오래된 대화 누적 요약)
+
+from dotenv import load_dotenv
+from typing import List, Optional, Sequence
+import asyncio
+import logging
+import math
+import os
+
+logger = logging.getLogger(__name__)
+
+# 환경 변수 로드
+env_state = os.getenv("ENV_STATE", "dev")
+env_file = ".env.prod" if env_state == "prod" else ".env.dev"
+load_dotenv(env_file)
+
+# 이전 대화 기록에 사용할 최대 토큰 수
+CONTEXT_TOKEN_BUDGET = int(os.environ.get('CONTEXT_TOKEN_BUDGET', 1500))
+# 예산과 관계없이 항상 그대로 보내는 최근 메시지 수 / 그대로 보내는 최대 메시지 수
+CONTEXT_MIN_MESSAGES = int(os.environ.get('CONTEXT_MIN_MESSAGES', 2))
+CONTEXT_MAX_MESSAGES = int(os.environ.get('CONTEXT_MAX_MESSAGES', 20))
+# 최근 대화 범위 밖으로 밀려난 메시지가 이 수 이상 쌓이면 누적 요약 갱신
+CONTEXT_FOLD_THRESHOLD = int(os.environ.get('CONTEXT_FOLD_THRESHOLD', 4))
+# 누적 요약 후 그대로 남길 최근 대화 (토큰 예산 / 최대 메시지 수 대비 비율)
+# 예산만큼 남기면 1~2턴 뒤 다시 기준을 넘으므로 낮게 남겨 요약 호출을 여러 턴에 한 번으로
+CONTEXT_FOLD_KEEP_RATIO = float(os.environ.get('CONTEXT_FOLD_KEEP_RATIO', 0.5))
+
+# 토큰 수 계산 : tiktoken (o200k_base, gpt-4o 계열) 사용
+# 인코딩 파일은 서버 시작 시 warmup() 으로 미리 로드 (첫 요청에서 이벤트 루프를 막고 다운로드하지 않도록)
+# 설치되지 않았거나, 로드 전이거나, 인코딩 파일을 받을 수 없으면 UTF-8 바이트 수 기반 추정치 사용
+# 이미지 빌드 시 TIKTOKEN_CACHE_DIR 에 미리 받아두면 다운로드 없이 로드
+TIKTOKEN_LOAD_TIMEOUT = float(os.environ.get('TIKTOKEN_LOAD_TIMEOUT', 10))
+
+_encoding = None
+
+def load_encoding():
+    global _encoding
+    try:
+        import tiktoken
+        _encoding = tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken unavailable, using estimated token counts: {e}")
+
+async def warmup():
+    # 다운로드에 타임아웃이 없으므로 기다리지 않고 넘어갈 수 있도록 실행 (늦게 끝나면 그때부터 사용)
+    try:
+        await asyncio.wait_for(asyncio.to_thread(load_encoding), TIKTOKEN_LOAD_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning(f"tiktoken encoding did not load in {TIKTOKEN_LOAD_TIMEOUT:g}s, using estimated token counts")
+
+def count_tokens(text: Optional[str]) -> int:
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    # 한글 1글자(3바이트) ≈ 1토큰, 영문 3~4글자 ≈ 1토큰
+    return math.ceil(len(text.encode("utf-8")) / 3)
+
+# 그대로 보낼 최근 메시지의 시작 인덱스
+# 뒤에서부터 토큰 예산 안에서 최대 CONTEXT_MAX_MESSAGES개, 최소 CONTEXT_MIN_MESSAGES개
+def select_recent(
+    messages: Sequence,
+    budget: int = CONTEXT_TOKEN_BUDGET,
+    min_messages: int = CONTEXT_MIN_MESSAGES,
+    max_messages: int = CONTEXT_MAX_MESSAGES
+) -> int:
+    tokens = 0
+    start = len(messages)
+    for i in range(len(messages) - 1, -1, -1):
+        kept = len(messages) - i
+        message_tokens = count_tokens(messages[i].message)
+        if kept > min_messages and (tokens + message_tokens > budget or kept > max_messages):
+            break
+        tokens += message_tokens
+        start = i
+    return start
+
+# 최근 대화 범위 밖 메시지가 충분히 쌓여 누적 요약을 갱신해야 하는지
+def needs_fold(start: int) -> bool:
+    return start >= CONTEXT_FOLD_THRESHOLD
+
+# 누적 요약에 합칠 메시지 범위 (반환 인덱스 앞까지 요약, 이후는 그대로 남김)
+def select_fold(messages: Sequence) -> int:
+    return select_recent(
+        messages,
+        budget=int(CONTEXT_TOKEN_BUDGET * CONTEXT_FOLD_KEEP_RATIO),
+        max_messages=max(CONTEXT_MIN_MESSAGES, int(CONTEXT_MAX_MESSAGES * CONTEXT_FOLD_KEEP_RATIO))
+    )
+
+# 모델에 보낼 이전 대화 (누적 요약 + 최근 메시지)
+def build_history(messages: Sequence, context_summary: Optional[str], start: int) -> List[dict]:
+    history = []
+    if context_summary:
+        history.append({
+            "role": "system",
+            "content": f"[이전 대화 요약] {context_summary}"
+        })
+    for msg in messages[start:]:
+        role = "assistant" if msg.is_answer else "user"
+        history.append({
+            "role": role,
+            "content": f"[이전 대화 기록] {msg.message}"
+        })
+    return history
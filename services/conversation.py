@@ -0,0 +1,627 @@
+# AI 대화 턴 처리 (chat.py + stc.py 공용)
+
+from contextlib import aclosing
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+import asyncio
+import logging
+import os
+import uuid
+import json
+import random
+import time
+from typing import Optional, Tuple, List, Any, AsyncIterator
+
+from db import crud
+from db.database import SessionLocal
+from services.llm import create_chat_completion, stream_chat_completion
+from services.streaming import ResponseFieldStream
+from services.prompts import SITUATION_PROMPTS, registry as prompt_registry
+from services.jobs import FAILED, job_queue
+from services.context import select_fold, select_recent, build_history, needs_fold
+from services.llm_cache import llm_cache
+from services.limiter import llm_limiter
+from services.metrics import record, stage
+from services.usage import STREAM_USAGE_OPTIONS, TokenUsage, track_usage
+from services.state import ChatState, CachedMessage, chat_states, get_chat_state
+from services.users import get_cached_user, get_user_onboarding, invalidate_user
+
+logger = logging.getLogger(__name__)
+
+# 환경 변수 로드
+env_state = os.getenv("ENV_STATE", "dev")
+env_file = ".env.prod" if env_state == "prod" else ".env.dev"
+load_dotenv(env_file)
+
+# 요약/피드백 생성 방식 : combined (1회 호출) | split (2회 호출)
+SUMMARY_FEEDBACK_MODE = os.environ.get('SUMMARY_FEEDBACK_MODE', 'combined')
+# 채팅방 당 요약/피드백 작업 최대 실행 횟수 (실패 시 상태 조회에서 다시 등록)
+SUMMARY_MAX_ATTEMPTS = int(os.environ.get('SUMMARY_MAX_ATTEMPTS', 3))
+# 작업 선점 유지 시간 (초), 워커가 작업 중 종료되면 이 시간 뒤 다른 워커가 다시 선점
+SUMMARY_CLAIM_TTL = float(os.environ.get('SUMMARY_CLAIM_TTL', 600))
+
+# combined 모드 응답 형식 (JSON schema)
+SUMMARY_FEEDBACK_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "summary_feedback",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "summary": {"type": "string"},
+                "grammar_points": {"type": "string"},
+                "study_tips": {"type": "string"}
+            },
+            "required": ["summary", "grammar_points", "study_tips"],
+            "additionalProperties": False
+        }
+    }
+}
+
+# 상황 별 prompt 불러오기
+def read_situation_prompt(situation: str, level: str, purpose: str, age: str) -> str:
+
+    if situation not in SITUATION_PROMPTS:
+        raise ValueError(f"유효하지 않은 상황입니다: {situation}")
+
+    return prompt_registry.render(situation, level, purpose, age)
+
+# 대화 내용을 "User: ... / AI: ..." 형태의 문자열로 변환
+def format_conversation(messages) -> str:
+    return "\n".join([
+        f"{'AI' if msg.is_answer else 'User'}: {msg.message}"
+        for msg in messages
+    ])
+
+# 요약 생성 -> (요약, 토큰 사용량)
+async def generate_summary(conversation: str) -> Tuple[str, Optional[TokenUsage]]:
+    summary_prompt = prompt_registry.text("summary")
+    summary_messages = [
+        {"role": "system", "content": summary_prompt},
+        {"role": "user", "content": conversation}
+    ]
+    async with llm_limiter.slot(background=True):
+        with stage("llm.summary"):
+            summary_response = await create_chat_completion(
+                background=True,
+                model="gpt-4o-mini",
+                messages=summary_messages,
+                temperature=0.3,
+                max_tokens=50,
+                response_format={"type": "json_object"}
+            )
+    usage = track_usage("summary", summary_response.usage)
+
+    try:
+        summary_data = json.loads(summary_response.choices[0].message.content)
+        summary = summary_data.get("summary", "요약을 생성할 수 없습니다.")
+    except json.JSONDecodeError:
+        summary = "요약을 생성할 수 없습니다."
+
+    return summary, usage
+
+# 피드백 생성 -> (피드백, 토큰 사용량)
+async def generate_feedback(
+    conversation: str, level: str, purpose: str, age: str
+) -> Tuple[dict, Optional[TokenUsage]]:
+    formatted_feedback_prompt = prompt_registry.render("feedback", level, purpose, age)
+
+    feedback_messages = [
+        {"role": "system", "content": formatted_feedback_prompt},
+        {"role": "user", "content": conversation}
+    ]
+
+    async with llm_limiter.slot(background=True):
+        with stage("llm.feedback"):
+            feedback_response = await create_chat_completion(
+                background=True,
+                model="gpt-4o-mini",
+                messages=feedback_messages,
+                temperature=0.3,
+                response_format={"type": "json_object"}
+            )
+    usage = track_usage("feedback", feedback_response.usage)
+
+    try:
+        feedback_content = feedback_response.choices[0].message.content
+        feedback = json.loads(feedback_content)
+
+        if not isinstance(feedback, dict) or \
+           not all(key in feedback for key in ["grammar_points", "study_tips"]):
+            raise ValueError("Invalid feedback format")
+
+        return feedback, usage
+
+    except (json.JSONDecodeError, ValueError) as e:
+        logger.error(f"Error processing feedback: {str(e)}")
+        return {
+            "grammar_points": "문법 피드백을 생성할 수 없습니다.",
+            "study_tips": "학습 팁을 생성할 수 없습니다."
+        }, usage
+
+# 요약 + 피드백 한 번에 생성 (structured output) -> ((요약, 피드백), 토큰 사용량)
+# 형식이 맞지 않으면 (None, 토큰 사용량)
+async def generate_combined_summary_and_feedback(
+    conversation: str, level: str, purpose: str, age: str
+) -> Tuple[Optional[Tuple[str, dict]], Optional[TokenUsage]]:
+    combined_prompt = prompt_registry.render("summary_feedback", level, purpose, age)
+
+    combined_messages = [
+        {"role": "system", "content": combined_prompt},
+        {"role": "user", "content": conversation}
+    ]
+
+    async with llm_limiter.slot(background=True):
+        with stage("llm.summary_feedback"):
+            combined_response = await create_chat_completion(
+                background=True,
+                model="gpt-4o-mini",
+                messages=combined_messages,
+                temperature=0.3,
+                response_format=SUMMARY_FEEDBACK_FORMAT
+            )
+    usage = track_usage("summary_feedback", combined_response.usage)
+
+    try:
+        data = json.loads(combined_response.choices[0].message.content)
+    except (json.JSONDecodeError, TypeError) as e:
+        logger.warning(f"Invalid combined summary/feedback: {str(e)}")
+        return None, usage
+
+    if not isinstance(data, dict) or not all(
+        isinstance(data.get(key), str) and data[key].strip()
+        for key in ["summary", "grammar_points", "study_tips"]
+    ):
+        logger.warning("Invalid combined summary/feedback format")
+        return None, usage
+
+    # chatlist.summary 컬럼 길이 (255) 초과 방지
+    summary = data["summary"].strip()[:255]
+    feedback = {
+        "grammar_points": data["grammar_points"],
+        "study_tips": data["study_tips"]
+    }
+    return (summary, feedback), usage
+
+# 대화 요약 및 피드백 생성
+# combined 모드 : 한 번의 호출로 생성, 실패 시 split 모드로 재시도
+# split 모드 : 요약 / 피드백 두 호출을 동시에 실행
+# 반환 : (요약, 피드백, 전체 토큰 사용량)
+async def generate_summary_and_feedback(db: Session, chat_id: str) -> Tuple[str, dict, TokenUsage]:
+
+    # 전체 대화 불러오기
+    messages = await run_in_threadpool(crud.get_chat_messages, db, chat_id)
+
+    conversation = format_conversation(messages)
+
+    user = await get_cached_user(messages[0].user_id, db)
+
+    if not user or not user.onboarding_info:
+        raise HTTPException(status_code=400, detail="사용자 정보를 찾을 수 없습니다.")
+
+    level, purpose, age = user.onboarding_info
+    usage = TokenUsage()
+
+    if SUMMARY_FEEDBACK_MODE == "combined":
+        result, combined_usage = await generate_combined_summary_and_feedback(conversation, level, purpose, age)
+        usage = usage.merge(combined_usage)
+        if result is not None:
+            return result[0], result[1], usage
+        logger.warning(f"Falling back to split summary/feedback for chat {chat_id}")
+
+    (summary, summary_usage), (feedback, feedback_usage) = await asyncio.gather(
+        generate_summary(conversation),
+        generate_feedback(conversation, level, purpose, age)
+    )
+    return summary, feedback, usage.merge(summary_usage).merge(feedback_usage)
+
+# 대화 상태 불러오기 (캐시에 없을 때 DB 조회 후 캐시에 저장)
+async def load_chat_state(
+    db: Session,
+    userid: str,
+    situation: str,
+    chatid: Optional[str] = None
+) -> ChatState:
+    situations = list(SITUATION_PROMPTS.keys())
+    actual_situation = situation
+
+    # random course인 경우 처리 (랜덤 상황 선택)
+    if situation == "random-course":
+        if chatid:
+            chat = await run_in_threadpool(crud.get_chat, db, chatid, False, userid)
+            if chat:
+                actual_situation = chat.situation
+            else:
+                actual_situation = random.choice(situations)
+        else:
+            actual_situation = random.choice(situations)
+
+    context_summary = None
+    summarized_upto = None
+
+    # 새로운 대화 시작 (채팅방은 첫 턴 저장 시 같은 트랜잭션에서 생성)
+    if chatid is None:
+        chatid = str(uuid.uuid4())
+        persisted = False
+        chat_messages = []
+    else:
+        # 다른 사용자의 대화는 없는 대화와 같게 처리 (모델 호출 / 상태 캐시 저장 전에 404)
+        chat = await run_in_threadpool(crud.get_chat, db, chatid, True, userid)
+
+        if not chat:
+            raise HTTPException(status_code=404, detail="유효하지 않은 대화입니다.")
+
+        context_summary = chat.context_summary
+        summarized_upto = chat.context_summary_upto
+        persisted = True
+
+        # 기존 대화 이어가기 (누적 요약에 포함되지 않은 메시지만)
+        chat_messages = await run_in_threadpool(
+            crud.get_chat_messages, db, chatid, summarized_upto
+        )
+
+    # 온보딩 정보 가져오기
+    level, purpose, age = await get_user_onboarding(userid, db)
+
+    # 상황 별 프롬프트 불러오기
+    with stage("prompt"):
+        prompt = read_situation_prompt(actual_situation, level, purpose, age)
+
+    state = ChatState(
+        chat_id=chatid,
+        user_id=userid,
+        situation=actual_situation,
+        system_prompt=prompt,
+        context_summary=context_summary,
+        summarized_upto=summarized_upto,
+        messages=[
+            CachedMessage(msg.message_id, msg.message, msg.is_answer)
+            for msg in chat_messages
+        ],
+        persisted=persisted
+    )
+    chat_states.set(chatid, state)
+    return state
+
+# 모델 입력 메시지 구성 : 시스템 프롬프트 + 이전 대화 (누적 요약 + 토큰 예산 내 최근 대화) + 현재 메시지
+# 반환 : (메시지, 그대로 보낸 최근 대화의 시작 인덱스)
+def assemble_messages(
+    system_prompt: str,
+    history: List[CachedMessage],
+    context_summary: Optional[str],
+    inst: str
+) -> Tuple[List[dict], int]:
+    messages = [{"role": "system", "content": system_prompt}]
+    start = select_recent(history)
+    messages.extend(build_history(history, context_summary, start))
+    messages.append({
+        "role": "user",
+        "content": f"[현재 메시지] {inst}"
+    })
+    return messages, start
+
+# 대화 준비 (채팅방 확인, 시스템 프롬프트 + 이전 대화 구성)
+# 캐시된 대화는 DB 조회 없이 처리
+# 반환 : (chat_id, 상황, 모델 입력 메시지, 이전 메시지 수, 새 대화 여부)
+async def prepare_turn(
+    db: Session,
+    userid: str,
+    situation: str,
+    inst: str,
+    chatid: Optional[str] = None
+) -> Tuple[str, str, List[dict], int, bool]:
+    state = get_chat_state(chatid, userid, situation)
+    if state is None:
+        state = await load_chat_state(db, userid, situation, chatid)
+
+    with stage("prompt"):
+        messages, start = assemble_messages(state.system_prompt, state.messages, state.context_summary, inst)
+
+    # 최근 대화 범위 밖 메시지가 쌓이면 누적 요약 갱신
+    if needs_fold(start):
+        job_queue.enqueue("context", state.chat_id, state.chat_id)
+
+    return state.chat_id, state.situation, messages, len(state.messages), not state.persisted
+
+# 모델 응답(JSON) 파싱 -> (응답, 대화 종료 여부)
+def parse_completion(content: str) -> Tuple[str, bool]:
+    try:
+        response_data = json.loads(content)
+        is_conversation_end = response_data.get("error", False)
+        assistant_response = response_data.get("response", "응답을 처리할 수 없습니다.")
+    except json.JSONDecodeError:
+        is_conversation_end = False
+        assistant_response = "응답을 처리할 수 없습니다."
+    return assistant_response, is_conversation_end
+
+# 대화 종료 후 요약/피드백 생성 작업 (백그라운드)
+async def summarize_chat(chat_id: str):
+    db = SessionLocal()
+    try:
+        summary, feedback, usage = await generate_summary_and_feedback(db, chat_id)
+        await run_in_threadpool(crud.update_chat_feedback, db, chat_id, summary, feedback, usage)
+    finally:
+        await run_in_threadpool(db.close)
+
+# 재시도 후에도 실패했거나 서버 종료로 처리하지 못한 경우 선점 해제
+async def release_summary(chat_id: str):
+    db = SessionLocal()
+    try:
+        await run_in_threadpool(crud.release_summary, db, chat_id)
+    finally:
+        await run_in_threadpool(db.close)
+
+job_queue.register("summary", summarize_chat, on_failure=release_summary)
+
+# 종료된 채팅방의 요약/피드백 작업 상태 (작업이 없거나 실패했으면 DB 에서 선점한 경우에만 다시 등록)
+# 반환 : 이 워커의 작업 (다른 워커가 처리 중이거나 실행 횟수를 모두 쓴 경우 None)
+async def ensure_summary_job(db: Session, chat_id: str) -> Optional[dict]:
+    job = job_queue.get("summary", chat_id)
+    if job is not None and job["status"] != FAILED:
+        return job
+    claimed = await run_in_threadpool(crud.claim_summary, db, chat_id, SUMMARY_MAX_ATTEMPTS, SUMMARY_CLAIM_TTL)
+    if claimed:
+        return job_queue.enqueue("summary", chat_id, chat_id)
+    return job
+
+# 누적 대화 요약 갱신 작업 (백그라운드)
+# 최근 대화 범위 밖으로 밀려난 메시지 + 낮은 기준(select_fold)까지의 최근 대화를 기존 요약에 합쳐 chatlist.context_summary에 저장
+async def fold_chat_context(chat_id: str):
+    db = SessionLocal()
+    try:
+        chat = await run_in_threadpool(crud.get_chat, db, chat_id, True)
+        if not chat:
+            return
+
+        context_summary = chat.context_summary
+        messages = await run_in_threadpool(
+            crud.get_chat_messages, db, chat_id, chat.context_summary_upto
+        )
+        start = select_fold(messages)
+        if start == 0:
+            return
+
+        folded = messages[:start]
+        upto = max(msg.message_id for msg in folded)
+        conversation = format_conversation(folded)
+
+        fold_messages = [
+            {"role": "system", "content": prompt_registry.text("context_summary")},
+            {"role": "user", "content": f"[이전 요약]\n{context_summary or '없음'}\n\n[새 대화]\n{conversation}"}
+        ]
+        async with llm_limiter.slot(background=True):
+            with stage("llm.context_summary"):
+                fold_response = await create_chat_completion(
+                    background=True,
+                    model="gpt-4o-mini",
+                    messages=fold_messages,
+                    temperature=0.3,
+                    response_format={"type": "json_object"}
+                )
+        usage = track_usage("context_summary", fold_response.usage)
+
+        summary = json.loads(fold_response.choices[0].message.content).get("summary")
+        if not isinstance(summary, str) or not summary.strip():
+            raise ValueError("Invalid context summary format")
+
+        await run_in_threadpool(crud.update_context_summary, db, chat_id, summary.strip(), upto, usage)
+
+        state = chat_states.get(chat_id)
+        if state is not None:
+            state.fold(summary.strip(), upto)
+    finally:
+        await run_in_threadpool(db.close)
+
+job_queue.register("context", fold_chat_context)
+
+# 대화 턴 마무리 (메시지 저장, 대화 종료 시 요약/피드백 생성 작업 등록)
+# new_chat_situation : 새 대화의 첫 턴이면 채팅방도 함께 생성
+# usage : 응답 생성 토큰 사용량 (캐시된 응답이면 None)
+async def finish_turn(
+    db: Session,
+    userid: str,
+    chatid: str,
+    inst: str,
+    assistant_response: str,
+    is_conversation_end: bool,
+    new_chat_situation: Optional[str] = None,
+    usage: Optional[TokenUsage] = None
+):
+    # 채팅방 생성 + 사용자 메시지 + AI 응답 저장 (한 트랜잭션)
+    try:
+        user_message_id, assistant_message_id = await run_in_threadpool(
+            crud.save_turn, db, chatid, userid, inst, assistant_response,
+            is_conversation_end, new_chat_situation, usage
+        )
+    except HTTPException as e:
+        # 다른 워커에서 종료된 대화 / 탈퇴한 사용자 : 이 워커의 캐시도 제거
+        if e.status_code == 404:
+            chat_states.pop(chatid)
+            invalidate_user(userid)
+        raise
+
+    # 요약/피드백은 응답을 지연시키지 않도록 작업 큐에서 생성
+    # (완료 여부 : GET /api/chatlist/detail/{chatId}/status)
+    if is_conversation_end:
+        chat_states.pop(chatid)
+        job_queue.enqueue("summary", chatid, chatid)
+        return
+
+    # 대화 상태 캐시에도 반영
+    state = chat_states.get(chatid)
+    if state is not None:
+        state.persisted = True
+        state.append(
+            CachedMessage(user_message_id, inst, False),
+            CachedMessage(assistant_message_id, assistant_response, True)
+        )
+
+# 대화 턴 모델 호출 파라미터
+def chat_params(messages: List[dict]) -> dict:
+    return {
+        "model": "gpt-4o-mini",
+        "messages": messages,
+        "temperature": 0,
+        "response_format": {"type": "json_object"}
+    }
+
+# 응답 캐시 키 (캐시를 사용하지 않는 상황이면 None)
+def completion_cache_key(situation: str, params: dict) -> Optional[str]:
+    if not llm_cache.enabled_for(situation, params):
+        return None
+    return llm_cache.key(params)
+
+# 정상적인 JSON 응답만 캐시에 저장
+async def cache_completion(cache_key: Optional[str], content: Optional[str]):
+    if cache_key is None or not content:
+        return
+    try:
+        json.loads(content)
+    except json.JSONDecodeError:
+        return
+    await llm_cache.set(cache_key, content)
+
+# Chat 모델 : OpenAI 4o-mini
+# DB 작업은 스레드풀에서, OpenAI 호출은 비동기로 처리해 이벤트 루프를 막지 않음
+async def get_completion(
+    db: Session,
+    userid: str,
+    situation: str,
+    inst: str,
+    chatid: Optional[str] = None,
+    min_history_for_end: int = 0
+):
+    chatid, actual_situation, messages, history_count, new_chat = await prepare_turn(
+        db, userid, situation, inst, chatid
+    )
+
+    saved = False
+    try:
+        params = chat_params(messages)
+        cache_key = completion_cache_key(actual_situation, params)
+        content = await llm_cache.get(cache_key) if cache_key else None
+        usage = None
+
+        if content is None:
+            # 동시 호출 수 제한 (대기열이 가득 차면 429)
+            async with llm_limiter.slot():
+                with stage("llm.chat"):
+                    response = await create_chat_completion(**params)
+            usage = track_usage("chat", response.usage, actual_situation)
+            content = response.choices[0].message.content
+            await cache_completion(cache_key, content)
+
+        assistant_response, is_conversation_end = parse_completion(content)
+
+        # 대화 메시지 수가 기준보다 적으면 종료 조건 무시 (초기 대화 시 종료 에러 방지)
+        if is_conversation_end and history_count < min_history_for_end:
+            is_conversation_end = False
+
+        await finish_turn(
+            db, userid, chatid, inst, assistant_response, is_conversation_end,
+            actual_situation if new_chat else None, usage
+        )
+        saved = True
+    finally:
+        # 저장되지 않은 새 대화는 상태 캐시에서도 제거
+        if new_chat and not saved:
+            chat_states.pop(chatid)
+
+    return chatid, assistant_response, actual_situation
+
+# Chat 모델 스트리밍 : ("delta", 텍스트 조각) 이벤트를 보낸 뒤 마지막에 ("done", (응답, 종료 여부))
+# 스트림이 끝난 뒤 전체 JSON을 다시 파싱해 저장하므로, 최종 응답은 done 이벤트 기준
+async def stream_completion(
+    db: Session,
+    userid: str,
+    chatid: str,
+    situation: str,
+    inst: str,
+    messages: List[dict],
+    history_count: int,
+    min_history_for_end: int = 0,
+    new_chat: bool = False
+) -> AsyncIterator[Tuple[str, Any]]:
+    saved = False
+    try:
+        async with aclosing(_stream_turn(
+            db, userid, chatid, situation, inst, messages, history_count,
+            min_history_for_end, new_chat
+        )) as events:
+            async for event in events:
+                if event[0] == "done":
+                    saved = True
+                yield event
+    finally:
+        # 저장되지 않은 새 대화(모델 오류, 연결 종료)는 상태 캐시에서도 제거
+        if new_chat and not saved:
+            chat_states.pop(chatid)
+
+async def _stream_turn(
+    db: Session,
+    userid: str,
+    chatid: str,
+    situation: str,
+    inst: str,
+    messages: List[dict],
+    history_count: int,
+    min_history_for_end: int,
+    new_chat: bool
+) -> AsyncIterator[Tuple[str, Any]]:
+    params = chat_params(messages)
+    cache_key = completion_cache_key(situation, params)
+    content = await llm_cache.get(cache_key) if cache_key else None
+    usage = None
+
+    # 캐시된 응답은 한 번에 전송
+    if content is not None:
+        text = ResponseFieldStream().feed(content)
+        if text:
+            yield "delta", text
+    else:
+        extractor = ResponseFieldStream()
+        chunks = []
+        stream_usage = None
+        # 스트림이 끝날 때까지 호출 자리 유지
+        async with llm_limiter.slot():
+            with stage("llm.chat_stream"):
+                started = time.perf_counter()
+                stream = await stream_chat_completion(**params, extra_body=STREAM_USAGE_OPTIONS)
+                # 클라이언트 연결 종료 등으로 중단되면 바로 OpenAI 응답 / 커넥션 반환
+                async with aclosing(stream):
+                    async for chunk in stream:
+                        # usage 는 choices 가 비어 있는 마지막 청크에만 포함
+                        chunk_usage = getattr(chunk, "usage", None)
+                        if chunk_usage:
+                            stream_usage = chunk_usage
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta.content
+                        if not delta:
+                            continue
+                        # 첫 응답 조각까지 걸린 시간 (체감 지연)
+                        if not chunks:
+                            record("llm.first_token", time.perf_counter() - started)
+                        chunks.append(delta)
+                        text = extractor.feed(delta)
+                        if text:
+                            yield "delta", text
+
+        usage = track_usage("chat", stream_usage, situation)
+        content = "".join(chunks)
+        await cache_completion(cache_key, content)
+
+    assistant_response, is_conversation_end = parse_completion(content)
+
+    if is_conversation_end and history_count < min_history_for_end:
+        is_conversation_end = False
+
+    await finish_turn(
+        db, userid, chatid, inst, assistant_response, is_conversation_end,
+        situation if new_chat else None, usage
+    )
+
+    yield "done", (assistant_response, is_conversation_end)
@@ -0,0 +1,206 @@
+# 백그라운드 작업 큐 (대화 종료 후 요약/피드백 생성 등)
+
+from collections import OrderedDict
+from dotenv import load_dotenv
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio
+import logging
+import os
+import random
+import time
+
+from services.metrics import record
+
+logger = logging.getLogger(__name__)
+
+# 환경 변수 로드
+env_state = os.getenv("ENV_STATE", "dev")
+env_file = ".env.prod" if env_state == "prod" else ".env.dev"
+load_dotenv(env_file)
+
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 4))
+JOB_MAX_RETRIES = int(os.environ.get('JOB_MAX_RETRIES', 3))
+JOB_RETRY_DELAY = float(os.environ.get('JOB_RETRY_DELAY', 2))
+JOB_STATUS_SIZE = int(os.environ.get('JOB_STATUS_SIZE', 10000))
+# 서버 종료 시 남은 작업을 처리하며 기다리는 시간 (초)
+JOB_DRAIN_TIMEOUT = float(os.environ.get('JOB_DRAIN_TIMEOUT', 10))
+
+# 작업 상태
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# 프로세스 내 asyncio 작업 큐
+# 작업 종류(kind) 별 핸들러를 등록해두고 (kind, key) 단위로 작업을 넣음
+# 같은 (kind, key) 작업이 대기/실행 중이면 중복으로 넣지 않음
+# 재시도 후에도 실패하거나 서버 종료로 처리하지 못한 작업은 on_failure 핸들러 호출 (다른 워커가 다시 처리할 수 있도록 정리)
+class JobQueue:
+    def __init__(self, workers: int, max_retries: int, retry_delay: float, status_size: int, drain_timeout: float):
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.status_size = status_size
+        self.drain_timeout = drain_timeout
+        self.handlers: Dict[str, Callable[..., Awaitable[Any]]] = {}
+        self.failure_handlers: Dict[str, Callable[..., Awaitable[Any]]] = {}
+        self.jobs: "OrderedDict[str, dict]" = OrderedDict()
+        self.queue: Optional[asyncio.Queue] = None
+        self.tasks = []
+
+    # 작업 핸들러 등록
+    def register(
+        self,
+        kind: str,
+        handler: Callable[..., Awaitable[Any]],
+        on_failure: Optional[Callable[..., Awaitable[Any]]] = None
+    ):
+        self.handlers[kind] = handler
+        if on_failure is not None:
+            self.failure_handlers[kind] = on_failure
+
+    # 워커 시작 (서버 시작 시)
+    async def start(self):
+        self._start_workers()
+
+    def _start_workers(self):
+        if self.tasks:
+            return
+        self.queue = asyncio.Queue()
+        self.tasks = [
+            asyncio.get_running_loop().create_task(self._worker(i))
+            for i in range(self.workers)
+        ]
+        logger.info(f"Started {self.workers} job workers")
+
+    # 워커 종료 (서버 종료 시)
+    # drain_timeout 동안 남은 작업을 처리하고, 그래도 끝나지 않은 작업은 FAILED 로 표시 후 on_failure 호출
+    async def stop(self):
+        if self.queue is not None and self.drain_timeout > 0:
+            try:
+                await asyncio.wait_for(self.queue.join(), self.drain_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Job queue did not drain in {self.drain_timeout:.0f}s, abandoning remaining jobs")
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        self.queue = None
+
+        for job_id, job in list(self.jobs.items()):
+            if job["status"] in (PENDING, RUNNING):
+                job["status"] = FAILED
+                job["error"] = "shutdown"
+                job["done"].set()
+                await self._on_failure(job_id, job)
+
+    # 작업 추가
+    def enqueue(self, kind: str, key: str, *args) -> dict:
+        if kind not in self.handlers:
+            raise ValueError(f"등록되지 않은 작업입니다: {kind}")
+
+        job_id = f"{kind}:{key}"
+        job = self.jobs.get(job_id)
+        if job and job["status"] in (PENDING, RUNNING):
+            return job
+
+        # lifespan 없이 실행된 경우 (스크립트 등) 첫 작업 시 워커 시작
+        self._start_workers()
+
+        job = {
+            "kind": kind,
+            "args": args,
+            "status": PENDING,
+            "attempts": 0,
+            "error": None,
+            "done": asyncio.Event()
+        }
+        self.jobs[job_id] = job
+        self.jobs.move_to_end(job_id)
+        self._trim()
+        self.queue.put_nowait((job_id, kind, args))
+        return job
+
+    # 작업 상태 조회 (없으면 None)
+    def get(self, kind: str, key: str) -> Optional[dict]:
+        return self.jobs.get(f"{kind}:{key}")
+
+    # 작업 완료 대기 (timeout 초 까지)
+    async def wait(self, kind: str, key: str, timeout: float) -> Optional[dict]:
+        job = self.get(kind, key)
+        if job is None or timeout <= 0:
+            return job
+        try:
+            await asyncio.wait_for(job["done"].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return job
+
+    # 오래된 완료 작업 상태부터 정리
+    def _trim(self):
+        if len(self.jobs) <= self.status_size:
+            return
+        for job_id in list(self.jobs):
+            if len(self.jobs) <= self.status_size:
+                break
+            if self.jobs[job_id]["status"] in (COMPLETED, FAILED):
+                del self.jobs[job_id]
+
+    async def _worker(self, index: int):
+        while True:
+            job_id, kind, args = await self.queue.get()
+            job = self.jobs.get(job_id)
+            try:
+                if job is not None:
+                    await self._run(job_id, job, kind, args)
+            finally:
+                self.queue.task_done()
+
+    # 실패 시 지수 백오프 + 지터로 재시도
+    async def _run(self, job_id: str, job: dict, kind: str, args: tuple):
+        job["status"] = RUNNING
+        while True:
+            job["attempts"] += 1
+            started = time.perf_counter()
+            try:
+                await self.handlers[kind](*args)
+                record(f"job.{kind}", time.perf_counter() - started)
+                job["status"] = COMPLETED
+                job["error"] = None
+                break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                job["error"] = str(e)
+                if job["attempts"] > self.max_retries:
+                    job["status"] = FAILED
+                    logger.error(f"Job {job_id} failed after {job['attempts']} attempts: {e}")
+                    await self._on_failure(job_id, job)
+                    break
+                delay = self.retry_delay * (2 ** (job["attempts"] - 1))
+                delay *= random.uniform(0.5, 1.5)
+                logger.warning(f"Job {job_id} failed (attempt {job['attempts']}), retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+        job["done"].set()
+
+    async def _on_failure(self, job_id: str, job: dict):
+        handler = self.failure_handlers.get(job["kind"])
+        if handler is None:
+            return
+        try:
+            await handler(*job["args"])
+        except Exception as e:
+            logger.error(f"Failure handler for job {job_id} failed: {e}")
+
+    # 작업 큐 통계 (metrics 용)
+    def stats(self) -> dict:
+        counts = {PENDING: 0, RUNNING: 0, COMPLETED: 0, FAILED: 0}
+        for job in self.jobs.values():
+            counts[job["status"]] += 1
+        return {
+            "workers": len(self.tasks),
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            **counts
+        }
+
+job_queue = JobQueue(JOB_WORKERS, JOB_MAX_RETRIES, JOB_RETRY_DELAY, JOB_STATUS_SIZE, JOB_DRAIN_TIMEOUT)
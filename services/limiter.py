@@ -0,0 +1,178 @@
+# OpenAI 호출 동시 실행 제한 (워커 별)
+# 전역 : 동시에 실행 중인 호출 수 제한 + 대기열 크기 제한, 대기열이 가득 차거나 대기 시간이 지나면 바로 429
+# 사용자 : 토큰 버킷으로 턴(요청) 빈도 제한, 초과 시 429
+# 요약/피드백 같은 백그라운드 작업은 거절하지 않고 순서를 기다림 (작업 큐 워커 수로 이미 제한됨)
+
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+from fastapi import HTTPException
+import asyncio
+import math
+import os
+import time
+
+from services.cache import TTLCache
+from services.metrics import record
+
+# 환경 변수 로드
+env_state = os.getenv("ENV_STATE", "dev")
+env_file = ".env.prod" if env_state == "prod" else ".env.dev"
+load_dotenv(env_file)
+
+LLM_LIMITER_ENABLED = os.environ.get('LLM_LIMITER_ENABLED', 'true').lower() == 'true'
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 32))
+LLM_MAX_QUEUE = int(os.environ.get('LLM_MAX_QUEUE', 64))
+# 대기열에서 기다리는 최대 시간 (초)
+LLM_QUEUE_TIMEOUT = float(os.environ.get('LLM_QUEUE_TIMEOUT', 10))
+# 사용자별 초당 요청 수 / 순간 최대 요청 수
+LLM_USER_RATE = float(os.environ.get('LLM_USER_RATE', 1))
+LLM_USER_BURST = float(os.environ.get('LLM_USER_BURST', 5))
+LLM_USER_BUCKETS = int(os.environ.get('LLM_USER_BUCKETS', 10000))
+
+def too_many_requests(retry_after: float, detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated_at")
+
+    def __init__(self, tokens: float):
+        self.tokens = tokens
+        self.updated_at = time.monotonic()
+
+class AdmissionController:
+    def __init__(
+        self,
+        enabled: bool,
+        max_concurrency: int,
+        max_queue: int,
+        queue_timeout: float,
+        user_rate: float,
+        user_burst: float,
+        user_buckets: int
+    ):
+        self.enabled = enabled
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        # 버킷이 가득 찰 때까지 요청이 없으면 만료 (다시 만들면 가득 찬 상태)
+        self.buckets = TTLCache(user_buckets, user_burst / user_rate if user_rate > 0 else 0)
+        self.in_flight = 0
+        self.waiting = 0
+        # 호출 1회 평균 소요 시간 (지수 이동 평균, Retry-After 계산용)
+        self.average_seconds = 1.0
+        self.admitted = 0
+        self.rejected_queue = 0
+        self.rejected_timeout = 0
+        self.rejected_user = 0
+        self.wait_seconds = 0.0
+
+    # 사용자 요청 빈도 확인 (토큰 1개 사용, 부족하면 429)
+    def check_user(self, user_id: str):
+        if not self.enabled or self.user_rate <= 0:
+            return
+        now = time.monotonic()
+        bucket = self.buckets.get(user_id)
+        if bucket is None:
+            bucket = TokenBucket(self.user_burst)
+        else:
+            bucket.tokens = min(self.user_burst, bucket.tokens + (now - bucket.updated_at) * self.user_rate)
+            bucket.updated_at = now
+        # 만료 시간 갱신 (사용 중인 버킷이 만료되어 가득 찬 상태로 초기화되지 않도록)
+        self.buckets.set(user_id, bucket)
+
+        if bucket.tokens < 1:
+            self.rejected_user += 1
+            raise too_many_requests(
+                (1 - bucket.tokens) / self.user_rate,
+                "요청이 너무 많습니다. 잠시 후 다시 시도해주세요."
+            )
+        bucket.tokens -= 1
+
+    # 대기열이 가득 찼을 때 예상 대기 시간
+    def _retry_after(self) -> float:
+        return self.average_seconds * (self.waiting + 1) / self.max_concurrency
+
+    # 스트리밍 응답 시작 전 확인용 (자리를 예약하지는 않음)
+    def ensure_capacity(self):
+        if not self.enabled:
+            return
+        if self.semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected_queue += 1
+            raise too_many_requests(self._retry_after(), "서버 요청이 많습니다. 잠시 후 다시 시도해주세요.")
+
+    # timeout 안에 세마포어 획득 여부
+    # (wait_for 는 취소/타임아웃과 획득이 겹칠 때 자리를 잃을 수 있어 직접 처리, 취소된 acquire 는 세마포어가 자리를 되돌림)
+    async def _acquire(self, timeout) -> bool:
+        acquire = asyncio.ensure_future(self.semaphore.acquire())
+        try:
+            done, _ = await asyncio.wait({acquire}, timeout=timeout)
+        except asyncio.CancelledError:
+            if not acquire.cancel():
+                self.semaphore.release()
+            raise
+        if done:
+            return True
+        # 취소 요청 전에 이미 획득했다면 그대로 사용
+        return not acquire.cancel()
+
+    # OpenAI 호출 1회 실행 자리 확보 (background=True 이면 대기열 제한 없이 기다림)
+    @asynccontextmanager
+    async def slot(self, background: bool = False):
+        if not self.enabled:
+            yield
+            return
+
+        if not background:
+            self.ensure_capacity()
+
+        started = time.perf_counter()
+        self.waiting += 1
+        try:
+            acquired = await self._acquire(None if background else self.queue_timeout)
+        finally:
+            self.waiting -= 1
+        if not acquired:
+            self.rejected_timeout += 1
+            raise too_many_requests(self._retry_after(), "서버 요청이 많습니다. 잠시 후 다시 시도해주세요.")
+
+        admitted_at = time.perf_counter()
+        self.admitted += 1
+        self.wait_seconds += admitted_at - started
+        record("llm.queue_background" if background else "llm.queue", admitted_at - started)
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.semaphore.release()
+            self.average_seconds = self.average_seconds * 0.9 + (time.perf_counter() - admitted_at) * 0.1
+
+    # 제한 통계 (metrics 용)
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected_queue": self.rejected_queue,
+            "rejected_timeout": self.rejected_timeout,
+            "rejected_user": self.rejected_user,
+            "wait_avg_ms": self.wait_seconds / self.admitted * 1000 if self.admitted else 0.0,
+            "call_avg_ms": self.average_seconds * 1000
+        }
+
+llm_limiter = AdmissionController(
+    LLM_LIMITER_ENABLED,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_QUEUE,
+    LLM_QUEUE_TIMEOUT,
+    LLM_USER_RATE,
+    LLM_USER_BURST,
+    LLM_USER_BUCKETS
+)
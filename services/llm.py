@@ -0,0 +1,212 @@
+# OpenAI 클라이언트 (chat.py + stc.py 공용)
+# 모든 OpenAI 호출이 하나의 httpx 커넥션 풀을 공유 (keep-alive 로 턴마다 TLS 핸드셰이크 반복 방지)
+# 작업별 타임아웃 : client (대화/요약/피드백), transcription_client (STT)
+# 호출은 create_chat_completion / stream_chat_completion / create_transcription 사용 (재시도, 서킷 브레이커 적용)
+
+from openai import AsyncOpenAI
+from dotenv import load_dotenv
+from typing import Any, AsyncIterator
+import asyncio
+import httpx
+import importlib.util
+import io
+import logging
+import os
+import time
+
+from services.resilience import (
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_OPEN_SECONDS,
+    OPENAI_BACKGROUND_DEADLINE,
+    OPENAI_CHAT_DEADLINE,
+    OPENAI_HEDGE_DELAY,
+    OPENAI_HEDGE_MAX_RATIO,
+    OPENAI_RETRY_ATTEMPTS,
+    OPENAI_TRANSCRIPTION_DEADLINE,
+    Upstream
+)
+from services.usage import track_usage
+
+logger = logging.getLogger(__name__)
+
+# 환경 변수 로드
+env_state = os.getenv("ENV_STATE", "dev")
+env_file = ".env.prod" if env_state == "prod" else ".env.dev"
+load_dotenv(env_file)
+
+OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
+
+OPENAI_MAX_CONNECTIONS = int(os.environ.get('OPENAI_MAX_CONNECTIONS', 100))
+OPENAI_MAX_KEEPALIVE = int(os.environ.get('OPENAI_MAX_KEEPALIVE', 20))
+# httpx 기본값(5초)은 사용자 입력 대기 중에 커넥션이 닫히므로 길게 유지 (초)
+OPENAI_KEEPALIVE_EXPIRY = float(os.environ.get('OPENAI_KEEPALIVE_EXPIRY', 120))
+# h2 패키지 필요 (pip install h2)
+OPENAI_HTTP2 = os.environ.get('OPENAI_HTTP2', 'false').lower() == 'true'
+OPENAI_CONNECT_TIMEOUT = float(os.environ.get('OPENAI_CONNECT_TIMEOUT', 5))
+OPENAI_CHAT_TIMEOUT = float(os.environ.get('OPENAI_CHAT_TIMEOUT', 30))
+OPENAI_TRANSCRIPTION_TIMEOUT = float(os.environ.get('OPENAI_TRANSCRIPTION_TIMEOUT', 60))
+# 서버 시작 시 미리 열어둘 커넥션 수 (0 이면 사용 안 함)
+OPENAI_WARMUP_CONNECTIONS = int(os.environ.get('OPENAI_WARMUP_CONNECTIONS', 2))
+
+# 커넥션 풀 통계 (새 커넥션 / TLS 핸드셰이크 횟수와 소요 시간)
+class PoolMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.connects = 0
+        self.connect_seconds = 0.0
+        self.tls_handshakes = 0
+        self.tls_seconds = 0.0
+
+    # httpcore trace 이벤트 집계 (요청마다 새 콜백)
+    def tracer(self):
+        started = {}
+
+        async def trace(event_name: str, info: dict):
+            stage, _, phase = event_name.rpartition(".")
+            if phase == "started":
+                started[stage] = time.perf_counter()
+            elif phase == "complete" and stage in started:
+                elapsed = time.perf_counter() - started.pop(stage)
+                if stage == "connection.connect_tcp":
+                    self.connects += 1
+                    self.connect_seconds += elapsed
+                elif stage == "connection.start_tls":
+                    self.tls_handshakes += 1
+                    self.tls_seconds += elapsed
+
+        return trace
+
+    async def on_request(self, request: httpx.Request):
+        self.requests += 1
+        request.extensions["trace"] = self.tracer()
+
+pool_metrics = PoolMetrics()
+
+def _http2_enabled() -> bool:
+    if not OPENAI_HTTP2:
+        return False
+    if importlib.util.find_spec("h2") is None:
+        logger.warning("OPENAI_HTTP2 is enabled but the h2 package is not installed, using HTTP/1.1")
+        return False
+    return True
+
+http_client = httpx.AsyncClient(
+    http2=_http2_enabled(),
+    limits=httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY
+    ),
+    timeout=httpx.Timeout(OPENAI_CHAT_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+    event_hooks={"request": [pool_metrics.on_request]}
+)
+
+# 이벤트 루프를 막지 않도록 비동기 클라이언트 사용
+# 재시도는 services/resilience.py 에서만 처리 (클라이언트 자체 재시도는 사용 안 함)
+client = AsyncOpenAI(
+    api_key=OPENAI_API_KEY,
+    http_client=http_client,
+    timeout=httpx.Timeout(OPENAI_CHAT_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+    max_retries=0
+)
+
+# 음성 업로드/전사는 대화보다 오래 걸리므로 타임아웃만 다르게 (같은 커넥션 풀 사용)
+transcription_client = client.with_options(
+    timeout=httpx.Timeout(OPENAI_TRANSCRIPTION_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT)
+)
+
+# 엔드포인트 별 재시도 / 헤지 / 서킷 브레이커 (대화와 요약/피드백은 같은 서킷 사용)
+chat_upstream = Upstream(
+    "chat",
+    OPENAI_RETRY_ATTEMPTS,
+    OPENAI_HEDGE_DELAY,
+    OPENAI_HEDGE_MAX_RATIO,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_OPEN_SECONDS
+)
+# 음성 업로드는 비용이 커서 헤지하지 않음
+transcription_upstream = Upstream(
+    "transcription",
+    OPENAI_RETRY_ATTEMPTS,
+    0,
+    0,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_OPEN_SECONDS
+)
+
+def _request_timeout(timeout: float, limit: float) -> httpx.Timeout:
+    return httpx.Timeout(min(timeout, limit), connect=min(timeout, OPENAI_CONNECT_TIMEOUT))
+
+# 헤지 요청 중 늦게 끝난 응답 (사용하지 않지만 과금되므로 사용량만 기록)
+async def _track_discarded(response: Any):
+    track_usage("hedge_discarded", getattr(response, "usage", None))
+
+# 대화 턴은 헤지 요청 사용, background (요약/피드백) 는 제한 시간만 길게
+async def create_chat_completion(*, background: bool = False, **params) -> Any:
+    return await chat_upstream.call(
+        lambda timeout: client.chat.completions.create(
+            **params, timeout=_request_timeout(timeout, OPENAI_CHAT_TIMEOUT)
+        ),
+        OPENAI_CHAT_TIMEOUT,
+        OPENAI_BACKGROUND_DEADLINE if background else OPENAI_CHAT_DEADLINE,
+        hedge=not background,
+        discard=_track_discarded
+    )
+
+# 첫 청크를 받은 뒤 반환 (첫 청크 전까지 재시도 / 헤지)
+async def stream_chat_completion(**params) -> AsyncIterator[Any]:
+    return await chat_upstream.stream(
+        lambda timeout: client.chat.completions.create(
+            **params, stream=True, timeout=_request_timeout(timeout, OPENAI_CHAT_TIMEOUT)
+        ),
+        OPENAI_CHAT_TIMEOUT,
+        OPENAI_CHAT_DEADLINE,
+        hedge=True
+    )
+
+async def create_transcription(audio: io.BytesIO, **params) -> Any:
+    def attempt(timeout: float):
+        # 재시도 시 처음부터 다시 업로드
+        audio.seek(0)
+        return transcription_client.audio.transcriptions.create(
+            file=audio, **params, timeout=_request_timeout(timeout, OPENAI_TRANSCRIPTION_TIMEOUT)
+        )
+
+    return await transcription_upstream.call(attempt, OPENAI_TRANSCRIPTION_TIMEOUT, OPENAI_TRANSCRIPTION_DEADLINE)
+
+# 서버 시작 시 커넥션 미리 연결 (첫 요청의 TCP/TLS 연결 지연 제거, 실패해도 무시)
+async def warmup():
+    if OPENAI_WARMUP_CONNECTIONS <= 0:
+        return
+    started = time.perf_counter()
+    warmup_client = client.with_options(timeout=OPENAI_CONNECT_TIMEOUT, max_retries=0)
+    results = await asyncio.gather(
+        *[warmup_client.models.list() for _ in range(OPENAI_WARMUP_CONNECTIONS)],
+        return_exceptions=True
+    )
+    failed = [result for result in results if isinstance(result, Exception)]
+    if failed:
+        logger.warning(f"OpenAI connection warm-up failed: {failed[0]}")
+        return
+    logger.info(
+        f"Warmed up {OPENAI_WARMUP_CONNECTIONS} OpenAI connections "
+        f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+    )
+
+async def close():
+    await http_client.aclose()
+
+# 커넥션 풀 통계 (metrics 용)
+def pool_stats() -> dict:
+    connections = getattr(getattr(http_client._transport, "_pool", None), "connections", [])
+    idle = sum(1 for connection in connections if connection.is_idle())
+    return {
+        "connections": len(connections),
+        "idle": idle,
+        "active": len(connections) - idle,
+        "requests": pool_metrics.requests,
+        "connects": pool_metrics.connects,
+        "connect_ms_total": pool_metrics.connect_seconds * 1000,
+        "tls_handshakes": pool_metrics.tls_handshakes,
+        "tls_ms_total": pool_metrics.tls_seconds * 1000
+    }
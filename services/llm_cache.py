@@ -0,0 +1,129 @@
+# OpenAI 응답 캐시 (temperature=0 인 결정적 호출 전용)
+# 키 : 모델, 파라미터, 전체 메시지의 해시 / 값 : 응답 content
+# 메모리 LRU 캐시 + 선택적으로 SQLite 파일 캐시 (LLM_CACHE_BACKEND=sqlite, 재시작 후에도 유지)
+
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# 환경 변수 로드
+env_state = os.getenv("ENV_STATE", "dev")
+env_file = ".env.prod" if env_state == "prod" else ".env.dev"
+load_dotenv(env_file)
+
+LLM_CACHE_ENABLED = os.environ.get('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+LLM_CACHE_SIZE = int(os.environ.get('LLM_CACHE_SIZE', 2000))
+LLM_CACHE_TTL = float(os.environ.get('LLM_CACHE_TTL', 60 * 60 * 24))
+LLM_CACHE_BACKEND = os.environ.get('LLM_CACHE_BACKEND', 'memory')
+LLM_CACHE_PATH = os.environ.get('LLM_CACHE_PATH', 'llm_cache.sqlite3')
+# 캐시를 사용하지 않을 상황 (쉼표 구분)
+LLM_CACHE_DISABLED_SITUATIONS = {
+    situation.strip()
+    for situation in os.environ.get('LLM_CACHE_DISABLED_SITUATIONS', '').split(',')
+    if situation.strip()
+}
+
+# SQLite 파일 캐시 (스레드풀에서 호출)
+class SQLiteCacheBackend:
+    def __init__(self, path: str, ttl: float):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, content TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT content, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        content, created_at = row
+        if self.ttl and created_at + self.ttl < time.time():
+            return None
+        return content
+
+    def set(self, key: str, content: str):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, content, created_at) VALUES (?, ?, ?)",
+                (key, content, time.time())
+            )
+            self.conn.commit()
+
+class LLMResponseCache:
+    def __init__(self, enabled: bool, maxsize: int, ttl: float, backend: Optional[SQLiteCacheBackend] = None):
+        self.enabled = enabled
+        self.memory = TTLCache(maxsize, ttl)
+        self.backend = backend
+        self.hits = 0
+        self.backend_hits = 0
+        self.misses = 0
+
+    # 캐시 사용 여부 (결정적 호출 + 상황 별 opt-out)
+    def enabled_for(self, situation: Optional[str], params: dict) -> bool:
+        if not self.enabled:
+            return False
+        if situation in LLM_CACHE_DISABLED_SITUATIONS:
+            return False
+        return params.get("temperature") == 0
+
+    def key(self, params: dict) -> str:
+        payload = json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        content = self.memory.get(key)
+        if content is not None:
+            self.hits += 1
+            return content
+
+        if self.backend is not None:
+            content = await run_in_threadpool(self.backend.get, key)
+            if content is not None:
+                self.backend_hits += 1
+                self.memory.set(key, content)
+                return content
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, content: str):
+        self.memory.set(key, content)
+        if self.backend is not None:
+            try:
+                await run_in_threadpool(self.backend.set, key, content)
+            except sqlite3.Error as e:
+                logger.error(f"Failed to write LLM cache: {e}")
+
+    # 캐시 통계 (metrics 용)
+    def stats(self) -> dict:
+        total = self.hits + self.backend_hits + self.misses
+        return {
+            "size": len(self.memory),
+            "hits": self.hits,
+            "backend_hits": self.backend_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.backend_hits) / total if total else 0.0
+        }
+
+backend = None
+if LLM_CACHE_ENABLED and LLM_CACHE_BACKEND == "sqlite":
+    backend = SQLiteCacheBackend(LLM_CACHE_PATH, LLM_CACHE_TTL)
+
+llm_cache = LLMResponseCache(LLM_CACHE_ENABLED, LLM_CACHE_SIZE, LLM_CACHE_TTL, backend)
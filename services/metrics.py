@@ -0,0 +1,176 @@
+# 요청 단계별 소요 시간 측정 + Prometheus 지표
+# stage("이름") / @timed("이름") 으로 감싼 구간을 히스토그램에 기록하고, 요청 안이면 Server-Timing 헤더로도 전달
+# 요청 밖(작업 큐 등)에서 측정한 구간은 히스토그램에만 기록
+# 지표는 워커(프로세스) 별로 집계되므로 여러 워커로 실행 시 워커마다 수집
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dotenv import load_dotenv
+from prometheus_client import Histogram
+from prometheus_client.core import GaugeMetricFamily, REGISTRY
+from starlette.datastructures import MutableHeaders
+from typing import Callable, Dict, Optional
+import functools
+import inspect
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# 환경 변수 로드
+env_state = os.getenv("ENV_STATE", "dev")
+env_file = ".env.prod" if env_state == "prod" else ".env.dev"
+load_dotenv(env_file)
+
+# 응답에 Server-Timing 헤더 추가 여부
+SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', 'true').lower() == 'true'
+
+# 히스토그램 구간 (초, 짧은 DB 조회 ~ 긴 STT/스트리밍 응답)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+STAGE_SECONDS = Histogram(
+    "kolang_stage_seconds",
+    "Latency of a request stage (STT, prompt, LLM call, DB query)",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    "kolang_request_seconds",
+    "HTTP request latency until the response body is sent",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+
+# 요청 1건의 단계별 소요 시간 (같은 단계는 합산)
+# 응답이 끝나면 closed 로 표시 (요청 중에 만들어진 작업 큐 워커 등이 같은 컨텍스트를 물려받아도 더 쌓이지 않음)
+class RequestTimings:
+    __slots__ = ("stages", "closed")
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.closed = False
+
+    def add(self, name: str, seconds: float):
+        if not self.closed:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def header(self) -> str:
+        return ", ".join(
+            f"{name};dur={seconds * 1000:.1f}"
+            for name, seconds in self.stages.items()
+        )
+
+_request_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+# 구간 소요 시간 기록
+def record(name: str, seconds: float):
+    STAGE_SECONDS.labels(name).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+# with stage("llm.chat"): ... (실패한 구간도 기록)
+@contextmanager
+def stage(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+# 함수 전체를 한 구간으로 기록 (동기/비동기 함수 모두 사용 가능)
+def timed(name: str) -> Callable:
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with stage(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# 요청 단위 측정 미들웨어 (ASGI)
+# 스트리밍 응답은 헤더를 먼저 보내므로 Server-Timing 에는 응답 시작 전까지의 구간만 포함 (히스토그램에는 모두 기록)
+class TimingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if SERVER_TIMING_ENABLED:
+                    timings.add("total", time.perf_counter() - started)
+                    MutableHeaders(scope=message).append("Server-Timing", timings.header())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            timings.closed = True
+            _request_timings.reset(token)
+            # 경로 파라미터가 들어간 실제 URL 대신 라우트 경로로 집계 (매칭되지 않은 요청은 하나로)
+            route = scope.get("route")
+            REQUEST_SECONDS.labels(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status)
+            ).observe(time.perf_counter() - started)
+
+# 캐시/작업 큐/커넥션 풀/호출 제한 통계를 수집 시점에 게이지로 변환
+# 통계 함수는 {"이름": 숫자} 또는 {"그룹": {"이름": 숫자}} 형태의 dict 반환
+# -> kolang_<source>_<이름> (그룹이 있으면 group 라벨)
+class StatsCollector:
+    def __init__(self):
+        self.sources: Dict[str, Callable[[], dict]] = {}
+
+    # 통계 함수 등록
+    def register(self, source: str, stats: Callable[[], dict]):
+        self.sources[source] = stats
+
+    def collect(self):
+        for source, stats in list(self.sources.items()):
+            try:
+                values = stats()
+            except Exception as e:
+                logger.warning(f"Failed to collect {source} stats: {str(e)}")
+                continue
+
+            families = {}
+            for group, key, value in _flatten(values):
+                family = families.get(key)
+                if family is None:
+                    family = families[key] = GaugeMetricFamily(
+                        f"kolang_{source}_{key}",
+                        f"{source} {key}",
+                        labels=["group"] if group is not None else None
+                    )
+                family.add_metric([group] if group is not None else [], value)
+            yield from families.values()
+
+def _flatten(values: dict, group: Optional[str] = None):
+    for key, value in values.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, key)
+        elif isinstance(value, (int, float)):
+            yield group, key, float(value)
+
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
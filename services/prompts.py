@@ -0,0 +1,127 @@
+# 프롬프트 템플릿 레지스트리 (chat.py + stc.py 공용)
+
+from collections import OrderedDict
+from dotenv import load_dotenv
+from string import Template
+from typing import Dict, Tuple
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# 환경 변수 로드
+env_state = os.getenv("ENV_STATE", "dev")
+env_file = ".env.prod" if env_state == "prod" else ".env.dev"
+load_dotenv(env_file)
+
+PROMPT_PATH = os.environ.get('PROMPT_PATH')
+SUMMARY_PATH = os.environ.get('SUMMARY_PATH')
+FEEDBACK_PATH = os.environ.get('FEEDBACK_PATH')
+SUMMARY_FEEDBACK_PATH = os.environ.get(
+    'SUMMARY_FEEDBACK_PATH',
+    os.path.join(PROMPT_PATH or "", "summary_feedback.txt")
+)
+CONTEXT_SUMMARY_PATH = os.environ.get(
+    'CONTEXT_SUMMARY_PATH',
+    os.path.join(PROMPT_PATH or "", "context_summary.txt")
+)
+PROMPT_CACHE_SIZE = int(os.environ.get('PROMPT_CACHE_SIZE', 512))
+PROMPT_RELOAD_INTERVAL = float(os.environ.get('PROMPT_RELOAD_INTERVAL', 5))
+
+# 상황 별 프롬프트 파일 매핑
+SITUATION_PROMPTS = {
+    "go-shopping": "shopping.txt",
+    "talk-with-friends": "friend.txt",
+    "travel": "travel.txt",
+    "learn-alphabet": "alphabet.txt",
+    "airport": "airport.txt"
+}
+
+# 서버 시작 시 프롬프트 파일을 한 번 읽어 Template으로 보관하고 렌더링 결과는 LRU 캐싱
+# 파일 수정 시간(mtime)이 바뀌면 해당 템플릿을 다시 읽고 렌더링 캐시를 비움
+class PromptRegistry:
+    def __init__(self, files: Dict[str, str], cache_size: int, reload_interval: float):
+        self.files = files
+        self.cache_size = cache_size
+        self.reload_interval = reload_interval
+        self.templates: Dict[str, Tuple[float, Template]] = {}
+        self.rendered: "OrderedDict[Tuple[str, ...], str]" = OrderedDict()
+        self.last_check = 0.0
+
+    # 프롬프트 파일 전체 로드 (서버 시작 시 1회)
+    def load(self):
+        for name in self.files:
+            self._load_file(name)
+        self.rendered.clear()
+        self.last_check = time.monotonic()
+        logger.info(f"Loaded {len(self.templates)} prompt templates")
+
+    def _load_file(self, name: str):
+        path = self.files[name]
+        mtime = os.stat(path).st_mtime
+        with open(path, 'r', encoding='utf-8') as file:
+            self.templates[name] = (mtime, Template(file.read().strip()))
+
+    # reload_interval 마다 파일 mtime을 확인해 변경된 템플릿만 다시 로드
+    def _check_reload(self):
+        now = time.monotonic()
+        if now - self.last_check < self.reload_interval:
+            return
+        self.last_check = now
+
+        changed = False
+        for name, path in self.files.items():
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError as e:
+                logger.error(f"Failed to stat prompt file {path}: {e}")
+                continue
+            if mtime != self.templates[name][0]:
+                self._load_file(name)
+                changed = True
+                logger.info(f"Reloaded prompt template: {name}")
+
+        if changed:
+            self.rendered.clear()
+
+    def get(self, name: str) -> Template:
+        if not self.templates:
+            self.load()
+        self._check_reload()
+        return self.templates[name][1]
+
+    # 치환 변수가 없는 프롬프트 (summary 등)
+    def text(self, name: str) -> str:
+        return self.get(name).template
+
+    # level, purpose, age 치환 결과 (LRU 캐싱)
+    def render(self, name: str, level: str, purpose: str, age: str) -> str:
+        template = self.get(name)
+        key = (name, level, purpose, age)
+
+        prompt = self.rendered.get(key)
+        if prompt is not None:
+            self.rendered.move_to_end(key)
+            return prompt
+
+        prompt = template.substitute(
+            level=level,
+            purpose=purpose,
+            age=age
+        )
+        self.rendered[key] = prompt
+        if len(self.rendered) > self.cache_size:
+            self.rendered.popitem(last=False)
+        return prompt
+
+prompt_files = {
+    situation: os.path.join(PROMPT_PATH or "", filename)
+    for situation, filename in SITUATION_PROMPTS.items()
+}
+prompt_files["summary"] = SUMMARY_PATH
+prompt_files["feedback"] = FEEDBACK_PATH
+prompt_files["summary_feedback"] = SUMMARY_FEEDBACK_PATH
+prompt_files["context_summary"] = CONTEXT_SUMMARY_PATH
+
+registry = PromptRegistry(prompt_files, PROMPT_CACHE_SIZE, PROMPT_RELOAD_INTERVAL)
@@ -0,0 +1,359 @@
+# OpenAI 호출 장애 대응 (제한 시간, 재시도, 헤지 요청, 서킷 브레이커)
+# 제한 시간 : 재시도를 포함한 호출 1회 전체 시간, 시도마다 min(시도 타임아웃, 남은 시간) 안에 끝나지 않으면 타임아웃
+# 재시도 : 타임아웃 / 연결 오류 / 429 / 5xx 만 지수 백오프 + jitter 로 재시도 (400, 401 등은 바로 실패)
+#          요청을 다시 보내도 결과가 같은 호출만 사용 (스트리밍은 첫 청크를 받기 전까지만 재시도)
+# 헤지 : 대화 턴 응답이 hedge_delay 안에 오지 않으면 같은 요청을 한 번 더 보내 먼저 온 응답 사용
+#        (추가 요청 수는 전체 호출의 hedge_max_ratio 비율 이하, 서킷이 닫혀 있을 때만)
+# 서킷 브레이커 : 연속 실패가 기준 이상이면 open_seconds 동안 호출하지 않고 바로 503
+#                 이후 호출 1개(probe)만 보내 성공하면 닫고, 실패하면 다시 열림
+# 재시도 후에도 실패하거나 재시도하지 않는 OpenAI 오류는 HTTPException 으로 변환 (타임아웃 504, 429 503, 그 외 502)
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+import asyncio
+import logging
+import math
+import os
+import random
+import time
+
+import openai
+
+from services.metrics import record
+
+logger = logging.getLogger(__name__)
+
+# 환경 변수 로드
+env_state = os.getenv("ENV_STATE", "dev")
+env_file = ".env.prod" if env_state == "prod" else ".env.dev"
+load_dotenv(env_file)
+
+# 호출 1회 전체 제한 시간 (재시도 포함, 초)
+OPENAI_CHAT_DEADLINE = float(os.environ.get('OPENAI_CHAT_DEADLINE', 45))
+OPENAI_BACKGROUND_DEADLINE = float(os.environ.get('OPENAI_BACKGROUND_DEADLINE', 120))
+OPENAI_TRANSCRIPTION_DEADLINE = float(os.environ.get('OPENAI_TRANSCRIPTION_DEADLINE', 90))
+# 첫 시도 포함 최대 시도 횟수, 재시도 대기 시간 (base * 2^n, 최대 max_delay, x0.5 ~ 1.5)
+OPENAI_RETRY_ATTEMPTS = int(os.environ.get('OPENAI_RETRY_ATTEMPTS', 3))
+OPENAI_RETRY_BASE_DELAY = float(os.environ.get('OPENAI_RETRY_BASE_DELAY', 0.5))
+OPENAI_RETRY_MAX_DELAY = float(os.environ.get('OPENAI_RETRY_MAX_DELAY', 4))
+# 헤지 요청 시작 시간 (초, 0 이면 사용 안 함), 전체 호출 대비 최대 비율
+OPENAI_HEDGE_DELAY = float(os.environ.get('OPENAI_HEDGE_DELAY', 3))
+OPENAI_HEDGE_MAX_RATIO = float(os.environ.get('OPENAI_HEDGE_MAX_RATIO', 0.1))
+# 서킷이 열리는 연속 실패 횟수, 열려 있는 시간 (초)
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', 5))
+CIRCUIT_OPEN_SECONDS = float(os.environ.get('CIRCUIT_OPEN_SECONDS', 30))
+
+# APITimeoutError 는 APIConnectionError 의 하위 클래스, InternalServerError 는 5xx
+RETRYABLE_ERRORS = (
+    asyncio.TimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError
+)
+
+def is_retryable(error: BaseException) -> bool:
+    return isinstance(error, RETRYABLE_ERRORS)
+
+# 서킷 브레이커 실패로 세는 오류 (429 는 사용량 제한이라 서버 장애로 보지 않음)
+def is_upstream_failure(error: BaseException) -> bool:
+    return is_retryable(error) and not isinstance(error, openai.RateLimitError)
+
+# 응답의 Retry-After 헤더 (초)
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt: int, error: BaseException) -> float:
+    delay = min(OPENAI_RETRY_MAX_DELAY, OPENAI_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    # 동시에 실패한 요청들이 한꺼번에 재시도하지 않도록 분산
+    delay *= random.uniform(0.5, 1.5)
+    retry_after = retry_after_seconds(error)
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+def retry_after_header(seconds: float) -> dict:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+# 재시도 후에도 실패한 오류 -> 클라이언트 응답
+def upstream_error(error: BaseException) -> HTTPException:
+    if isinstance(error, (asyncio.TimeoutError, openai.APITimeoutError)):
+        return HTTPException(status_code=504, detail="AI 응답 시간이 초과되었습니다. 잠시 후 다시 시도해주세요.")
+    if isinstance(error, openai.RateLimitError):
+        return HTTPException(
+            status_code=503,
+            detail="AI 서버 요청이 많습니다. 잠시 후 다시 시도해주세요.",
+            headers=retry_after_header(retry_after_seconds(error) or OPENAI_RETRY_MAX_DELAY)
+        )
+    return HTTPException(status_code=502, detail="AI 서버 오류가 발생했습니다. 잠시 후 다시 시도해주세요.")
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, open_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.opened = 0
+        self.rejected = 0
+
+    def _remaining(self) -> float:
+        return self.opened_at + self.open_seconds - time.monotonic()
+
+    def _unavailable(self, retry_after: float) -> HTTPException:
+        self.rejected += 1
+        return HTTPException(
+            status_code=503,
+            detail="AI 서버 응답이 원활하지 않습니다. 잠시 후 다시 시도해주세요.",
+            headers=retry_after_header(retry_after)
+        )
+
+    # 호출 가능 여부만 확인 (스트리밍 응답 시작 전 확인용)
+    def check(self):
+        if self.failure_threshold <= 0:
+            return
+        if self.state == self.OPEN and self._remaining() > 0:
+            raise self._unavailable(self._remaining())
+        if self.state == self.HALF_OPEN and self.probing:
+            raise self._unavailable(1)
+
+    # 호출 시작 (열려 있으면 503), 복구 확인용 호출이면 True
+    def before_call(self) -> bool:
+        self.check()
+        if self.state == self.OPEN:
+            self.state = self.HALF_OPEN
+            logger.info(f"OpenAI {self.name} circuit half-open, sending probe")
+        if self.state == self.HALF_OPEN:
+            self.probing = True
+            return True
+        return False
+
+    def on_success(self):
+        self.failures = 0
+        if self.state != self.CLOSED:
+            logger.info(f"OpenAI {self.name} circuit closed")
+        self.state = self.CLOSED
+        self.probing = False
+
+    def on_failure(self):
+        self.failures += 1
+        if self.failure_threshold <= 0:
+            return
+        if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self.probing = False
+            self.opened += 1
+            logger.warning(
+                f"OpenAI {self.name} circuit opened for {self.open_seconds:.0f}s "
+                f"after {self.failures} consecutive failures"
+            )
+
+    # 결과 없이 끝난 호출 (취소, 429) : 복구 확인 호출이었다면 다음 호출이 다시 확인
+    def on_abandon(self, probe: bool):
+        if probe and self.state == self.HALF_OPEN:
+            self.probing = False
+
+    def stats(self) -> dict:
+        return {
+            "open": int(self.state == self.OPEN),
+            "half_open": int(self.state == self.HALF_OPEN),
+            "consecutive_failures": self.failures,
+            "opened": self.opened,
+            "rejected": self.rejected
+        }
+
+# 같은 OpenAI 엔드포인트를 쓰는 호출들의 재시도 / 헤지 / 서킷 브레이커
+class Upstream:
+    def __init__(
+        self,
+        name: str,
+        retry_attempts: int,
+        hedge_delay: float,
+        hedge_max_ratio: float,
+        failure_threshold: int,
+        open_seconds: float
+    ):
+        self.name = name
+        self.retry_attempts = max(1, retry_attempts)
+        self.hedge_delay = hedge_delay
+        self.hedge_max_ratio = hedge_max_ratio
+        self.breaker = CircuitBreaker(name, failure_threshold, open_seconds)
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _hedge_allowed(self) -> bool:
+        return (
+            self.hedge_delay > 0
+            and self.breaker.state == CircuitBreaker.CLOSED
+            and self.hedges < self.calls * self.hedge_max_ratio
+        )
+
+    # 먼저 성공한 요청 결과 사용, 나머지는 취소 (이미 끝난 요청 결과는 discard 로 정리)
+    async def _hedged(
+        self,
+        factory: Callable[[float], Awaitable[Any]],
+        timeout: float,
+        discard: Optional[Callable[[Any], Awaitable[None]]]
+    ) -> Any:
+        started = time.monotonic()
+        primary = asyncio.ensure_future(factory(timeout))
+        tasks = [primary]
+        winner = None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=min(self.hedge_delay, timeout))
+            if not done and self._hedge_allowed():
+                self.hedges += 1
+                record(f"llm.hedge.{self.name}", time.monotonic() - started)
+                tasks.append(asyncio.ensure_future(factory(timeout - (time.monotonic() - started))))
+
+            error = None
+            pending = set(tasks)
+            while pending:
+                remaining = timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = task
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            if pending or error is None:
+                raise asyncio.TimeoutError()
+            raise error
+        finally:
+            for task in tasks:
+                if task is winner:
+                    continue
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled() and task.exception() is None and discard is not None:
+                    await discard(task.result())
+
+    # factory(timeout) : 시도 1회 (timeout 은 HTTP 요청 타임아웃으로 전달)
+    async def call(
+        self,
+        factory: Callable[[float], Awaitable[Any]],
+        attempt_timeout: float,
+        deadline: float,
+        hedge: bool = False,
+        discard: Optional[Callable[[Any], Awaitable[None]]] = None
+    ) -> Any:
+        self.calls += 1
+        deadline_at = time.monotonic() + deadline
+        attempt = 0
+        while True:
+            probe = self.breaker.before_call()
+            timeout = min(attempt_timeout, deadline_at - time.monotonic())
+            try:
+                # 복구 확인 호출은 헤지하지 않음
+                if hedge and not probe:
+                    result = await self._hedged(factory, timeout, discard)
+                else:
+                    result = await asyncio.wait_for(factory(timeout), timeout)
+            except asyncio.CancelledError:
+                self.breaker.on_abandon(probe)
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    # 응답은 받았으므로 서버 장애는 아님 (요청 오류)
+                    self.breaker.on_success()
+                    # 400 / 401 / 404 등 재시도하지 않는 OpenAI 오류도 원인을 남기고 502 로 응답
+                    if isinstance(e, openai.APIError):
+                        self.failures += 1
+                        logger.error(f"OpenAI {self.name} call rejected: {e!r}")
+                        raise upstream_error(e) from e
+                    raise
+                self.failures += 1
+                if is_upstream_failure(e):
+                    self.breaker.on_failure()
+                else:
+                    self.breaker.on_abandon(probe)
+
+                attempt += 1
+                delay = backoff_delay(attempt, e)
+                if attempt >= self.retry_attempts or time.monotonic() + delay >= deadline_at:
+                    logger.warning(f"OpenAI {self.name} call failed after {attempt} attempt(s): {e!r}")
+                    raise upstream_error(e) from e
+                self.retries += 1
+                logger.info(
+                    f"Retrying OpenAI {self.name} call in {delay:.2f}s "
+                    f"(attempt {attempt}/{self.retry_attempts}): {e!r}"
+                )
+                await asyncio.sleep(delay)
+                continue
+
+            self.breaker.on_success()
+            return result
+
+    # 스트리밍 호출 : 첫 청크를 받을 때까지를 시도 1회로 보고 재시도 / 헤지
+    # 첫 청크 이후 오류는 이미 보낸 응답이 있으므로 재시도하지 않음
+    async def stream(
+        self,
+        open_stream: Callable[[float], Awaitable[openai.AsyncStream]],
+        attempt_timeout: float,
+        deadline: float,
+        hedge: bool = False
+    ) -> AsyncIterator[Any]:
+        async def first_chunk(timeout: float):
+            stream = await open_stream(timeout)
+            try:
+                chunk = await stream.__anext__()
+            except StopAsyncIteration:
+                chunk = None
+            except BaseException:
+                await stream.response.aclose()
+                raise
+            return stream, chunk
+
+        async def discard(result):
+            await result[0].response.aclose()
+
+        stream, chunk = await self.call(first_chunk, attempt_timeout, deadline, hedge, discard)
+        return self._resume(stream, chunk)
+
+    async def _resume(self, stream: openai.AsyncStream, first: Any) -> AsyncIterator[Any]:
+        try:
+            if first is not None:
+                yield first
+            async for chunk in stream:
+                yield chunk
+        except RETRYABLE_ERRORS as e:
+            if is_upstream_failure(e):
+                self.breaker.on_failure()
+            logger.warning(f"OpenAI {self.name} stream failed: {e!r}")
+            raise upstream_error(e) from e
+        except openai.APIError as e:
+            logger.error(f"OpenAI {self.name} stream rejected: {e!r}")
+            raise upstream_error(e) from e
+        finally:
+            await stream.response.aclose()
+
+    # 통계 (metrics 용)
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            **{f"circuit_{key}": value for key, value in self.breaker.stats().items()}
+        }
@@ -0,0 +1,79 @@
+# 진행 중인 대화 상태 캐시 (워커 별)
+# 상황, 렌더링된 시스템 프롬프트, 누적 요약, 최근 메시지를 chat_id 별로 보관해
+# 캐시된 대화의 턴은 DB 조회 없이 처리하고, 새 메시지는 DB에 저장한 뒤 캐시에도 반영 (write-through)
+# 여러 워커에서 같은 대화를 처리할 수 있으므로 캐시는 읽기용으로만 사용하고,
+# 저장 시 crud.save_turn 이 DB 기준으로 진행 중인 대화인지 확인 (종료된 대화면 404 + 캐시 제거)
+
+from dotenv import load_dotenv
+from typing import List, NamedTuple, Optional
+import os
+
+from services.cache import TTLCache
+
+# 환경 변수 로드
+env_state = os.getenv("ENV_STATE", "dev")
+env_file = ".env.prod" if env_state == "prod" else ".env.dev"
+load_dotenv(env_file)
+
+CHAT_STATE_CACHE_SIZE = int(os.environ.get('CHAT_STATE_CACHE_SIZE', 2000))
+CHAT_STATE_TTL = float(os.environ.get('CHAT_STATE_TTL', 600))
+
+class CachedMessage(NamedTuple):
+    message_id: int
+    message: Optional[str]
+    is_answer: bool
+
+class ChatState:
+    __slots__ = (
+        "chat_id", "user_id", "situation", "system_prompt",
+        "context_summary", "summarized_upto", "messages", "persisted"
+    )
+
+    def __init__(
+        self,
+        chat_id: str,
+        user_id: str,
+        situation: str,
+        system_prompt: str,
+        context_summary: Optional[str],
+        summarized_upto: Optional[int],
+        messages: List[CachedMessage],
+        persisted: bool = True
+    ):
+        self.chat_id = chat_id
+        self.user_id = user_id
+        self.situation = situation
+        self.system_prompt = system_prompt
+        self.context_summary = context_summary
+        self.summarized_upto = summarized_upto
+        # 누적 요약에 포함되지 않은 메시지 (오름차순)
+        self.messages = messages
+        # 새 대화는 첫 턴이 저장될 때 채팅방도 함께 생성 (그 전까지 False)
+        self.persisted = persisted
+
+    # 저장된 턴 반영
+    def append(self, *messages: CachedMessage):
+        self.messages.extend(messages)
+
+    # 누적 요약 갱신 반영 (요약에 포함된 메시지는 제거)
+    def fold(self, context_summary: str, upto: int):
+        self.context_summary = context_summary
+        self.summarized_upto = upto
+        self.messages = [msg for msg in self.messages if msg.message_id > upto]
+
+chat_states = TTLCache(CHAT_STATE_CACHE_SIZE, CHAT_STATE_TTL)
+
+# 캐시된 대화 상태 조회 (다른 사용자의 대화이거나 상황이 바뀐 경우 사용하지 않음)
+def get_chat_state(chat_id: Optional[str], user_id: str, situation: str) -> Optional[ChatState]:
+    if chat_id is None:
+        return None
+    state = chat_states.get(chat_id)
+    if state is None or state.user_id != user_id:
+        return None
+    if situation != "random-course" and situation != state.situation:
+        return None
+    return state
+
+# 사용자의 대화 상태 전체 제거 (온보딩 정보 변경 시)
+def invalidate_user_states(user_id: str) -> int:
+    return chat_states.pop_where(lambda key, state: state.user_id == user_id)
@@ -0,0 +1,76 @@
+# 스트리밍 응답 처리 (SSE / WebSocket 공용)
+
+import json
+import re
+
+RESPONSE_KEY = re.compile(r'"response"\s*:\s*"')
+HEX_DIGITS = set("0123456789abcdefABCDEF")
+
+# 스트리밍되는 JSON 객체에서 "response" 문자열 값만 점진적으로 추출
+# (모델 출력 형식: {"response": "...", "error": false})
+class ResponseFieldStream:
+    def __init__(self):
+        self.raw = ""
+        self.pos = None
+        self.done = False
+
+    # 새로 받은 토큰을 추가하고, 디코딩이 끝난 텍스트만 반환
+    def feed(self, chunk: str) -> str:
+        self.raw += chunk
+        if self.done:
+            return ""
+
+        if self.pos is None:
+            match = RESPONSE_KEY.search(self.raw)
+            if not match:
+                return ""
+            self.pos = match.end()
+
+        out = []
+        raw = self.raw
+        i = self.pos
+        while i < len(raw):
+            c = raw[i]
+            if c == '"':
+                self.done = True
+                i += 1
+                break
+            if c != '\\':
+                out.append(c)
+                i += 1
+                continue
+
+            # 이스케이프 시퀀스가 청크 경계에서 잘린 경우 다음 청크까지 대기
+            if i + 1 >= len(raw):
+                break
+            if raw[i + 1] != 'u':
+                # 잘못된 이스케이프는 원문 그대로 전달 (최종 응답은 전체 JSON 파싱 결과 기준)
+                try:
+                    out.append(json.loads(f'"{raw[i:i + 2]}"'))
+                except ValueError:
+                    out.append(raw[i:i + 2])
+                i += 2
+                continue
+            end = i + 6
+            if end > len(raw):
+                break
+            if not all(h in HEX_DIGITS for h in raw[i + 2:end]):
+                i = end
+                continue
+            # 서로게이트 쌍(이모지 등)은 두 시퀀스를 함께 디코딩
+            if 0xD800 <= int(raw[i + 2:end], 16) <= 0xDBFF:
+                if end + 6 > len(raw):
+                    break
+                end += 6
+            try:
+                out.append(json.loads(f'"{raw[i:end]}"'))
+            except ValueError:
+                pass
+            i = end
+
+        self.pos = i
+        return "".join(out)
+
+# SSE 이벤트 포맷
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
@@ -0,0 +1,280 @@
+# STT (음성 -> 텍스트) 백엔드
+# 같은 음성 재전송(모바일 재시도 등)은 음성 해시 기준 캐시로 전사 생략
+# openai : whisper-1 API (기본값)
+# local  : faster-whisper (CTranslate2, CPU 양자화 모델), 프로세스 풀 워커마다 모델을 한 번만 로드
+#          pip install faster-whisper 필요
+
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from typing import Dict, Optional
+import abc
+import asyncio
+import hashlib
+import importlib.util
+import io
+import logging
+import multiprocessing
+import os
+
+from services.audio import preprocess_upload
+from services.cache import TTLCache
+from services.limiter import llm_limiter
+from services.llm import create_transcription, transcription_upstream
+from services.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# 환경 변수 로드
+env_state = os.getenv("ENV_STATE", "dev")
+env_file = ".env.prod" if env_state == "prod" else ".env.dev"
+load_dotenv(env_file)
+
+STT_BACKEND = os.environ.get('STT_BACKEND', 'openai')
+STT_LANGUAGE = os.environ.get('STT_LANGUAGE', 'ko')
+LOCAL_STT_MODEL = os.environ.get('LOCAL_STT_MODEL', 'small')
+LOCAL_STT_COMPUTE_TYPE = os.environ.get('LOCAL_STT_COMPUTE_TYPE', 'int8')
+LOCAL_STT_WORKERS = int(os.environ.get('LOCAL_STT_WORKERS', 1))
+LOCAL_STT_THREADS = int(os.environ.get('LOCAL_STT_THREADS', 4))
+LOCAL_STT_BEAM_SIZE = int(os.environ.get('LOCAL_STT_BEAM_SIZE', 1))
+STT_CACHE_ENABLED = os.environ.get('STT_CACHE_ENABLED', 'true').lower() == 'true'
+STT_CACHE_SIZE = int(os.environ.get('STT_CACHE_SIZE', 500))
+STT_CACHE_TTL = float(os.environ.get('STT_CACHE_TTL', 60 * 60))
+# 이보다 큰 음성은 해시 계산을 스레드풀에서 실행
+STT_HASH_THREADPOOL_BYTES = 1024 * 1024
+
+class STTBackend(abc.ABC):
+    name = "base"
+    model = ""
+
+    async def start(self):
+        pass
+
+    def shutdown(self):
+        pass
+
+    # 전사 가능 여부 확인 (업로드 처리 전, 불가능하면 HTTPException)
+    def check_available(self):
+        pass
+
+    @abc.abstractmethod
+    async def transcribe(self, audio: io.BytesIO, language: str) -> str:
+        ...
+
+# OpenAI whisper-1 API
+class OpenAISTTBackend(STTBackend):
+    name = "openai"
+    model = "whisper-1"
+
+    # whisper API 장애 중(서킷 열림)이면 503
+    def check_available(self):
+        transcription_upstream.breaker.check()
+
+    async def transcribe(self, audio: io.BytesIO, language: str) -> str:
+        async with llm_limiter.slot():
+            transcription = await create_transcription(
+                audio,
+                model=self.model,
+                language=language,
+                temperature=0.0,
+            )
+        return transcription.text
+
+# 프로세스 풀 워커 전역 모델
+_local_model = None
+
+def _load_local_model(model_name: str, compute_type: str, threads: int):
+    global _local_model
+    from faster_whisper import WhisperModel
+    _local_model = WhisperModel(
+        model_name,
+        device="cpu",
+        compute_type=compute_type,
+        cpu_threads=threads
+    )
+
+def _local_ready() -> bool:
+    return _local_model is not None
+
+def _local_transcribe(data: bytes, language: str, beam_size: int) -> str:
+    segments, _ = _local_model.transcribe(
+        io.BytesIO(data),
+        language=language,
+        beam_size=beam_size,
+        temperature=0.0,
+        condition_on_previous_text=False
+    )
+    return "".join(segment.text for segment in segments).strip()
+
+# 로컬 CPU faster-whisper
+class LocalWhisperSTTBackend(STTBackend):
+    name = "local"
+
+    def __init__(self, model: str, compute_type: str, workers: int, threads: int, beam_size: int):
+        self.model = model
+        self.compute_type = compute_type
+        self.workers = workers
+        self.threads = threads
+        self.beam_size = beam_size
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            # 워커 초기화 실패는 BrokenProcessPool 로만 보이므로 미리 확인
+            if importlib.util.find_spec("faster_whisper") is None:
+                raise RuntimeError("STT_BACKEND=local 사용 시 faster-whisper 패키지가 필요합니다.")
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_load_local_model,
+                initargs=(self.model, self.compute_type, self.threads)
+            )
+        return self.executor
+
+    # 서버 시작 시 워커를 띄워 모델을 미리 로드
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        await asyncio.gather(*[
+            loop.run_in_executor(executor, _local_ready)
+            for _ in range(self.workers)
+        ])
+        logger.info(f"Loaded local STT model {self.model} ({self.compute_type}) in {self.workers} workers")
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def transcribe(self, audio: io.BytesIO, language: str) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(), _local_transcribe, audio.getvalue(), language, self.beam_size
+        )
+
+def create_backend(name: str) -> STTBackend:
+    if name == "openai":
+        return OpenAISTTBackend()
+    if name == "local":
+        return LocalWhisperSTTBackend(
+            LOCAL_STT_MODEL,
+            LOCAL_STT_COMPUTE_TYPE,
+            LOCAL_STT_WORKERS,
+            LOCAL_STT_THREADS,
+            LOCAL_STT_BEAM_SIZE
+        )
+    raise ValueError(f"지원하지 않는 STT 백엔드입니다: {name}")
+
+backend = create_backend(STT_BACKEND)
+
+# 전사 결과 캐시 (키 : 음성 해시 + 언어 + 백엔드/모델)
+stt_cache = TTLCache(STT_CACHE_SIZE, STT_CACHE_TTL)
+# 처리 중인 동일 음성 요청 (중복 요청은 먼저 들어온 요청의 결과를 기다림)
+_inflight: Dict[str, asyncio.Future] = {}
+
+def _hash_audio(data: memoryview, language: str) -> str:
+    digest = hashlib.sha256(data).hexdigest()
+    return f"{backend.name}:{backend.model}:{language}:{digest}"
+
+async def transcription_key(audio: io.BytesIO, language: str) -> str:
+    data = audio.getbuffer()
+    try:
+        if data.nbytes > STT_HASH_THREADPOOL_BYTES:
+            return await run_in_threadpool(_hash_audio, data, language)
+        return _hash_audio(data, language)
+    finally:
+        data.release()
+
+async def _transcribe(audio: io.BytesIO) -> str:
+    # 무음 제거 + 압축 (AUDIO_PREPROCESS=true 인 경우)
+    with stage("stt.preprocess"):
+        audio = await preprocess_upload(audio)
+    with stage("stt.transcribe"):
+        return await backend.transcribe(audio, STT_LANGUAGE)
+
+# STT 처리 (업로드 원본 기준으로 캐시 확인 후 전처리 + 전사)
+async def speech2text(audio: io.BytesIO) -> str:
+    try:
+        if not STT_CACHE_ENABLED:
+            return await _transcribe(audio)
+
+        key = await transcription_key(audio, STT_LANGUAGE)
+        text = stt_cache.get(key)
+        if text is not None:
+            logger.info(f"STT cache hit: {key[-12:]}")
+            return text
+
+        pending = _inflight.get(key)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # 먼저 들어온 요청이 취소(연결 종료)된 경우 직접 처리
+                if not pending.cancelled():
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        _inflight[key] = future
+        try:
+            text = await _transcribe(audio)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 기다리는 요청이 없을 때 "exception was never retrieved" 경고 방지
+            future.exception()
+            raise
+        else:
+            stt_cache.set(key, text)
+            future.set_result(text)
+            return text
+        finally:
+            if _inflight.get(key) is future:
+                del _inflight[key]
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"STT 처리 중 오류 발생: {str(e)}"
+        )
+
+# 로컬 샘플 파일로 STT 백엔드 속도 측정
+# python -m services.stt [--backend local|openai] [--repeat N] sample.webm [...]
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--backend", default=STT_BACKEND)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    async def bench():
+        stt = create_backend(args.backend)
+        started = time.perf_counter()
+        await stt.start()
+        print(f"[{stt.name}:{stt.model}] startup {(time.perf_counter() - started) * 1000:.0f}ms")
+        try:
+            for path in args.files:
+                with open(path, "rb") as file:
+                    data = file.read()
+                timings = []
+                for _ in range(args.repeat):
+                    audio = io.BytesIO(data)
+                    audio.name = os.path.basename(path)
+                    started = time.perf_counter()
+                    text = await stt.transcribe(audio, STT_LANGUAGE)
+                    timings.append((time.perf_counter() - started) * 1000)
+                timings.sort()
+                print(
+                    f"{path}: min {timings[0]:.0f}ms / median {timings[len(timings) // 2]:.0f}ms"
+                    f" / max {timings[-1]:.0f}ms  {text}"
+                )
+        finally:
+            stt.shutdown()
+
+    asyncio.run(bench())
@@ -0,0 +1,77 @@
+# OpenAI 토큰 사용량 / 비용 집계
+# 모든 chat completions 호출의 usage (prompt / completion / cached 토큰) 를 Prometheus 카운터에 기록하고
+# DB 저장용 TokenUsage 로 변환 (대화 턴 : messages + chatlist, 요약/피드백/누적 요약 : chatlist)
+# 비용은 저장하지 않고 조회 시 단가로 계산 (단가 변경 시 과거 사용량도 새 단가로 계산됨)
+# whisper-1 은 토큰이 아닌 음성 길이로 과금되어 usage 가 없으므로 제외
+# 헤지 요청 : 사용하지 않은 응답이 끝까지 온 경우만 call="hedge_discarded" 로 기록 (채팅방 사용량에는 포함하지 않음)
+#            중간에 취소된 요청 / 첫 청크 이후 닫은 스트림은 usage 를 받지 못해 집계되지 않으므로 헤지 중에는 실제보다 적게 집계됨
+#            (llm.hedge.chat 횟수로 규모 확인)
+
+from dotenv import load_dotenv
+from prometheus_client import Counter
+from typing import Any, NamedTuple, Optional
+import os
+
+# 환경 변수 로드
+env_state = os.getenv("ENV_STATE", "dev")
+env_file = ".env.prod" if env_state == "prod" else ".env.dev"
+load_dotenv(env_file)
+
+# 1M 토큰 당 단가 (USD, 기본값 gpt-4o-mini), cached 는 프롬프트 캐시에 걸린 입력 토큰
+OPENAI_PRICE_INPUT = float(os.environ.get('OPENAI_PRICE_INPUT', 0.15))
+OPENAI_PRICE_CACHED_INPUT = float(os.environ.get('OPENAI_PRICE_CACHED_INPUT', 0.075))
+OPENAI_PRICE_OUTPUT = float(os.environ.get('OPENAI_PRICE_OUTPUT', 0.6))
+
+# 스트리밍 응답 마지막 청크에 usage 포함 요청 (openai 1.6 은 stream_options 인자가 없어 extra_body 로 전달)
+STREAM_USAGE_OPTIONS = {"stream_options": {"include_usage": True}}
+
+TOKENS = Counter(
+    "kolang_llm_tokens",
+    "OpenAI tokens used (prompt includes cached)",
+    ["call", "situation", "kind"]
+)
+
+class TokenUsage(NamedTuple):
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+
+    def merge(self, other: Optional["TokenUsage"]) -> "TokenUsage":
+        if other is None:
+            return self
+        return TokenUsage(
+            self.prompt_tokens + other.prompt_tokens,
+            self.completion_tokens + other.completion_tokens,
+            self.cached_tokens + other.cached_tokens
+        )
+
+# 응답 객체 / dict 공용 (openai 1.6 은 prompt_tokens_details, 청크의 usage 를 dict 로 보관)
+def _field(value: Any, name: str) -> Any:
+    if value is None:
+        return None
+    if isinstance(value, dict):
+        return value.get(name)
+    return getattr(value, name, None)
+
+# 호출 1회 사용량 기록 (usage 가 없으면 None)
+# call : chat, summary, feedback, summary_feedback, context_summary
+def track_usage(call: str, usage: Any, situation: str = "") -> Optional[TokenUsage]:
+    if usage is None:
+        return None
+    tokens = TokenUsage(
+        _field(usage, "prompt_tokens") or 0,
+        _field(usage, "completion_tokens") or 0,
+        _field(_field(usage, "prompt_tokens_details"), "cached_tokens") or 0
+    )
+    TOKENS.labels(call, situation, "prompt").inc(tokens.prompt_tokens)
+    TOKENS.labels(call, situation, "completion").inc(tokens.completion_tokens)
+    TOKENS.labels(call, situation, "cached").inc(tokens.cached_tokens)
+    return tokens
+
+# 토큰 수 -> 비용 (USD)
+def cost_usd(prompt_tokens: int, completion_tokens: int, cached_tokens: int) -> float:
+    return (
+        (prompt_tokens - cached_tokens) * OPENAI_PRICE_INPUT
+        + cached_tokens * OPENAI_PRICE_CACHED_INPUT
+        + completion_tokens * OPENAI_PRICE_OUTPUT
+    ) / 1_000_000
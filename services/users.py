@@ -0,0 +1,94 @@
+# 인증된 사용자 정보 캐시 (워커 별)
+# 토큰 검증 후 매 요청마다 users 테이블을 조회하지 않도록 라우터에서 쓰는 필드만 user_id 별로 보관
+# 온보딩 정보 변경(/api/user/start), 탈퇴 처리 시 invalidate_user 로 제거
+# 다른 워커의 캐시는 TTL 이후 갱신되므로 USER_CACHE_TTL 은 짧게 유지
+# 대화 저장(crud.save_turn)은 캐시와 관계없이 DB 에서 탈퇴 여부를 확인하고, 거절되면 캐시 제거
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Any, NamedTuple, Optional
+import os
+
+from db.database import SessionLocal
+from db.models import User
+from services.cache import TTLCache
+from services.metrics import timed
+
+# 환경 변수 로드
+env_state = os.getenv("ENV_STATE", "dev")
+env_file = ".env.prod" if env_state == "prod" else ".env.dev"
+load_dotenv(env_file)
+
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 10000))
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 300))
+
+class CachedUser(NamedTuple):
+    user_id: str
+    email: str
+    name: Optional[str]
+    created_at: datetime
+    onboarding: bool
+    onboarding_info: Any
+
+user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+
+# 탈퇴하지 않은 사용자 조회 (필요한 컬럼만)
+@timed("db.load_user")
+def load_user(db: Session, user_id: str) -> Optional[CachedUser]:
+    row = db.execute(
+        select(
+            User.user_id,
+            User.email,
+            User.name,
+            User.created_at,
+            User.onboarding,
+            User.onboarding_info
+        ).where(
+            User.user_id == user_id,
+            User.deleted_at.is_(None)
+        )
+    ).first()
+    return CachedUser(*row) if row else None
+
+def _load_user_with_session(user_id: str) -> Optional[CachedUser]:
+    with SessionLocal() as db:
+        return load_user(db, user_id)
+
+# 캐시된 사용자 조회 (없으면 DB 조회 후 저장, db 가 없으면 별도 세션 사용)
+async def get_cached_user(user_id: str, db: Optional[Session] = None) -> Optional[CachedUser]:
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+
+    if db is None:
+        user = await run_in_threadpool(_load_user_with_session, user_id)
+    else:
+        user = await run_in_threadpool(load_user, db, user_id)
+
+    if user is not None:
+        user_cache.set(user_id, user)
+    return user
+
+# 온보딩 정보 불러오기 -> (level, purpose, age)
+async def get_user_onboarding(user_id: str, db: Optional[Session] = None):
+    user = await get_cached_user(user_id, db)
+    if not user:
+        raise HTTPException(
+            status_code=404,
+            detail="사용자 정보가 없습니다."
+        )
+    if not user.onboarding or not user.onboarding_info:
+        raise HTTPException(
+            status_code=400,
+            detail="사용자의 온보딩 정보를 불러올 수 없습니다."
+        )
+
+    return user.onboarding_info
+
+# 캐시된 사용자 정보 제거 (온보딩 정보 변경, 탈퇴 시)
+def invalidate_user(user_id: str):
+    user_cache.pop(user_id)
@@ -0,0 +1,158 @@
+# 스모크 테스트 공통 설정
+# OpenAI 대역 서버(bench.fake_openai)는 별도 프로세스로 띄우고, 앱은 테스트 프로세스 안에서 ASGI 로 호출 (lifespan 포함)
+# 앱 모듈은 import 시 환경 변수를 읽으므로 환경 변수를 먼저 설정한 뒤 import
+#
+# 실행 : python -m pytest -q
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench.load import access_token, free_port, seed_users
+
+TEST_DIR = tempfile.mkdtemp(prefix="kolang-test-")
+DATABASE_URL = f"sqlite:///{os.path.join(TEST_DIR, 'kolang.db')}"
+FAKE_PORT = free_port()
+FAKE_URL = f"http://127.0.0.1:{FAKE_PORT}"
+SECRET_KEY = "test-secret"
+
+# 대역 서버 기본 설정 (테스트마다 이 값으로 되돌림)
+FAKE_DEFAULTS = {
+    "latency": 0.01,
+    "jitter": 0.0,
+    "token_rate": 10000.0,
+    "transcription_latency": 0.01,
+    "error_rate": 0.0,
+    "rate_limit_rate": 0.0,
+    "hang_rate": 0.0,
+    "hang_seconds": 30.0,
+    "fail_next": 0,
+    "fail_status": 500,
+    "hang_next": 0,
+    "end_after": 12
+}
+
+os.environ.update({
+    "DATABASE_URL": DATABASE_URL,
+    "OPENAI_BASE_URL": f"{FAKE_URL}/v1",
+    "OPENAI_API_KEY": "fake",
+    "SECRET_KEY": SECRET_KEY,
+    "PROMPT_PATH": os.path.join(ROOT, "prompts"),
+    "SUMMARY_PATH": os.path.join(ROOT, "prompts", "summary.txt"),
+    "FEEDBACK_PATH": os.path.join(ROOT, "prompts", "feedback.txt"),
+    # 같은 요청의 캐시된 응답이 장애 주입을 가리지 않도록 응답 캐시 사용 안 함
+    "LLM_CACHE_ENABLED": "false",
+    "STT_CACHE_ENABLED": "false",
+    # 빈도 제한은 test_limiter 에서 별도 인스턴스로 확인
+    "LLM_USER_RATE": "0",
+    "OPENAI_WARMUP_CONNECTIONS": "0",
+    "OPENAI_CHAT_TIMEOUT": "1",
+    "OPENAI_CHAT_DEADLINE": "2.5",
+    "OPENAI_BACKGROUND_DEADLINE": "5",
+    "OPENAI_RETRY_ATTEMPTS": "3",
+    "OPENAI_RETRY_BASE_DELAY": "0.01",
+    "OPENAI_RETRY_MAX_DELAY": "0.05",
+    "OPENAI_HEDGE_DELAY": "0.3",
+    "OPENAI_HEDGE_MAX_RATIO": "1",
+    "CIRCUIT_FAILURE_THRESHOLD": "3",
+    "CIRCUIT_OPEN_SECONDS": "0.5",
+    "JOB_WORKERS": "2",
+    "JOB_MAX_RETRIES": "0",
+    "JOB_RETRY_DELAY": "0.01",
+    "JOB_DRAIN_TIMEOUT": "2",
+    "SUMMARY_CLAIM_TTL": "600",
+    "TIKTOKEN_LOAD_TIMEOUT": "10"
+})
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+# 대역 서버 실행 + DB 마이그레이션
+@pytest.fixture(scope="session")
+def fake_server():
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=ROOT, check=True,
+                   stdout=subprocess.DEVNULL)
+    args = [f"--{key.replace('_', '-')}={value}" for key, value in FAKE_DEFAULTS.items()]
+    process = subprocess.Popen(
+        [sys.executable, "-m", "bench.fake_openai", "--port", str(FAKE_PORT), *args],
+        cwd=ROOT
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                httpx.get(f"{FAKE_URL}/v1/models")
+                break
+            except httpx.HTTPError:
+                if time.monotonic() > deadline or process.poll() is not None:
+                    raise RuntimeError("fake OpenAI server did not start")
+                time.sleep(0.1)
+        yield FAKE_URL
+    finally:
+        process.kill()
+        process.wait()
+
+# 앱 (lifespan 으로 작업 큐 / STT 백엔드 시작, 종료 시 정리)
+@pytest.fixture(scope="session")
+async def app(fake_server):
+    from main import app as application
+
+    async with application.router.lifespan_context(application):
+        yield application
+
+@pytest.fixture(scope="session")
+async def client(app):
+    # 처리되지 않은 예외도 500 응답으로 확인
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as http:
+        yield http
+
+# 대역 서버 설정 변경 / 통계 조회, 테스트가 끝나면 기본 설정과 서킷 상태를 되돌림
+class FakeControl:
+    def __init__(self, http: httpx.AsyncClient):
+        self.http = http
+
+    async def set(self, **config) -> dict:
+        response = await self.http.post("/_control", json=config)
+        response.raise_for_status()
+        return response.json()
+
+    async def stats(self) -> dict:
+        response = await self.http.get("/_control")
+        response.raise_for_status()
+        return response.json()["stats"]
+
+@pytest.fixture
+async def fake(app):
+    from services.llm import chat_upstream, transcription_upstream
+
+    async with httpx.AsyncClient(base_url=FAKE_URL) as http:
+        control = FakeControl(http)
+        yield control
+        await control.set(**FAKE_DEFAULTS)
+    for upstream in (chat_upstream, transcription_upstream):
+        upstream.breaker.on_success()
+
+# 새 사용자 생성 후 (user_id, 인증 헤더) 반환 (이름은 bench.load 의 테스트 사용자 규칙을 따름)
+@pytest.fixture
+def make_user(fake_server):
+    def create():
+        user_id = f"bench-{uuid.uuid4().hex[:12]}"
+        seed_users(DATABASE_URL, [user_id])
+        return user_id, {"Authorization": f"Bearer {access_token(user_id, SECRET_KEY)}"}
+
+    return create
+
+@pytest.fixture
+def user(make_user):
+    return make_user()
@@ -0,0 +1,259 @@
+# 대화 턴 저장 / 채팅 목록, 내역 키셋 페이지네이션 / 저장 실패 시 롤백 / 다른 사용자 대화 접근
+
+import io
+import json
+
+import pytest
+from sqlalchemy import select
+from starlette.requests import Request
+
+from bench.load import make_audio
+from db import crud
+from db.database import SessionLocal
+from db.models import ChatList, Message
+from routes import stc
+from services.state import chat_states
+
+pytestmark = pytest.mark.anyio
+
+async def chat_turn(client, headers, message="안녕하세요!", chat_id=None, situation="travel"):
+    return await client.post(
+        "/api/ai/chat",
+        json={"situation": situation, "message": message, "chat_id": chat_id},
+        headers=headers
+    )
+
+# WebSocket 턴 1회 (httpx 는 WebSocket 을 지원하지 않으므로 ASGI 메시지를 직접 주고받음)
+async def websocket_turn(app, headers, payload):
+    token = headers["Authorization"].split()[1]
+    incoming = [
+        {"type": "websocket.connect"},
+        {"type": "websocket.receive", "text": json.dumps(payload)},
+        {"type": "websocket.disconnect", "code": 1000}
+    ]
+    sent = []
+
+    async def receive():
+        return incoming.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "websocket",
+        "asgi": {"version": "3.0"},
+        "scheme": "ws",
+        "path": "/api/ai/chat/ws",
+        "raw_path": b"/api/ai/chat/ws",
+        "root_path": "",
+        "query_string": f"token={token}".encode(),
+        "headers": [],
+        "server": ("test", 80),
+        "client": ("127.0.0.1", 12345),
+        "subprotocols": []
+    }
+    await app(scope, receive, send)
+    return [json.loads(message["text"]) for message in sent if message["type"] == "websocket.send"]
+
+def stored_chats(user_id):
+    with SessionLocal() as db:
+        chats = db.execute(select(ChatList).where(ChatList.user_id == user_id)).scalars().all()
+        messages = db.execute(select(Message).where(Message.user_id == user_id)).scalars().all()
+        return chats, messages
+
+async def test_chat_turn_saves_chat_and_messages(client, fake, user):
+    user_id, headers = user
+    response = await chat_turn(client, headers)
+    assert response.status_code == 200
+    chat_id = response.json()["chat_id"]
+
+    response = await chat_turn(client, headers, "이거 얼마예요?", chat_id)
+    assert response.status_code == 200
+    assert response.json()["chat_id"] == chat_id
+
+    chats, messages = stored_chats(user_id)
+    assert [chat.chat_id for chat in chats] == [chat_id]
+    assert chats[0].active
+    assert [message.is_answer for message in messages] == [False, True, False, True]
+
+async def test_chat_detail_pages_with_cursor(client, fake, user):
+    _, headers = user
+    chat_id = (await chat_turn(client, headers)).json()["chat_id"]
+    for message in ("두 번째", "세 번째"):
+        assert (await chat_turn(client, headers, message, chat_id)).status_code == 200
+
+    first = (await client.get(f"/api/chatlist/detail/{chat_id}", params={"limit": 4}, headers=headers)).json()
+    assert len(first["messages"]) == 4
+    assert first["next_cursor"]
+
+    second = (await client.get(
+        f"/api/chatlist/detail/{chat_id}",
+        params={"limit": 4, "cursor": first["next_cursor"]},
+        headers=headers
+    )).json()
+    assert len(second["messages"]) == 2
+    assert second["next_cursor"] is None
+
+    ids = [message["message_id"] for message in first["messages"] + second["messages"]]
+    assert ids == sorted(ids) and len(set(ids)) == 6
+
+async def test_chatlist_pages_with_cursor_header(client, fake, user):
+    _, headers = user
+    created = [(await chat_turn(client, headers)).json()["chat_id"] for _ in range(3)]
+
+    first = await client.get("/api/chatlist", params={"limit": 2}, headers=headers)
+    assert first.status_code == 200
+    assert len(first.json()) == 2
+    cursor = first.headers["X-Next-Cursor"]
+
+    second = await client.get("/api/chatlist", params={"limit": 2, "cursor": cursor}, headers=headers)
+    assert len(second.json()) == 1
+    assert "X-Next-Cursor" not in second.headers
+
+    # 최신순, 페이지 사이 중복/누락 없음
+    listed = [chat["chat_id"] for chat in first.json() + second.json()]
+    assert listed == created[::-1]
+
+async def test_invalid_cursor_is_rejected(client, fake, user):
+    _, headers = user
+    response = await client.get("/api/chatlist", params={"cursor": "not-a-cursor"}, headers=headers)
+    assert response.status_code == 400
+
+async def test_failed_save_rolls_back_new_chat(client, fake, user, monkeypatch):
+    user_id, headers = user
+
+    def broken_message(**kwargs):
+        raise RuntimeError("message insert failed")
+
+    monkeypatch.setattr(crud, "Message", broken_message)
+    response = await chat_turn(client, headers)
+    assert response.status_code == 500
+
+    # 채팅방 생성도 같은 트랜잭션이므로 남지 않고, 상태 캐시에서도 제거됨
+    chats, messages = stored_chats(user_id)
+    assert chats == [] and messages == []
+    assert chat_states.pop_where(lambda _, state: state.user_id == user_id) == 0
+
+async def test_failed_save_rolls_back_usage_update(client, fake, user, monkeypatch):
+    user_id, headers = user
+    chat_id = (await chat_turn(client, headers)).json()["chat_id"]
+    before, _ = stored_chats(user_id)
+
+    def broken_message(**kwargs):
+        raise RuntimeError("message insert failed")
+
+    monkeypatch.setattr(crud, "Message", broken_message)
+    assert (await chat_turn(client, headers, "두 번째", chat_id)).status_code == 500
+    monkeypatch.undo()
+
+    chats, messages = stored_chats(user_id)
+    assert chats[0].prompt_tokens == before[0].prompt_tokens
+    assert len(messages) == 2
+
+async def test_other_users_chat_is_not_found(client, fake, user, make_user):
+    _, headers = user
+    chat_id = (await chat_turn(client, headers)).json()["chat_id"]
+    _, other_headers = make_user()
+
+    assert (await client.get(f"/api/chatlist/detail/{chat_id}", headers=other_headers)).status_code == 404
+    assert (await client.get(f"/api/chatlist/detail/{chat_id}/status", headers=other_headers)).status_code == 404
+    assert (await chat_turn(client, other_headers, "안녕", chat_id)).status_code == 404
+
+async def test_other_users_chat_is_not_streamed(app, client, fake, user, make_user):
+    user_id, headers = user
+    chat_id = (await chat_turn(client, headers)).json()["chat_id"]
+    state = chat_states.get(chat_id)
+    _, other_headers = make_user()
+    before = await fake.stats()
+    payload = {"situation": "travel", "message": "안녕", "chat_id": chat_id}
+
+    response = await client.post("/api/ai/chat/stream", json=payload, headers=other_headers)
+    assert response.status_code == 404
+    assert await websocket_turn(app, other_headers, payload) == [
+        {"type": "error", "status": 404, "detail": "유효하지 않은 대화입니다."}
+    ]
+
+    # 모델을 호출하지 않고, 대화 주인의 상태 캐시도 그대로
+    after = await fake.stats()
+    assert (after["chat"], after["stream"]) == (before["chat"], before["stream"])
+    assert chat_states.get(chat_id) is state and state.user_id == user_id
+
+async def test_chat_ended_elsewhere_is_rejected(client, fake, user):
+    user_id, headers = user
+    chat_id = (await chat_turn(client, headers)).json()["chat_id"]
+    assert chat_states.get(chat_id) is not None
+
+    # 다른 워커에서 종료된 대화 : 이 워커의 상태 캐시는 아직 진행 중
+    with SessionLocal() as db:
+        db.query(ChatList).filter(ChatList.chat_id == chat_id).update({"active": False})
+        db.commit()
+
+    response = await chat_turn(client, headers, "두 번째", chat_id)
+    assert response.status_code == 404
+    assert chat_states.get(chat_id) is None
+    _, messages = stored_chats(user_id)
+    assert len(messages) == 2
+
+async def test_stream_turn_sends_meta_delta_done(client, fake, user):
+    user_id, headers = user
+    events = []
+    async with client.stream(
+        "POST", "/api/ai/chat/stream",
+        json={"situation": "travel", "message": "안녕하세요!"},
+        headers=headers
+    ) as response:
+        assert response.status_code == 200
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event:"):
+                event = line.split(":", 1)[1].strip()
+            elif line.startswith("data:"):
+                events.append((event, json.loads(line.split(":", 1)[1])))
+
+    names = [name for name, _ in events]
+    assert names[0] == "meta" and names[-1] == "done" and "delta" in names
+    _, messages = stored_chats(user_id)
+    assert messages[-1].message == events[-1][1]["response"]
+
+async def test_voice_turn_saves_transcription(client, fake, user):
+    user_id, headers = user
+    response = await client.post(
+        "/api/ai/stc",
+        data={"situation": "travel"},
+        files={"file": ("voice.wav", io.BytesIO(make_audio()), "audio/wav")},
+        headers=headers
+    )
+    assert response.status_code == 200
+    _, messages = stored_chats(user_id)
+    assert [message.is_answer for message in messages] == [False, True]
+    assert messages[0].message
+
+async def voice_turn(client, headers, content_type):
+    return await client.post(
+        "/api/ai/stc",
+        data={"situation": "travel"},
+        files={"file": ("voice", io.BytesIO(make_audio()), content_type)},
+        headers=headers
+    )
+
+async def test_voice_turn_accepts_ogg_and_untyped_uploads(client, fake, user):
+    _, headers = user
+    for content_type in ("audio/ogg", "audio/ogg;codecs=opus", "application/octet-stream"):
+        assert (await voice_turn(client, headers, content_type)).status_code == 200
+    assert (await voice_turn(client, headers, "text/plain")).status_code == 415
+
+async def test_oversized_upload_rejected_by_content_length(client, fake, user, monkeypatch):
+    _, headers = user
+    monkeypatch.setattr(stc, "MAX_AUDIO_SIZE", 1024)
+    monkeypatch.setattr(stc, "MULTIPART_OVERHEAD", 0)
+
+    # 본문(multipart)을 파싱하기 전에 거절되어야 함
+    def parse_form(*args, **kwargs):
+        raise AssertionError("form parsed")
+
+    monkeypatch.setattr(Request, "form", parse_form)
+    transcriptions = (await fake.stats())["transcriptions"]
+
+    response = await voice_turn(client, headers, "audio/wav")
+    assert response.status_code == 413
+    assert (await fake.stats())["transcriptions"] == transcriptions
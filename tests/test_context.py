@@ -0,0 +1,34 @@
+# 토큰 예산 내 최근 대화 선택 / 누적 요약 주기
+
+from services import context
+from services.state import CachedMessage
+
+# 긴 대화에서 누적 요약이 몇 번 일어나는지 (메시지마다 150토큰, 예산 1500토큰)
+def count_folds(monkeypatch, turns: int) -> int:
+    monkeypatch.setattr(context, "count_tokens", len)
+    history = []
+    folds = 0
+    for turn in range(turns):
+        if context.needs_fold(context.select_recent(history)):
+            folds += 1
+            history = history[context.select_fold(history):]
+        history += [
+            CachedMessage(2 * turn, "가" * 150, False),
+            CachedMessage(2 * turn + 1, "나" * 150, True)
+        ]
+    return folds
+
+def test_recent_messages_fit_budget(monkeypatch):
+    monkeypatch.setattr(context, "count_tokens", len)
+    history = [CachedMessage(i, "가" * 150, bool(i % 2)) for i in range(30)]
+    start = context.select_recent(history)
+    assert len(history) - start == context.CONTEXT_TOKEN_BUDGET // 150
+
+def test_fold_leaves_room_for_several_turns(monkeypatch):
+    # 예산만큼 남기면 2턴마다 요약 (50턴에 22회), 절반만 남기면 5턴마다
+    assert count_folds(monkeypatch, 50) <= 10
+
+def test_fold_keeps_minimum_messages(monkeypatch):
+    monkeypatch.setattr(context, "count_tokens", len)
+    history = [CachedMessage(i, "가" * 5000, bool(i % 2)) for i in range(6)]
+    assert context.select_fold(history) == len(history) - context.CONTEXT_MIN_MESSAGES
@@ -0,0 +1,170 @@
+# 작업 큐 수명 주기 (재시도, 실패 핸들러, 종료 시 정리) / 대화 종료 후 요약/피드백 작업 (선점, 재등록 횟수 제한)
+
+import asyncio
+import uuid
+from datetime import datetime
+
+import pytest
+
+from db.database import SessionLocal
+from db.models import ChatList, Message
+from services.conversation import SUMMARY_MAX_ATTEMPTS
+from services.jobs import COMPLETED, FAILED, JobQueue
+
+pytestmark = pytest.mark.anyio
+
+def job_queue(**overrides) -> JobQueue:
+    options = {"workers": 1, "max_retries": 1, "retry_delay": 0.01, "status_size": 100, "drain_timeout": 0.2}
+    options.update(overrides)
+    return JobQueue(**options)
+
+async def test_job_is_retried_then_completes():
+    queue = job_queue()
+    calls = []
+
+    async def flaky(key):
+        calls.append(key)
+        if len(calls) == 1:
+            raise RuntimeError("temporary")
+
+    queue.register("flaky", flaky)
+    job = queue.enqueue("flaky", "a", "a")
+    # 대기/실행 중인 같은 작업은 중복으로 넣지 않음
+    assert queue.enqueue("flaky", "a", "a") is job
+
+    job = await queue.wait("flaky", "a", 2)
+    assert job["status"] == COMPLETED
+    assert job["attempts"] == 2
+    await queue.stop()
+
+async def test_failed_job_calls_failure_handler():
+    queue = job_queue(max_retries=0)
+    released = []
+
+    async def broken(key):
+        raise RuntimeError("broken")
+
+    async def release(key):
+        released.append(key)
+
+    queue.register("broken", broken, on_failure=release)
+    queue.enqueue("broken", "a", "a")
+    job = await queue.wait("broken", "a", 2)
+    assert job["status"] == FAILED
+    assert job["error"] == "broken"
+    assert released == ["a"]
+
+    # 실패한 작업은 다시 넣을 수 있음
+    assert queue.enqueue("broken", "a", "a")["status"] != FAILED
+    await queue.stop()
+
+async def test_stop_drains_queued_jobs():
+    queue = job_queue(drain_timeout=2)
+    done = []
+
+    async def quick(key):
+        await asyncio.sleep(0.01)
+        done.append(key)
+
+    queue.register("quick", quick)
+    for key in ("a", "b", "c"):
+        queue.enqueue("quick", key, key)
+    await queue.stop()
+    assert done == ["a", "b", "c"]
+    assert all(queue.get("quick", key)["status"] == COMPLETED for key in done)
+
+async def test_stop_abandons_unfinished_jobs():
+    queue = job_queue(drain_timeout=0.05)
+    released = []
+
+    async def slow(key):
+        await asyncio.sleep(10)
+
+    async def release(key):
+        released.append(key)
+
+    queue.register("slow", slow, on_failure=release)
+    queue.enqueue("slow", "running", "running")
+    queue.enqueue("slow", "pending", "pending")
+    await queue.stop()
+
+    for key in ("running", "pending"):
+        job = queue.get("slow", key)
+        assert job["status"] == FAILED
+        assert job["error"] == "shutdown"
+        assert job["done"].is_set()
+    assert sorted(released) == ["pending", "running"]
+    assert queue.stats()["workers"] == 0
+
+# 요약 작업이 없는 종료된 대화 (다른 워커에서 실패했거나 서버가 재시작된 경우)
+def ended_chat(user_id: str, attempts: int) -> str:
+    chat_id = str(uuid.uuid4())
+    now = datetime.now()
+    with SessionLocal() as db:
+        db.add(ChatList(
+            chat_id=chat_id,
+            user_id=user_id,
+            situation="travel",
+            summary="New conversation",
+            created_at=now,
+            completed_at=now,
+            active=False,
+            summary_attempts=attempts
+        ))
+        db.add_all([
+            Message(chat_id=chat_id, user_id=user_id, message="안녕하세요!", is_answer=False),
+            Message(chat_id=chat_id, user_id=user_id, message="반가워요.", is_answer=True)
+        ])
+        db.commit()
+    return chat_id
+
+def summary_claim(chat_id: str):
+    with SessionLocal() as db:
+        chat = db.get(ChatList, chat_id)
+        return chat.summary_attempts, chat.summary_claimed_at
+
+async def chat_status(client, headers, chat_id):
+    response = await client.get(f"/api/chatlist/detail/{chat_id}/status", params={"wait": 5}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+async def test_ended_chat_is_summarized(client, fake, user):
+    _, headers = user
+    await fake.set(end_after=0)
+    response = await client.post(
+        "/api/ai/chat",
+        json={"situation": "travel", "message": "안녕하세요!"},
+        headers=headers
+    )
+    chat_id = response.json()["chat_id"]
+
+    status = await chat_status(client, headers, chat_id)
+    assert status["status"] == COMPLETED
+    assert status["summary"] and status["feedback"]
+    attempts, claimed_at = summary_claim(chat_id)
+    assert attempts == 1 and claimed_at is not None
+
+async def test_lost_summary_job_is_requeued(client, fake, user):
+    user_id, headers = user
+    chat_id = ended_chat(user_id, attempts=1)
+
+    status = await chat_status(client, headers, chat_id)
+    assert status["status"] == COMPLETED
+    assert summary_claim(chat_id)[0] == 2
+
+async def test_failed_summary_is_requeued_until_attempts_run_out(client, fake, user):
+    user_id, headers = user
+    chat_id = ended_chat(user_id, attempts=1)
+    await fake.set(error_rate=1)
+
+    for attempts in range(2, SUMMARY_MAX_ATTEMPTS + 1):
+        assert (await chat_status(client, headers, chat_id))["status"] == FAILED
+        # 실패하면 선점을 풀어 다음 조회에서 다시 등록
+        assert summary_claim(chat_id) == (attempts, None)
+
+    # 횟수를 모두 쓰면 AI 서버가 복구되어도 다시 등록하지 않음
+    await fake.set(error_rate=0)
+    calls = (await fake.stats())["chat"]
+    assert (await chat_status(client, headers, chat_id))["status"] == FAILED
+    assert summary_claim(chat_id) == (SUMMARY_MAX_ATTEMPTS, None)
+    assert (await fake.stats())["chat"] == calls
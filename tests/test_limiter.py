@@ -0,0 +1,87 @@
+# 사용자별 빈도 제한 / 동시 실행 대기열 제한 (429 + Retry-After)
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from routes import chat
+from services.limiter import AdmissionController
+
+pytestmark = pytest.mark.anyio
+
+def limiter(**overrides) -> AdmissionController:
+    options = {
+        "enabled": True,
+        "max_concurrency": 4,
+        "max_queue": 4,
+        "queue_timeout": 1,
+        "user_rate": 0,
+        "user_burst": 1,
+        "user_buckets": 100
+    }
+    options.update(overrides)
+    return AdmissionController(**options)
+
+async def test_user_rate_limit_returns_429(client, fake, user, monkeypatch):
+    _, headers = user
+    monkeypatch.setattr(chat, "llm_limiter", limiter(user_rate=0.5, user_burst=2))
+    payload = {"situation": "travel", "message": "안녕하세요!"}
+
+    for _ in range(2):
+        assert (await client.post("/api/ai/chat", json=payload, headers=headers)).status_code == 200
+    response = await client.post("/api/ai/chat", json=payload, headers=headers)
+    assert response.status_code == 429
+    # 토큰 1개가 다시 찰 때까지 (1 / 0.5 = 2초 이내)
+    assert 1 <= int(response.headers["Retry-After"]) <= 2
+
+def test_user_buckets_are_independent():
+    controller = limiter(user_rate=1, user_burst=1)
+    controller.check_user("a")
+    with pytest.raises(HTTPException) as error:
+        controller.check_user("a")
+    assert error.value.status_code == 429
+    controller.check_user("b")
+    assert controller.rejected_user == 1
+
+async def test_full_queue_rejects_with_retry_after():
+    controller = limiter(max_concurrency=1, max_queue=0)
+    async with controller.slot():
+        with pytest.raises(HTTPException) as error:
+            async with controller.slot():
+                pass
+        assert error.value.status_code == 429
+        assert int(error.value.headers["Retry-After"]) >= 1
+        # 스트리밍 시작 전 확인도 같은 기준
+        with pytest.raises(HTTPException):
+            controller.ensure_capacity()
+    assert controller.rejected_queue == 2
+
+async def test_queue_timeout_rejects_and_keeps_capacity():
+    controller = limiter(max_concurrency=1, max_queue=1, queue_timeout=0.05)
+    async with controller.slot():
+        with pytest.raises(HTTPException) as error:
+            async with controller.slot():
+                pass
+        assert error.value.status_code == 429
+    assert controller.rejected_timeout == 1
+
+    # 시간 초과로 포기한 요청이 자리를 차지하지 않음
+    async with controller.slot():
+        assert controller.in_flight == 1
+    assert controller.in_flight == 0
+
+async def test_background_slot_waits_instead_of_rejecting():
+    controller = limiter(max_concurrency=1, max_queue=0, queue_timeout=0.01)
+    order = []
+
+    async def background():
+        async with controller.slot(background=True):
+            order.append("background")
+
+    async with controller.slot():
+        task = asyncio.ensure_future(background())
+        await asyncio.sleep(0.05)
+        order.append("foreground")
+    await task
+    assert order == ["foreground", "background"]
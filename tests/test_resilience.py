@@ -0,0 +1,174 @@
+# OpenAI 호출 재시도 / 서킷 브레이커 상태 전이 / 헤지 요청 / 제한 시간 (대역 서버 장애 주입)
+
+import asyncio
+import io
+import time
+
+import pytest
+
+from bench.load import make_audio
+from services.llm import chat_upstream, transcription_upstream
+from services.resilience import CircuitBreaker
+
+pytestmark = pytest.mark.anyio
+
+async def chat_turn(client, headers):
+    return await client.post(
+        "/api/ai/chat",
+        json={"situation": "travel", "message": "안녕하세요!"},
+        headers=headers
+    )
+
+async def test_transient_errors_are_retried(client, fake, user):
+    _, headers = user
+    retries = chat_upstream.retries
+    await fake.set(fail_next=2)
+
+    response = await chat_turn(client, headers)
+    assert response.status_code == 200
+    assert chat_upstream.retries - retries == 2
+    assert chat_upstream.breaker.state == CircuitBreaker.CLOSED
+
+async def test_retries_exhausted_returns_502(client, fake, user):
+    _, headers = user
+    await fake.set(fail_next=3)
+    response = await chat_turn(client, headers)
+    assert response.status_code == 502
+
+async def test_request_errors_are_not_retried_and_return_502(client, fake, user):
+    _, headers = user
+    retries, opened = chat_upstream.retries, chat_upstream.breaker.opened
+    await fake.set(fail_next=5, fail_status=400)
+
+    response = await chat_turn(client, headers)
+    assert response.status_code == 502
+    # 요청 오류는 재시도 / 서킷 실패로 세지 않음
+    assert chat_upstream.retries == retries
+    assert chat_upstream.breaker.opened == opened
+    assert chat_upstream.breaker.state == CircuitBreaker.CLOSED
+
+async def test_stc_request_error_returns_502(client, fake, user):
+    _, headers = user
+    await fake.set(fail_next=1, fail_status=401)
+    response = await client.post(
+        "/api/ai/stc",
+        data={"situation": "travel"},
+        files={"file": ("voice.wav", io.BytesIO(make_audio()), "audio/wav")},
+        headers=headers
+    )
+    assert response.status_code == 502
+
+async def test_stream_request_error_is_sent_as_error_event(client, fake, user):
+    _, headers = user
+    await fake.set(fail_next=1, fail_status=400)
+    async with client.stream(
+        "POST", "/api/ai/chat/stream",
+        json={"situation": "travel", "message": "안녕하세요!"},
+        headers=headers
+    ) as response:
+        body = "".join([line async for line in response.aiter_lines()])
+    assert "event: error" in body and '"status": 502' in body
+
+async def test_circuit_opens_rejects_and_closes_after_probe(client, fake, user):
+    _, headers = user
+    breaker = chat_upstream.breaker
+    opened = breaker.opened
+
+    # 연속 실패 3회 (CIRCUIT_FAILURE_THRESHOLD) -> 열림
+    await fake.set(fail_next=3)
+    assert (await chat_turn(client, headers)).status_code == 502
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.opened == opened + 1
+
+    # 열려 있는 동안은 대역 서버를 호출하지 않고 바로 503 + Retry-After
+    calls = (await fake.stats())["chat"]
+    response = await chat_turn(client, headers)
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+    assert (await fake.stats())["chat"] == calls
+
+    # open_seconds 이후 probe 성공 -> 닫힘
+    await asyncio.sleep(breaker.open_seconds)
+    assert (await chat_turn(client, headers)).status_code == 200
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+
+async def test_failed_probe_reopens_circuit(client, fake, user):
+    _, headers = user
+    breaker = chat_upstream.breaker
+    await fake.set(fail_next=3)
+    assert (await chat_turn(client, headers)).status_code == 502
+    opened = breaker.opened
+
+    await asyncio.sleep(breaker.open_seconds)
+    await fake.set(fail_next=1)
+    # probe 실패로 다시 열리면 남은 재시도도 바로 503
+    assert (await chat_turn(client, headers)).status_code == 503
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.opened == opened + 1
+
+async def test_slow_request_is_hedged(client, fake, user):
+    _, headers = user
+    hedges, wins = chat_upstream.hedges, chat_upstream.hedge_wins
+    await fake.set(hang_next=1)
+
+    started = time.monotonic()
+    response = await chat_turn(client, headers)
+    assert response.status_code == 200
+    # 시도 타임아웃(1초)을 기다리지 않고 헤지 요청 응답 사용
+    assert time.monotonic() - started < 1
+    assert chat_upstream.hedges == hedges + 1
+    assert chat_upstream.hedge_wins == wins + 1
+
+async def test_deadline_returns_504(client, fake, user):
+    _, headers = user
+    await fake.set(hang_next=10)
+
+    started = time.monotonic()
+    response = await chat_turn(client, headers)
+    assert response.status_code == 504
+    # 재시도 포함 OPENAI_CHAT_DEADLINE(2.5초) 안에 응답
+    assert time.monotonic() - started < 3.5
+
+async def test_stream_retries_before_first_chunk(client, fake, user):
+    _, headers = user
+    retries = chat_upstream.retries
+    await fake.set(fail_next=1)
+
+    async with client.stream(
+        "POST", "/api/ai/chat/stream",
+        json={"situation": "travel", "message": "안녕하세요!"},
+        headers=headers
+    ) as response:
+        assert response.status_code == 200
+        body = "".join([line async for line in response.aiter_lines()])
+    assert "event: done" in body
+    assert chat_upstream.retries == retries + 1
+
+async def test_stream_rejected_while_circuit_open(client, fake, user):
+    _, headers = user
+    for _ in range(chat_upstream.breaker.failure_threshold):
+        chat_upstream.breaker.on_failure()
+
+    response = await client.post(
+        "/api/ai/chat/stream",
+        json={"situation": "travel", "message": "안녕하세요!"},
+        headers=headers
+    )
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+
+async def test_stc_rejected_while_transcription_circuit_open(client, fake, user):
+    _, headers = user
+    for _ in range(transcription_upstream.breaker.failure_threshold):
+        transcription_upstream.breaker.on_failure()
+    transcriptions = (await fake.stats())["transcriptions"]
+
+    response = await client.post(
+        "/api/ai/stc",
+        data={"situation": "travel"},
+        files={"file": ("voice.wav", io.BytesIO(make_audio()), "audio/wav")},
+        headers=headers
+    )
+    assert response.status_code == 503
+    assert (await fake.stats())["transcriptions"] == transcriptions
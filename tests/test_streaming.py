@@ -0,0 +1,16 @@
+# 스트리밍 중 "response" 필드 추출 (청크 경계, 이스케이프 시퀀스)
+
+from services.streaming import ResponseFieldStream
+
+def feed_all(chunks):
+    extractor = ResponseFieldStream()
+    return "".join(extractor.feed(chunk) for chunk in chunks)
+
+def test_response_field_across_chunks():
+    assert feed_all(['{"resp', 'onse": "안녕', '하세요\\n', '반가워요", "error": false}']) == "안녕하세요\n반가워요"
+
+def test_escape_split_across_chunks():
+    assert feed_all(['{"response": "a\\', '"b\\u', 'd55c\\ud83d', '\\ude00"}']) == 'a"b한😀'
+
+def test_invalid_escape_is_passed_through():
+    assert feed_all(['{"response": "a\\x', 'b"}']) == "a\\xb"